@@ -1,6 +1,5 @@
 import os
 import sqlite3
-import datetime
 import logging
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
@@ -28,6 +27,12 @@ sys.path.append(os.path.dirname(keys_path))
 
 # Import the Key_1 from keys.py
 from keys import gg_key
+from text_compression import register_text_codec
+from db_connections import get_connection
+from schema_migrations import ACTIVE_BILL_DATA, ACTIVE_BILL_TEXT, migrate
+from token_chunker import TokenChunker
+from bill_manifest import STRATEGY_FULL, build_prompt_text, create_manifest_table, refresh_manifest
+from prompt_preamble import legislation_preamble, dated_context, bill_generator, delete_gemini_cache, log_gemini_usage
 
 # Configure the Google Generative AI
 try:
@@ -65,18 +70,35 @@ safety_settings = [
     },
 ]
 
+# Shared by every prompt and sent as the system instruction; the bill and the task follow it
+REPORT_PREAMBLE = legislation_preamble(
+    "As an unbiased reporter, write about the legislation in question as the task at the end of the prompt asks.  Do not provide any party affiliatons of sponsors or co-sponsors. If providing insights chronologically ensure they are in proper order by date. Provide context from the bill text itself if appropriate. If you do reference from the bill text always include section of the text the reference comes from. I will provide a current congress, bill number, title, text, and actions.",
+    "The report title should be the full bill title on its own line followed by a \":\".  Bold must be enclosed with <b></b>.  Never format with any italic text.  Do not bullet point any lists, instead just start a new line for listed element.")
+
+SUMMARY_TASK = "Provide a summary on current actions and high level important facts for the legislation in question."
+FORMAL_REPORT_TASK = "Provide a formal report on the current state of this legistlation.  Include details about the bills journey and details about what the bill contains. Ensure the output reads like a newspaper column."
+
+model_name = "gemini-1.5-flash-exp-0827"
+
 try:
-    model = genai.GenerativeModel(model_name="gemini-1.5-flash-exp-0827",
+    model = genai.GenerativeModel(model_name=model_name,
                                   generation_config=generation_config,
-                                  safety_settings=safety_settings)
+                                  safety_settings=safety_settings,
+                                  system_instruction=REPORT_PREAMBLE)
     logging.info("Generative model initialized successfully")
 except Exception as e:
     logging.error(f"Failed to initialize generative model: {str(e)}")
     raise
 
+# Bill text tokens allowed in one prompt (gemini-1.5-flash takes about 1M, leaving room for the
+# instructions, actions and output). Larger bills are sent as part summaries or truncated parts.
+prompt_token_budget = 900000
+
+chunker = TokenChunker()
+
 def connect_to_db(db_path):
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         conn.text_factory = str
         logging.info(f"Successfully connected to database: {db_path}")
         return conn
@@ -151,30 +173,14 @@ def get_bill_actions(conn, congress, bill_type, bill_number):
         logging.error(f"Error retrieving bill actions: {str(e)}")
         raise
 
-def get_bill_text(conn, congress, bill_type, bill_number):
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT bill_text
-            FROM bill_text
-            WHERE congress = ? AND bill_type = ? AND bill_number = ?
-        """, (congress, bill_type, bill_number))
-        result = cursor.fetchone()
-        if result:
-            logging.info(f"Retrieved bill text for {congress}.{bill_type}.{bill_number}")
-        else:
-            logging.warning(f"No bill text found for {congress}.{bill_type}.{bill_number}")
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error retrieving bill text: {str(e)}")
-        raise
-
 def get_all_bills(conn):
     try:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT congress, bill_type, bill_number, bill_text, summary, formal_report
+            SELECT congress, bill_type, bill_number,
+                   MIN(summary IS NOT NULL AND summary != ''), MIN(formal_report IS NOT NULL AND formal_report != '')
             FROM bill_text
+            GROUP BY congress, bill_type, bill_number
         """)
         result = cursor.fetchall()
         logging.info(f"Retrieved {len(result)} bills from bill_text table")
@@ -188,9 +194,10 @@ def update_summary(conn, congress, bill_type, bill_number, summary):
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE bill_text
-            SET summary = ?
+            SET summary = compress_text(?), summary_tokens = ?
             WHERE congress = ? AND bill_type = ? AND bill_number = ?
-        """, (summary, congress, bill_type, bill_number))
+        """, (summary, chunker.count(summary), congress, bill_type, bill_number))
+        refresh_manifest(conn, congress, bill_type, bill_number, chunker, commit=False)
         conn.commit()
         logging.info(f"Updated summary for bill {congress}.{bill_type}.{bill_number}")
     except sqlite3.Error as e:
@@ -202,7 +209,7 @@ def update_formal_report(conn, congress, bill_type, bill_number, formal_report):
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE bill_text
-            SET formal_report = ?
+            SET formal_report = compress_text(?)
             WHERE congress = ? AND bill_type = ? AND bill_number = ?
         """, (formal_report, congress, bill_type, bill_number))
         conn.commit()
@@ -211,25 +218,9 @@ def update_formal_report(conn, congress, bill_type, bill_number, formal_report):
         logging.error(f"Error updating formal report: {str(e)}")
         raise
 
-def construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, is_summary=True):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
-    
-    prompt = f"""
-    <Instructions>
-    As an unbiased reporter, provide a {'summary on current actions and high level important facts for the legislation in question' if is_summary else 'formal report on the current state of this legistlation.  Include details about the bills journey and details about what the bill contains. Ensure the output reads like a newspaper column'}.  Do not provide any party affiliatons of sponsors or co-sponsors. If providing insights chronologically ensure they are in proper order by date. Provide context from the bill text itself if appropriate. If you do reference from the bill text always include section of the text the reference comes from. I will provide a current congress, bill number, title, text, and actions.
-    </Instructions>
-    <Formatting>The report title should be the full bill title on its own line followed by a ":".  Bold must be enclosed with <b></b>.  Never format with any italic text.  Do not bullet point any lists, instead just start a new line for listed element.</Formatting>
-    <Additional Details>
-    Today's date is {today_date}. Current sitting President: Joe Biden
-    Key action meanings:
-    "Presented to President" - This means the legislation has been brought forward to the President's office but the legislation has not yet been signed or vetoed.
-    "Signed by President" - This means the legislation has been signed by the president and become public law.
-    Bills: A bill is the form used for most legislation, whether permanent or temporary, general or special, public or private.  A bill originating in the Senate is designated by the letters “S”, signifying “Senate”, followed by a number that it retains throughout all its parliamentary stages. A bill originating in the House of Representatives is designated by the letters “H.R.”, signifying “House of Representatives”, followed by a number that it retains throughout all its parliamentary stages. Bills are presented to the President for action when approved in identical form by both the House of Representatives and the Senate.
-    Joint Resolutions:  Joint resolutions may originate either in the House of Representatives or in the Senate. There is little practical difference between a bill and a joint resolution. Both are subject to the same procedure, except for a joint resolution proposing an amendment to the Constitution. On approval of such a resolution by two-thirds of both the House and Senate, it is sent directly to the Administrator of General Services for submission to the individual states for ratification. It is not presented to the President for approval. A joint resolution originating in the House of Representatives is designated “H.J.Res.” followed by its individual number. Joint resolutions become law in the same manner as bills.
-    Concurrent Resolutions: Matters affecting the operations of both the House of Representatives and Senate are usually initiated by means of concurrent resolutions. A concurrent resolution originating in the House of Representatives is designated “H.Con.Res.” followed by its individual number. On approval by both the House of Representatives and Senate, they are signed by the Clerk of the House and the Secretary of the Senate. They are not presented to the President for action.
-    Simple Resolutions: A matter concerning the operation of either the House of Representatives or Senate alone is initiated by a simple resolution. A resolution affecting the House of Representatives is designated “H.Res.” followed by its number. They are not presented to the President for action.
-    </Additional Details>
-
+def construct_bill_context(congress, bill_type, bill_number, bill_title, bill_text, bill_actions):
+    # Everything about the bill that the summary and the formal report prompts share
+    context = f"""
     <Congress>{congress}</Congress>
     <Bill Title>{bill_title}</Bill Title>
     <Bill Number>{bill_type}{bill_number}</Bill Number>
@@ -240,13 +231,27 @@ def construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bi
     {bill_actions}
     </Bill Actions>
     """
-    logging.info(f"Constructed {'summary' if is_summary else 'full report'} prompt for bill {congress}.{bill_type}.{bill_number}")
+    logging.info(f"Constructed bill context for bill {congress}.{bill_type}.{bill_number}")
+    return context
+
+def construct_prompt(bill_context, is_summary=True):
+    # The task goes last so the preamble and the bill context stay a shared prefix. bill_context
+    # is None when the model already holds it in a context cache.
+    task = SUMMARY_TASK if is_summary else FORMAL_REPORT_TASK
+    prompt = f"""{bill_context or ""}
+    <Task>
+    {dated_context()}
+    {task}
+    </Task>
+    """
+    logging.info(f"Constructed {'summary' if is_summary else 'full report'} prompt")
     return prompt
 
-def generate_content(prompt):
+def generate_content(prompt, generator=None):
     try:
-        response = model.generate_content(prompt)
+        response = (generator or model).generate_content(prompt)
         logging.info("Generated content from AI model")
+        log_gemini_usage(response, "Gemini usage")
         # CONVERTS Response to unicode text for formatting
         response_converted = convert_bold_to_unicode(response.text)
         # print(f"{response.text}")
@@ -256,7 +261,7 @@ def generate_content(prompt):
         logging.error(f"Error generating content: {str(e)}")
         raise
 
-def process_bill(conn_data, conn_text, congress, bill_type, bill_number, bill_text, existing_summary, existing_formal_report):
+def process_bill(conn_data, conn_text, congress, bill_type, bill_number, existing_summary, existing_formal_report):
     try:
         # Check if both summary and full report already exist
         if existing_summary and existing_formal_report:
@@ -267,26 +272,36 @@ def process_bill(conn_data, conn_text, congress, bill_type, bill_number, bill_te
         bill_url = get_bill_url(conn_data, congress, bill_type, bill_number)
         bill_actions = get_bill_actions(conn_data, congress, bill_type, bill_number)
 
-        if bill_info and bill_url and bill_actions:
+        # The whole bill when it fits, otherwise the part summaries or as many parts as fit
+        _, bill_text = build_prompt_text(conn_text, congress, bill_type, bill_number, prompt_token_budget, STRATEGY_FULL, chunker)
+
+        if bill_info and bill_url and bill_actions and bill_text:
             bill_title = bill_info[0]
             formatted_text_url = bill_url[0]
 
-            # Generate summary if it doesn't exist
-            if not existing_summary:
-                summary_prompt = construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, is_summary=True)
-                summary = generate_content(summary_prompt)
-                summary_with_url = f"{summary}\n\nSource: {formatted_text_url}"
-                update_summary(conn_text, congress, bill_type, bill_number, summary_with_url)
-
-                # Wait for 30 seconds before generating full report
-                time.sleep(30)
-
-            # Generate full report if it doesn't exist
-            if not existing_formal_report:
-                formal_report_prompt = construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, is_summary=False)
-                formal_report = generate_content(formal_report_prompt)
-                formal_report_with_url = f"{formal_report}\n\nSource: {formatted_text_url}"
-                update_formal_report(conn_text, congress, bill_type, bill_number, formal_report_with_url)
+            bill_context = construct_bill_context(congress, bill_type, bill_number, bill_title, bill_text, bill_actions)
+            prompts_needed = (not existing_summary) + (not existing_formal_report)
+            generator, cache, prompt_context = bill_generator(model, model_name, REPORT_PREAMBLE, generation_config, safety_settings,
+                                                              bill_context, prompts_needed, chunker.count)
+            try:
+                # Generate summary if it doesn't exist
+                if not existing_summary:
+                    summary_prompt = construct_prompt(prompt_context, is_summary=True)
+                    summary = generate_content(summary_prompt, generator)
+                    summary_with_url = f"{summary}\n\nSource: {formatted_text_url}"
+                    update_summary(conn_text, congress, bill_type, bill_number, summary_with_url)
+
+                    # Wait for 30 seconds before generating full report
+                    time.sleep(30)
+
+                # Generate full report if it doesn't exist
+                if not existing_formal_report:
+                    formal_report_prompt = construct_prompt(prompt_context, is_summary=False)
+                    formal_report = generate_content(formal_report_prompt, generator)
+                    formal_report_with_url = f"{formal_report}\n\nSource: {formatted_text_url}"
+                    update_formal_report(conn_text, congress, bill_type, bill_number, formal_report_with_url)
+            finally:
+                delete_gemini_cache(cache)
 
             logging.info(f"Successfully processed bill {congress}.{bill_type}.{bill_number}")
             return True  # Indicate that the bill was processed
@@ -305,14 +320,18 @@ def main():
 
         conn_data = connect_to_db(active_bill_data_db)
         conn_text = connect_to_db(active_bill_text_db)
+        register_text_codec(conn_text)
+        create_manifest_table(conn_text)
+        migrate(conn_data, ACTIVE_BILL_DATA)
+        migrate(conn_text, ACTIVE_BILL_TEXT)
 
         all_bills = get_all_bills(conn_text)
 
         for bill in all_bills:
             # Unpack the bill data, ensuring we have the correct number of variables
-            congress, bill_type, bill_number, bill_text, existing_summary, existing_synopsis = bill
+            congress, bill_type, bill_number, existing_summary, existing_synopsis = bill
 
-            bill_processed = process_bill(conn_data, conn_text, congress, bill_type, bill_number, bill_text, existing_summary, existing_synopsis)
+            bill_processed = process_bill(conn_data, conn_text, congress, bill_type, bill_number, existing_summary, existing_synopsis)
             
             # Only wait if the bill was actually processed
             if bill_processed:
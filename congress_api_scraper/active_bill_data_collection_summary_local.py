@@ -1,10 +1,18 @@
 import os
 import sqlite3
-import datetime
 import logging
+import argparse
 # import time
 from ollama import Client
 
+from text_compression import register_text_codec
+from db_connections import get_connection
+from schema_migrations import ACTIVE_BILL_DATA, ACTIVE_BILL_TEXT, migrate
+from token_chunker import TokenChunker
+from bill_manifest import create_manifest_table, refresh_manifest
+from llm_request_pool import run_in_flight
+from prompt_preamble import KEY_ACTION_MEANINGS, BILL_TYPE_DEFINITIONS, dated_context, ollama_keep_alive, log_ollama_usage
+
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
 script_dir = os.path.dirname(script_path)
@@ -20,9 +28,15 @@ logging.basicConfig(filename=log_file, level=logging.INFO,
 client = Client(host='http://localhost:10001')
 model = 'llama3.1:8b-instruct-q8_0'
 
+# Summary requests kept in flight at once; match the server's OLLAMA_NUM_PARALLEL
+summary_workers = 4
+
+# Summary token counts for the bill manifest use the same tokenizer as the text parts
+chunker = TokenChunker()
+
 def connect_to_db(db_path):
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         conn.text_factory = str
         logging.info(f"Successfully connected to database: {db_path}")
         return conn
@@ -89,7 +103,7 @@ def get_bill_text(conn, congress, bill_type, bill_number):
     try:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT previous_context, bill_text, next_context
+            SELECT decompress_text(bill_text), section_start, section_end
             FROM bill_text
             WHERE congress = ? AND bill_type = ? AND bill_number = ?
         """, (congress, bill_type, bill_number))
@@ -107,11 +121,13 @@ def get_all_bills(conn):
     try:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT congress, bill_type, bill_number, text_part, previous_context, bill_text, next_context, summary
+            SELECT congress, bill_type, bill_number, text_part, section_start, section_end,
+                   decompress_text(bill_text), summary
             FROM bill_text
+            WHERE summary IS NULL OR summary = ''
         """)
         result = cursor.fetchall()
-        logging.info(f"Retrieved {len(result)} bills from bill_text table")
+        logging.info(f"Retrieved {len(result)} bill text parts without a summary")
         return result
     except sqlite3.Error as e:
         logging.error(f"Error retrieving all bills: {str(e)}")
@@ -122,20 +138,20 @@ def update_summary(conn, congress, bill_type, bill_number, text_part, summary):
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE bill_text
-            SET summary = ?
+            SET summary = compress_text(?), summary_tokens = ?
             WHERE congress = ? AND bill_type = ? AND bill_number = ? AND text_part = ?
-        """, (summary, congress, bill_type, bill_number, text_part))
+        """, (summary, chunker.count(summary), congress, bill_type, bill_number, text_part))
+        refresh_manifest(conn, congress, bill_type, bill_number, chunker, commit=False)
         conn.commit()
         logging.info(f"Updated summary for bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
     except sqlite3.Error as e:
         logging.error(f"Error updating summary: {str(e)}")
         raise
 
-def construct_prompt(congress, bill_type, bill_number, bill_title, previous_context, bill_text, next_context, bill_actions, text_part):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
-    
-    prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
-You are an unbiased reporter tasked with summarizing legislation. Provide a detailed 4-5 paragraph summary of the given bill, including current actions and important facts. Follow these guidelines:
+# The system block is identical for every part, so the server reuses its KV cache and only
+# evaluates the user block of each prompt
+SUMMARY_SYSTEM_PROMPT = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+You are an unbiased reporter tasked with summarizing legislation. Provide a detailed 4-5 paragraph summary of the given bill part, including current actions and important facts. Follow these guidelines:
 
 - Do not provide a title or helper text like "Here is a summary of [x]..."
 - Use plain text without formatting
@@ -144,27 +160,34 @@ You are an unbiased reporter tasked with summarizing legislation. Provide a deta
 - Present insights chronologically if applicable
 - Include section numbers for referenced bill text
 - Use the provided information about bill types and key action meanings
-- This summary is for text part: {text_part}
+- Summarize only the text part given, which covers the sections listed with it
+- The bill text contains whole sections; cite them by their SEC. numbers
+
+{KEY_ACTION_MEANINGS}
+{BILL_TYPE_DEFINITIONS}
 
-Today's date is {today_date}. Current sitting President: Joe Biden
+<|eot_id|>"""
+
+def construct_prompt(congress, bill_type, bill_number, bill_title, section_start, section_end, bill_text, bill_actions, text_part):
+    if section_start and section_end and section_start != section_end:
+        section_range = f"{section_start} through {section_end}"
+    else:
+        section_range = section_start or section_end or "the sections contained in the bill text below"
+    
+    prompt = f"""{SUMMARY_SYSTEM_PROMPT}<|start_header_id|>user<|end_header_id|>
+{dated_context()}
 
-<|eot_id|><|start_header_id|>user<|end_header_id|>
 Summarize the following legislation:
 
 Congress: {congress}
 Bill Title: {bill_title}
 Bill Type and Number: {bill_type}{bill_number}
 Text Part: {text_part}
-
-Previous Context:
-{previous_context}
+Sections: {section_range}
 
 Bill Text:
 {bill_text}
 
-Next Context:
-{next_context}
-
 Bill Actions:
 {bill_actions}
 
@@ -174,65 +197,70 @@ Bill Actions:
     return prompt
 
 def generate_content(prompt):
-    try:
-        response = client.generate(
-            model=model,
-            prompt=prompt
-        )
-        logging.info("Generated content from local LLM")
-        return response['response']
-    except Exception as e:
-        logging.error(f"Error generating content: {str(e)}")
-        raise
-
-def process_bill(conn_data, conn_text, congress, bill_type, bill_number, text_part, previous_context, bill_text, next_context, existing_summary):
-    try:
-        # Check if summary already exists
+    # Runs on a request pool worker thread; returns the whole response so timings can be reported
+    response = client.generate(
+        model=model,
+        prompt=prompt,
+        keep_alive=ollama_keep_alive
+    )
+    logging.info("Generated content from local LLM")
+    log_ollama_usage(response, "Summary prompt")
+    return response
+
+def build_summary_prompt(conn_data, congress, bill_type, bill_number, text_part, section_start, section_end, bill_text):
+    # Returns the summary prompt for a text part, or None when its bill data is incomplete
+    bill_info = get_bill_info(conn_data, congress, bill_type, bill_number)
+    bill_url = get_bill_url(conn_data, congress, bill_type, bill_number)
+    bill_actions = get_bill_actions(conn_data, congress, bill_type, bill_number)
+
+    if bill_info and bill_url and bill_actions:
+        bill_title = bill_info[0]
+        return construct_prompt(congress, bill_type, bill_number, bill_title, section_start, section_end, bill_text, bill_actions, text_part)
+    logging.warning(f"Unable to find complete information for bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
+    return None
+
+def summary_jobs(conn_data, all_bills):
+    # Prompts are built on the main thread as request slots free up
+    for bill in all_bills:
+        congress, bill_type, bill_number, text_part, section_start, section_end, bill_text, existing_summary = bill
         if existing_summary:
             logging.info(f"Skipping bill {congress}.{bill_type}.{bill_number}, text part: {text_part} - summary already exists")
-            return False  # Indicate that the bill was skipped
-
-        bill_info = get_bill_info(conn_data, congress, bill_type, bill_number)
-        bill_url = get_bill_url(conn_data, congress, bill_type, bill_number)
-        bill_actions = get_bill_actions(conn_data, congress, bill_type, bill_number)
-
-        if bill_info and bill_url and bill_actions:
-            bill_title = bill_info[0]
-            formatted_text_url = bill_url[0]
-
-            summary_prompt = construct_prompt(congress, bill_type, bill_number, bill_title, previous_context, bill_text, next_context, bill_actions, text_part)
-            summary = generate_content(summary_prompt)
-            update_summary(conn_text, congress, bill_type, bill_number, text_part, summary)
-
-            logging.info(f"Successfully processed bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
-            return True  # Indicate that the bill was processed
+            continue
+        try:
+            prompt = build_summary_prompt(conn_data, congress, bill_type, bill_number, text_part, section_start, section_end, bill_text)
+        except Exception as e:
+            logging.error(f"Error processing bill {congress}.{bill_type}.{bill_number}, text part: {text_part}: {str(e)}")
+            continue
+        if prompt:
+            yield (congress, bill_type, bill_number, text_part), prompt
         else:
-            logging.warning(f"Unable to find complete information for bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
-            return False  # Indicate that the bill was skipped due to incomplete information
-
-    except Exception as e:
-        logging.error(f"Error processing bill {congress}.{bill_type}.{bill_number}, text part: {text_part}: {str(e)}")
-        return False  # Indicate that the bill processing failed
+            logging.info(f"Skipped bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Summarize active bill text parts with the local LLM")
+    parser.add_argument("--workers", type=int, default=summary_workers, help="Summary requests kept in flight")
+    args = parser.parse_args()
+
     try:
         active_bill_data_db = os.path.join(script_dir, 'sys_db', 'active_bill_data.db')
         active_bill_text_db = os.path.join(script_dir, 'sys_db', 'active_bill_text.db')
 
         conn_data = connect_to_db(active_bill_data_db)
         conn_text = connect_to_db(active_bill_text_db)
+        register_text_codec(conn_text)
+        create_manifest_table(conn_text)
+        migrate(conn_data, ACTIVE_BILL_DATA)
+        migrate(conn_text, ACTIVE_BILL_TEXT)
 
         all_bills = get_all_bills(conn_text)
 
-        for bill in all_bills:
-            congress, bill_type, bill_number, text_part, previous_context, bill_text, next_context, existing_summary = bill
+        def write_summary(key, response):
+            congress, bill_type, bill_number, text_part = key
+            update_summary(conn_text, congress, bill_type, bill_number, text_part, response['response'])
+            logging.info(f"Bill processed: {congress}.{bill_type}.{bill_number}, text part: {text_part}")
 
-            bill_processed = process_bill(conn_data, conn_text, congress, bill_type, bill_number, text_part, previous_context, bill_text, next_context, existing_summary)
-            
-            if bill_processed:
-                logging.info(f"Bill processed: {congress}.{bill_type}.{bill_number}, text part: {text_part}")
-            else:
-                logging.info(f"Skipped bill {congress}.{bill_type}.{bill_number}, text part: {text_part}")
+        stats = run_in_flight(summary_jobs(conn_data, all_bills), generate_content, write_summary, args.workers)
+        logging.info(f"Summaries complete with {args.workers} requests in flight: {stats.report()}")
 
         conn_data.close()
         conn_text.close()
@@ -1,10 +1,16 @@
 import os
 import sqlite3
-import datetime
 import logging
 import re
 from ollama import Client
 
+from text_compression import register_text_codec
+from db_connections import get_connection
+from schema_migrations import ACTIVE_BILL_DATA, ACTIVE_BILL_TEXT, migrate
+from token_chunker import TokenChunker
+from bill_manifest import STRATEGY_SUMMARIES, build_prompt_text, create_manifest_table
+from prompt_preamble import dated_context, ollama_keep_alive
+
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
 script_dir = os.path.dirname(script_path)
@@ -20,12 +26,35 @@ logging.basicConfig(filename=log_file, level=logging.INFO,
 client = Client(host='http://localhost:10001')
 model = 'llama3.1:8b-instruct-q8_0'
 
+# Ollama's default context is far smaller than llama3.1's, so the window is set explicitly and the
+# bill summaries are budgeted to fit it with room for the instructions, actions and answer
+context_window = 16384
+summary_token_budget = 12000
+
+chunker = TokenChunker()
+
+# The answer is streamed and generation stops as soon as it reads as one of the labels (or can no
+# longer become one), so a rambling model costs a few tokens instead of a paragraph. num_predict
+# caps the answer in any case. With use_constrained_format the server's JSON schema grammar only
+# lets the model produce {"importance": "<label>"}.
+IMPORTANCE_LABELS = ["Must Know", "Important", "Minimal"]
+classification_max_tokens = 8
+use_constrained_format = False
+constrained_max_tokens = 24
+IMPORTANCE_FORMAT = {
+    "type": "object",
+    "properties": {"importance": {"type": "string", "enum": IMPORTANCE_LABELS}},
+    "required": ["importance"],
+}
+JSON_LABEL_PREFIX = re.compile(r'^\s*\{\s*"importance"\s*:\s*"')
+LABEL_STRIP_CHARS = ' \t\r\n"\'*`'
+
 # Compile the regex pattern
 MUST_KNOW_PATTERN = re.compile(r'\b(President|Public Law)\b', re.IGNORECASE)
 
 def connect_to_db(db_path):
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         conn.text_factory = str
         logging.info(f"Successfully connected to database: {db_path}")
         return conn
@@ -70,25 +99,6 @@ def get_bill_actions(conn, congress, bill_type, bill_number):
         logging.error(f"Error retrieving bill actions: {str(e)}")
         raise
 
-def get_bill_text_parts_with_summaries(conn, congress, bill_type, bill_number):
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT text_part, summary
-            FROM bill_text
-            WHERE congress = ? AND bill_type = ? AND bill_number = ? AND summary IS NOT NULL AND summary != ''
-            ORDER BY text_part
-        """, (congress, bill_type, bill_number))
-        result = cursor.fetchall()
-        if result:
-            logging.info(f"Retrieved {len(result)} bill text parts with summaries for {congress}.{bill_type}.{bill_number}")
-        else:
-            logging.warning(f"No bill text parts with summaries found for {congress}.{bill_type}.{bill_number}")
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error retrieving bill text parts with summaries: {str(e)}")
-        raise
-
 def get_bills_needing_importance(conn_data, conn_text):
     try:
         cursor_data = conn_data.cursor()
@@ -159,22 +169,22 @@ def update_importance(conn, congress, bill_type, bill_number, importance):
         logging.error(f"Error updating importance: {str(e)}")
         raise
 
-def construct_prompt(congress, bill_type, bill_number, bill_title, bill_text_parts, bill_actions):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
-    
-    bill_summaries = "\n".join([f"Part {part}: {summary}" for part, summary in bill_text_parts])
-    actions_text = "\n".join([f"{date}: {action}" for date, action in bill_actions])
-    
-    prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
-Today Date: {today_date}
+# Identical for every bill so the server reuses its KV cache; the date moved to the user block
+IMPORTANCE_SYSTEM_PROMPT = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
 You are a helpful assistant tasked with providing a concise assessment of legislative importance. 
 Your response should be a single word chosen from "Must Know", "Important", or "Minimal". 
 This assessment should be based on the bill's potential impact on the nation and society, considering its full context and any controversial aspects from an unbiased perspective. 
 Information about the current Congress, bill number, title, bill summaries, and actions will be provided. 
 Note that any bill actions involving the President are always categorized as "Must Know".
-Do not provide any additional context or explanation beyond the single-word response.<|eot_id|>
+Do not provide any additional context or explanation beyond the single-word response.<|eot_id|>"""
+
+def construct_prompt(congress, bill_type, bill_number, bill_title, bill_summaries, bill_actions):
+    actions_text = "\n".join([f"{date}: {action}" for date, action in bill_actions])
+    
+    prompt = f"""{IMPORTANCE_SYSTEM_PROMPT}
 
 <|start_header_id|>user<|end_header_id|>
+{dated_context()}
 Please assess the importance of the following bill:
 
 <Congress>{congress}</Congress>
@@ -193,14 +203,49 @@ Respond with only one word: "Must Know", "Important", or "Minimal".<|eot_id|>
     logging.info(f"Constructed importance prompt for bill {congress}.{bill_type}.{bill_number}")
     return prompt
 
+def match_label(text):
+    # Returns (label, still_possible) for the answer streamed so far
+    if use_constrained_format:
+        prefix = JSON_LABEL_PREFIX.match(text)
+        if not prefix:
+            return None, True
+        text = text[prefix.end():]
+    candidate = text.lstrip(LABEL_STRIP_CHARS).lower()
+    for label in IMPORTANCE_LABELS:
+        if candidate.startswith(label.lower()):
+            return label, True
+    return None, any(label.lower().startswith(candidate) for label in IMPORTANCE_LABELS)
+
 def generate_content(prompt):
+    # Returns the importance label, or None when the answer is not one of the labels
+    options = {"num_ctx": context_window,
+               "num_predict": constrained_max_tokens if use_constrained_format else classification_max_tokens}
+    kwargs = {"format": IMPORTANCE_FORMAT} if use_constrained_format else {}
     try:
-        response = client.generate(
+        stream = client.generate(
             model=model,
-            prompt=prompt
+            prompt=prompt,
+            stream=True,
+            keep_alive=ollama_keep_alive,
+            options=options,
+            **kwargs
         )
-        logging.info("Generated content from local LLM")
-        return response['response'].strip()
+        text = ""
+        chunks = 0
+        label = None
+        try:
+            for chunk in stream:
+                text += chunk['response']
+                chunks += 1
+                label, possible = match_label(text)
+                if label or not possible:
+                    break
+        finally:
+            # Closing the stream drops the connection, which stops generation on the server
+            stream.close()
+        logging.info(f"Generated content from local LLM: {text.strip()!r} after {chunks} streamed tokens"
+                     f"{'' if label else ' (no label)'}")
+        return label
     except Exception as e:
         logging.error(f"Error generating content: {str(e)}")
         raise
@@ -226,17 +271,19 @@ def process_bill(conn_data, conn_text, congress, bill_type, bill_number):
             return True
 
         bill_actions = get_bill_actions(conn_data, congress, bill_type, bill_number)
-        bill_text_parts = get_bill_text_parts_with_summaries(conn_text, congress, bill_type, bill_number)
+        # Part summaries when they fit the context window, otherwise as many as fit (or the full
+        # text of a short bill whose summaries are still missing)
+        _, bill_summaries = build_prompt_text(conn_text, congress, bill_type, bill_number, summary_token_budget, STRATEGY_SUMMARIES, chunker)
 
-        if not bill_text_parts:
+        if not bill_summaries:
             logging.warning(f"No bill text parts with summaries found for {congress}.{bill_type}.{bill_number}. Skipping.")
             return False
 
-        importance_prompt = construct_prompt(congress, bill_type, bill_number, bill_title, bill_text_parts, bill_actions)
+        importance_prompt = construct_prompt(congress, bill_type, bill_number, bill_title, bill_summaries, bill_actions)
         importance = generate_content(importance_prompt)
         
-        if importance not in ["Must Know", "Important", "Minimal"]:
-            logging.warning(f"Invalid importance rating '{importance}' for bill {congress}.{bill_type}.{bill_number}. Skipping update.")
+        if importance not in IMPORTANCE_LABELS:
+            logging.warning(f"Invalid importance rating for bill {congress}.{bill_type}.{bill_number}. Skipping update.")
             return False
 
         update_importance(conn_data, congress, bill_type, bill_number, importance)
@@ -260,6 +307,10 @@ def main():
         
         logging.info(f"Connecting to active_bill_text.db at {active_bill_text_db}")
         conn_text = connect_to_db(active_bill_text_db)
+        register_text_codec(conn_text)
+        create_manifest_table(conn_text)
+        migrate(conn_data, ACTIVE_BILL_DATA)
+        migrate(conn_text, ACTIVE_BILL_TEXT)
 
         logging.info("Retrieving bills needing importance ratings")
         bills_needing_importance = get_bills_needing_importance(conn_data, conn_text)
@@ -0,0 +1,109 @@
+# Shared active_bill_list schema and bulk upsert used by get_base_active_bills.py and get_recent_active_bills.py.
+# A page of bills is written with one executemany of INSERT ... ON CONFLICT DO UPDATE, which only
+# replaces a stored bill when the incoming latestActionDate is newer.
+
+ACTIVE_BILL_LIST_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS active_bill_list (
+    congress INTEGER,
+    billNumber TEXT,
+    billType TEXT,
+    title TEXT,
+    originChamber TEXT,
+    originChamberCode TEXT,
+    latestActionDate TEXT,
+    latestActionText TEXT,
+    updateDate TEXT,
+    url TEXT,
+    actions_updated INTEGER DEFAULT 0,
+    insert_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    importance TEXT,
+    tweet_created INTEGER DEFAULT 0,
+    PRIMARY KEY (congress, billNumber, billType)
+)
+'''
+
+UPSERT_BILL_SQL = '''
+INSERT INTO active_bill_list (
+    congress, billNumber, billType, title, originChamber, originChamberCode,
+    latestActionDate, latestActionText, updateDate, url, actions_updated, insert_date, importance, tweet_created
+) VALUES (?, ?, lower(?), ?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, NULL, 0)
+ON CONFLICT(congress, billNumber, billType) DO UPDATE SET
+    title = excluded.title,
+    originChamber = excluded.originChamber,
+    originChamberCode = excluded.originChamberCode,
+    latestActionDate = excluded.latestActionDate,
+    latestActionText = excluded.latestActionText,
+    updateDate = excluded.updateDate,
+    url = excluded.url,
+    actions_updated = 0,
+    importance = NULL,
+    insert_date = CURRENT_TIMESTAMP,
+    tweet_created = 0
+WHERE excluded.latestActionDate > active_bill_list.latestActionDate
+'''
+
+def ensure_active_bill_list(conn):
+    conn.execute(ACTIVE_BILL_LIST_SCHEMA)
+
+    # Tables created by older versions of get_base_active_bills.py have no primary key and no
+    # tweet_created column. ON CONFLICT needs a unique key, so duplicates are collapsed to the
+    # most recently inserted row before it is added.
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(active_bill_list)')]
+    if 'tweet_created' not in columns:
+        conn.execute('ALTER TABLE active_bill_list ADD COLUMN tweet_created INTEGER DEFAULT 0')
+
+    unique_keys = [row for row in conn.execute('PRAGMA index_list(active_bill_list)') if row[2]]
+    if not unique_keys:
+        conn.execute('''
+        DELETE FROM active_bill_list WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM active_bill_list GROUP BY congress, billNumber, billType
+        )
+        ''')
+        conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_active_bill_list_key
+        ON active_bill_list (congress, billNumber, billType)
+        ''')
+    conn.commit()
+
+def bill_row(bill):
+    return (
+        bill["congress"],
+        bill["number"],
+        bill["type"],
+        bill["title"],
+        bill["originChamber"],
+        bill["originChamberCode"],
+        bill["latestAction"]["actionDate"],
+        bill["latestAction"]["text"],
+        bill["updateDate"],
+        bill["url"]
+    )
+
+KEY_LOOKUP_BATCH = 500  # Bill numbers per lookup, under SQLite's 999 variable limit
+
+def bill_key(congress, number, bill_type):
+    return int(congress), str(number), bill_type.lower()
+
+def existing_keys(cursor, keys):
+    # Returns the keys already stored. Keys are grouped by congress and bill type so every lookup
+    # searches the primary key on all three columns.
+    groups = {}
+    for congress, number, bill_type in keys:
+        groups.setdefault((congress, bill_type), []).append(number)
+    found = set()
+    for (congress, bill_type), numbers in groups.items():
+        for i in range(0, len(numbers), KEY_LOOKUP_BATCH):
+            batch = numbers[i:i + KEY_LOOKUP_BATCH]
+            cursor.execute(f'''
+            SELECT congress, billNumber, billType FROM active_bill_list
+            WHERE congress = ? AND billType = ? AND billNumber IN ({", ".join("?" for _ in batch)})
+            ''', [congress, bill_type, *batch])
+            found.update(bill_key(*row) for row in cursor.fetchall())
+    return found
+
+def upsert_bills(cursor, bills):
+    # Returns (updated_count, inserted_count). The caller owns the transaction.
+    keys = {bill_key(bill["congress"], bill["number"], bill["type"]) for bill in bills}
+    inserted_count = len(keys - existing_keys(cursor, keys))
+    cursor.executemany(UPSERT_BILL_SQL, [bill_row(bill) for bill in bills])
+    return cursor.rowcount - inserted_count, inserted_count
@@ -1,15 +1,32 @@
 import os
-import sqlite3
 import re
+import hashlib
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-import nltk
-nltk.download('punkt_tab', quiet=True)
-from nltk.tokenize import word_tokenize
-from bs4 import BeautifulSoup
+
+from text_extractor import get_extractor
+from token_chunker import TokenChunker, normalize_whitespace
+from bill_sections import chunk_sections
+from streaming_chunker import stream_chunks, iter_html_text
+from text_compression import COMPRESSED_COLUMNS, register_text_codec
+from bill_manifest import create_manifest_table, refresh_manifest
+from db_connections import get_connection
+from schema_migrations import ACTIVE_BILL_TEXT, migrate
 
 # constraints
 token_max_size = 15000
-context_size = 500
+
+# Documents larger than stream_threshold_mb are parsed in blocks, holding at most memory_limit_mb of text
+stream_threshold_mb = 4
+memory_limit_mb = 256
+
+# With --workers N, bills written per commit by the single writer
+write_batch_size = 50
+
+# HTML extractor: None picks the fastest installed backend (lxml, selectolax, then html.parser)
+text_extractor = None
 
 # Define the paths relative to the script's location
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,8 +34,15 @@ htm_folder = os.path.join(script_dir, 'active_bill_text_htm')
 db_folder = os.path.join(script_dir, 'sys_db')
 db_path = os.path.join(db_folder, 'active_bill_text.db')
 
+extract_text = get_extractor(text_extractor)
+chunker = TokenChunker()
+
+# Generated per-part output, kept across re-tokenization when a part's text is unchanged
+output_columns = ["summary", "formal_report", "appropriations", "most_important_facts",
+                  "most_controversial_facts", "prompt_text", "prompt_response", "summary_tokens"]
+
 def create_database():
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS bill_text (
@@ -37,10 +61,23 @@ def create_database():
             most_important_facts TEXT,
             most_controversial_facts TEXT,
             prompt_text TEXT,
-            prompt_response TEXT
+            prompt_response TEXT,
+            section_start TEXT,
+            section_end TEXT,
+            text_sha256 TEXT,
+            chunk_sha256 TEXT,
+            summary_tokens INTEGER
         )
     ''')
+    # Databases created before section-aware chunking / content hashing lack the newer columns
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(bill_text)')]
+    for column in ('section_start', 'section_end', 'text_sha256', 'chunk_sha256'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE bill_text ADD COLUMN {column} TEXT')
     conn.commit()
+    register_text_codec(conn)
+    create_manifest_table(conn)
+    migrate(conn, ACTIVE_BILL_TEXT)
     return conn
 
 def parse_filename(filename):
@@ -55,83 +92,200 @@ def parse_filename(filename):
         return congress, bill_type, bill_number, last_action_date, file_gen_date
     return None, None, None, None, None
 
-def tokenize_text(text):
-    return word_tokenize(text)
+def text_sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
-def get_context(tokens, part_index, total_parts):
-    prev_context = ' '.join(tokens[max(0, part_index*token_max_size - context_size):part_index*token_max_size])
-    next_context = ' '.join(tokens[min((part_index+1)*token_max_size, len(tokens)):min((part_index+1)*token_max_size + context_size, len(tokens))])
-    return prev_context, next_context
+def streamed_text_sha256(htm_path):
+    # Large documents are hashed block by block so the text is never held whole
+    digest = hashlib.sha256()
+    for text in iter_html_text(htm_path):
+        digest.update(normalize_whitespace(text).encode('utf-8'))
+    return digest.hexdigest()
 
-def insert_tokens(conn, congress, bill_type, bill_number, content):
-    cursor = conn.cursor()
+def tokenize_file(htm_path, known_sha256=None):
+    # Returns (text_sha256, parts) with parts as (text, token_count, section_start, section_end).
+    # parts is None when the normalized text hashes to known_sha256, i.e. nothing changed. Large
+    # documents are streamed, so parts is then a generator that fills as it is consumed.
+    if os.path.getsize(htm_path) > stream_threshold_mb * 1024 * 1024:
+        digest = streamed_text_sha256(htm_path)
+        if digest == known_sha256:
+            return digest, None
+        return digest, stream_chunks(htm_path, chunker, token_max_size, memory_limit_mb=memory_limit_mb)
+
+    # Read the entire HTML content as a string
+    with open(htm_path, 'r', encoding='utf-8') as file:
+        html_content = file.read()
+
+    text = normalize_whitespace(extract_text(html_content))
+    digest = text_sha256(text)
+    if digest == known_sha256:
+        return digest, None
+
+    # Whole sections are packed into each part; chunks are offsets into the normalized text
+    return digest, [(text[start:end], token_count, section_start, section_end)
+                    for start, end, token_count, section_start, section_end in chunk_sections(chunker, text, token_max_size)]
+
+def tokenize_worker(htm_path, known_sha256=None):
+    # Runs in a worker process; parts are returned to the writer as a list
+    digest, parts = tokenize_file(htm_path, known_sha256)
+    return digest, None if parts is None else list(parts)
+
+def saved_outputs(cursor, congress, bill_type, bill_number):
+    # LLM output already generated for the bill, keyed by the hash of the chunk it was generated from.
+    # Rows tokenized before chunk hashes were stored are hashed from their text. Outputs are
+    # copied as stored, without decompressing them.
+    cursor.execute(f'''
+        SELECT chunk_sha256, CASE WHEN chunk_sha256 IS NULL THEN decompress_text(bill_text) END, {", ".join(output_columns)} FROM bill_text
+        WHERE congress = ? AND bill_type = ? AND bill_number = ?
+    ''', (congress, bill_type, bill_number))
+    outputs = {}
+    for chunk_sha256, bill_text, *values in cursor.fetchall():
+        if any(values):
+            outputs[chunk_sha256 or text_sha256(bill_text or '')] = values
+    return outputs
+
+def insert_tokens(cursor, congress, bill_type, bill_number, digest, parts, outputs):
+    # Returns the number of parts that kept saved outputs. Rows are generated as executemany
+    # consumes them, so streamed parts are written as they fill and never held together.
     current_time = datetime.now().isoformat()
-    
-    tokens = tokenize_text(content)
-    text_parts = []
-    
-    for i in range(0, len(tokens), token_max_size):
-        text_parts.append(' '.join(tokens[i:i+token_max_size]))
-    
-    for i, text in enumerate(text_parts, 1):
-        prev_context, next_context = get_context(tokens, i-1, len(text_parts))
+    empty = [None] * len(output_columns)
+    kept = 0
+
+    def rows():
+        nonlocal kept
+        for i, (text, token_count, section_start, section_end) in enumerate(parts, 1):
+            chunk_sha256 = text_sha256(text)
+            saved = outputs.get(chunk_sha256)
+            kept += saved is not None
+            yield (congress, bill_type, bill_number, current_time, token_count, i, text, section_start, section_end,
+                   digest, chunk_sha256, *(saved or empty))
+
+    columns = ["congress", "bill_type", "bill_number", "tokenized_date", "token_count", "text_part", "bill_text",
+               "section_start", "section_end", "text_sha256", "chunk_sha256"] + output_columns
+    cursor.executemany(f'''
+        INSERT INTO bill_text ({", ".join(columns)})
+        VALUES ({", ".join("compress_text(?)" if column in COMPRESSED_COLUMNS else "?" for column in columns)})
+    ''', rows())
+    return kept
+
+def write_bill(conn, congress, bill_type, bill_number, digest, parts, commit=True):
+    # Existing entries for the bill are replaced in the same transaction. Summaries and other
+    # generated columns carry over to any new part whose text is identical to an old one.
+    cursor = conn.cursor()
+    if parts is None:
+        # Same text as last time: only the tokenized date moves forward
         cursor.execute('''
-            INSERT INTO bill_text (congress, bill_type, bill_number, tokenized_date, token_count, text_part, bill_text, previous_context, next_context)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (congress, bill_type, bill_number, current_time, len(text.split()), i, text, prev_context, next_context))
-    
-    conn.commit()
+            UPDATE bill_text SET tokenized_date = ?
+            WHERE congress = ? AND bill_type = ? AND bill_number = ?
+        ''', (datetime.now().isoformat(), congress, bill_type, bill_number))
+        kept = None
+    else:
+        outputs = saved_outputs(cursor, congress, bill_type, bill_number)
+        cursor.execute('''
+            DELETE FROM bill_text 
+            WHERE congress = ? AND bill_type = ? AND bill_number = ?
+        ''', (congress, bill_type, bill_number))
+        kept = insert_tokens(cursor, congress, bill_type, bill_number, digest, parts, outputs)
+        refresh_manifest(conn, congress, bill_type, bill_number, chunker, commit=False)
+    if commit:
+        conn.commit()
+    return kept
 
-def process_htm_file(htm_path, conn):
+def bill_to_tokenize(htm_path, conn):
+    # Returns (congress, bill_type, bill_number, text_sha256) when the file is newer than the stored parts
     congress, bill_type, bill_number, last_action_date, file_gen_date = parse_filename(os.path.basename(htm_path))
     if not all((congress, bill_type, bill_number, last_action_date, file_gen_date)):
         print(f"Skipping {htm_path}: Unable to parse filename")
-        return
+        return None
 
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT MAX(tokenized_date) FROM bill_text 
+        SELECT MAX(tokenized_date), MAX(text_sha256) FROM bill_text 
         WHERE congress = ? AND bill_type = ? AND bill_number = ?
     ''', (congress, bill_type, bill_number))
-    last_tokenized_date = cursor.fetchone()[0]
+    last_tokenized_date, known_sha256 = cursor.fetchone()
 
     if last_tokenized_date:
         last_tokenized_date = datetime.fromisoformat(last_tokenized_date)
         if last_tokenized_date >= file_gen_date:
             print(f"Skipping {htm_path}: DB entry is up to date")
-            return
+            return None
 
-    # Delete existing entries for this bill
-    cursor.execute('''
-        DELETE FROM bill_text 
-        WHERE congress = ? AND bill_type = ? AND bill_number = ?
-    ''', (congress, bill_type, bill_number))
-    conn.commit()
+    return congress, bill_type, bill_number, known_sha256
 
-    # Read the entire HTML content as a string
-    with open(htm_path, 'r', encoding='utf-8') as file:
-        html_content = file.read()
-    
-    # Extract text content from HTML
-    soup = BeautifulSoup(html_content, 'html.parser')
-    text_content = soup.get_text()
+def report_write(htm_path, parts, kept):
+    if parts is None:
+        print(f"Text unchanged for {os.path.basename(htm_path)}; kept existing parts")
+    elif kept:
+        print(f"Kept generated output for {kept} unchanged parts of {os.path.basename(htm_path)}")
+
+def process_htm_file(htm_path, conn):
+    bill = bill_to_tokenize(htm_path, conn)
+    if not bill:
+        return False
+    congress, bill_type, bill_number, known_sha256 = bill
+    digest, parts = tokenize_file(htm_path, known_sha256)
+    kept = write_bill(conn, congress, bill_type, bill_number, digest, parts)
+    report_write(htm_path, parts, kept)
+    return parts is not None
 
-    insert_tokens(conn, congress, bill_type, bill_number, text_content)
+def process_parallel(htm_paths, conn, workers):
+    # Parsing and tokenizing fan out to worker processes; this process is the only writer
+    bills = {}
+    for htm_path in htm_paths:
+        bill = bill_to_tokenize(htm_path, conn)
+        if bill:
+            bills[htm_path] = bill
+
+    written = 0
+    unwritten = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(tokenize_worker, htm_path, bills[htm_path][3]): htm_path for htm_path in bills}
+        for future in as_completed(futures):
+            htm_path = futures[future]
+            try:
+                digest, parts = future.result()
+            except Exception as e:
+                print(f"Failed to tokenize {htm_path}: {e}")
+                continue
+            kept = write_bill(conn, *bills[htm_path][:3], digest, parts, commit=False)
+            report_write(htm_path, parts, kept)
+            if parts is not None:
+                written += 1
+            unwritten += 1
+            if unwritten >= write_batch_size:
+                conn.commit()
+                unwritten = 0
+            print(f"Processed {os.path.basename(htm_path)}")
+    conn.commit()
+    return written
 
 def main():
+    parser = argparse.ArgumentParser(description="Tokenize active bill text into active_bill_text.db")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for parsing and tokenizing")
+    args = parser.parse_args()
+
     if not os.path.exists(db_folder):
         os.makedirs(db_folder)
         print(f"Created database folder: {db_folder}")
 
     conn = create_database()
+    start_time = time.monotonic()
 
-    for filename in os.listdir(htm_folder):
-        if filename.endswith('.htm'):
-            htm_path = os.path.join(htm_folder, filename)
-            process_htm_file(htm_path, conn)
-            print(f"Processed {filename}")
+    htm_paths = [os.path.join(htm_folder, filename) for filename in os.listdir(htm_folder) if filename.endswith('.htm')]
+    if args.workers > 1:
+        tokenized = process_parallel(htm_paths, conn, args.workers)
+    else:
+        tokenized = 0
+        for htm_path in htm_paths:
+            if process_htm_file(htm_path, conn):
+                tokenized += 1
+            print(f"Processed {os.path.basename(htm_path)}")
 
     conn.close()
 
+    elapsed = time.monotonic() - start_time
+    print(f"Tokenized {tokenized} of {len(htm_paths)} files in {elapsed:.1f} seconds ({tokenized / elapsed if elapsed else 0:.2f} files/sec)")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,17 +2,14 @@
 # It does this by getting the bill URL xml, comparing the db action dates against the date of existing files, and then scrapes the URL if data is new.
 
 import os
-import sqlite3
 from datetime import datetime
-import requests
 from pathlib import Path
 import logging
-import time
 import sys
 
-# Delay constants
-DELAY_BETWEEN_CALLS = 1  # 1 second delay between API calls
-RETRY_DELAY = 60  # 60 second retry delay on connection error
+from document_downloader import download_all
+from document_store import DocumentStore
+from db_connections import get_connection
 
 # Configure Loggins
 log_file = os.path.join(os.getcwd(), "congress_api_scraper", "Logs", "add_update_bill_xml.log")
@@ -31,93 +28,68 @@ def connect_to_db():
     if not os.path.exists(db_path):
         logging.error(f"Database file not found: {db_path}")
         sys.exit(1)
-    return sqlite3.connect(db_path)
+    return get_connection(db_path)
 
 def get_bill_urls(conn):
     cursor = conn.cursor()
     cursor.execute("SELECT congress, bill_type, bill_number, latest_date, formatted_xml_url FROM bill_urls")
     return cursor.fetchall()
 
-def save_xml_content(url, filename):
-    try:
-        logging.info(f"Attempting to fetch URL: {url}")
-        response = requests.get(url, timeout=30)  # Add a timeout
-        response.raise_for_status()  # Raise an exception for bad status codes
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        logging.info(f"Successfully saved content to {filename}")
-        return True
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to fetch or save URL {url}. Error: {str(e)}")
-        return False
-
-def delete_outdated_files(conn):
+def delete_outdated_files(conn, store):
     cursor = conn.cursor()
-    output_dir = os.path.join(SCRIPT_DIR, OUTPUT_FOLDER)
-    files = os.listdir(output_dir)
-    for file in files:
-        parts = file.split('.')
-        if len(parts) >= 5:
-            congress, bill_type, bill_number, file_date = parts[:4]
-            cursor.execute("""
-                SELECT latest_date FROM bill_urls 
-                WHERE congress = ? AND bill_type = ? AND bill_number = ?
-            """, (congress, bill_type, bill_number))
-            result = cursor.fetchone()
-            if result:
-                db_date = datetime.strptime(result[0], "%Y-%m-%dT%H:%M:%SZ").date()
-                file_date = datetime.strptime(file_date, "%Y-%m-%d").date()
-                if db_date > file_date:
-                    os.remove(os.path.join(output_dir, file))
-                    logging.info(f"Deleted outdated file: {file}")
-
-def file_exists(congress, bill_type, bill_number, formatted_date):
-    output_dir = os.path.join(SCRIPT_DIR, OUTPUT_FOLDER)
-    for file in os.listdir(output_dir):
-        parts = file.split('.')
-        if len(parts) >= 5:
-            if parts[0] == congress and parts[1] == bill_type and parts[2] == bill_number and parts[3] == formatted_date:
-                return True
-    return False
+    cursor.execute("SELECT congress, bill_type, bill_number, latest_date FROM bill_urls")
+    latest_versions = [(congress, bill_type, bill_number, datetime.strptime(latest_date, "%Y-%m-%dT%H:%M:%SZ").strftime("%Y-%m-%d"))
+                       for congress, bill_type, bill_number, latest_date in cursor.fetchall()]
+    deleted = store.delete_stale(latest_versions)
+    logging.info(f"Deleted {deleted} outdated files")
 
 def main():
     logging.info("Starting XML Bill Scraper")
     conn = connect_to_db()
+    store = None
     try:
         # Ensure output folder exists
         output_dir = os.path.join(SCRIPT_DIR, OUTPUT_FOLDER)
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         logging.info(f"Output directory: {output_dir}")
+        store = DocumentStore(output_dir)
+        store.sync()
 
         # Delete outdated files
-        delete_outdated_files(conn)
+        delete_outdated_files(conn, store)
 
         # Fetch and save new/updated XML content
         bill_urls = get_bill_urls(conn)
         logging.info(f"Found {len(bill_urls)} bills to process")
+        jobs = []
         for congress, bill_type, bill_number, latest_date, url in bill_urls:
+            if not url:
+                # The latest text version has no Formatted XML (e.g. PDF only)
+                logging.warning(f"No Formatted XML URL for {congress}.{bill_type}.{bill_number}; skipping")
+                continue
             formatted_date = datetime.strptime(latest_date, "%Y-%m-%dT%H:%M:%SZ").strftime("%Y-%m-%d")
             
-            if not file_exists(congress, bill_type, bill_number, formatted_date):
+            if not store.has_version(congress, bill_type, bill_number, formatted_date):
                 current_date = datetime.now().strftime("%Y-%m-%d-%H%M")
                 filename = f"{congress}.{bill_type}.{bill_number}.{formatted_date}.{current_date}.xml"
-                full_path = os.path.join(output_dir, filename)
-                
-                if save_xml_content(url, full_path):
-                    logging.info(f"Saved: {filename}")
-                else:
-                    logging.error(f"Failed to save: {filename}")
-                
-                time.sleep(DELAY_BETWEEN_CALLS)
-            
+                jobs.append((url, os.path.join(output_dir, filename)))
             else:
                 logging.info(f"File already exists for {congress}.{bill_type}.{bill_number}.{formatted_date}")
 
+        # Download all new/updated documents concurrently
+        for result in download_all(jobs):
+            filename = os.path.basename(result["path"])
+            if result["ok"]:
+                store.register(result["path"], result["size"], result["sha256"])
+                logging.info(f"Saved: {filename}")
+            else:
+                logging.error(f"Failed to save: {filename}")
+
     except Exception as e:
         logging.exception("An unexpected error occurred:")
     finally:
-        conn.close()
+        if store:
+            store.close()
     
     logging.info("XML Bill Scraper completed")
 
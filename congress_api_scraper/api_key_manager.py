@@ -0,0 +1,125 @@
+# Quota budgeter for one or more api.data.gov keys.
+# Each response's X-RateLimit-Limit/X-RateLimit-Remaining headers are recorded per key, requests
+# go to whichever key has the most quota left, and when every key is spent the caller sleeps
+# until the earliest key's hourly window resets instead of retrying on a fixed delay.
+# Usage is persisted in SQLite so the separate subprocesses started by run_daily_updates.py
+# and automationV2.py share one budget.
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from db_connections import open_connection
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+QUOTA_DB = os.path.join(script_dir, "sys_db", "api_quota.db")
+
+WINDOW_SECONDS = 3600  # api.data.gov limits are per rolling hour
+DEFAULT_KEY_LIMIT = 5000  # Used until a response reports the real X-RateLimit-Limit
+
+
+def key_id(api_key):
+    # Only a hash of the key is written to disk
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class ApiKeyManager:
+    def __init__(self, api_keys, db_path=QUOTA_DB):
+        if not api_keys:
+            raise ValueError("At least one api.data.gov key is required")
+        self.api_keys = list(dict.fromkeys(api_keys))
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = open_connection(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_key_usage (
+                key_id TEXT PRIMARY KEY,
+                rate_limit INTEGER,
+                remaining INTEGER,
+                window_start REAL,
+                reset_time REAL,
+                updated REAL
+            )
+        """)
+        self.conn.commit()
+        self.usage = {api_key: self._load(api_key) for api_key in self.api_keys}
+
+    def _load(self, api_key):
+        row = self.conn.execute("""
+            SELECT rate_limit, remaining, window_start, reset_time FROM api_key_usage WHERE key_id = ?
+        """, (key_id(api_key),)).fetchone()
+        if row:
+            rate_limit, remaining, window_start, reset_time = row
+            return {"rate_limit": rate_limit, "remaining": remaining, "window_start": window_start, "reset_time": reset_time}
+        return {"rate_limit": DEFAULT_KEY_LIMIT, "remaining": DEFAULT_KEY_LIMIT, "window_start": None, "reset_time": None}
+
+    def _save(self, api_key):
+        usage = self.usage[api_key]
+        self.conn.execute("""
+            INSERT OR REPLACE INTO api_key_usage (key_id, rate_limit, remaining, window_start, reset_time, updated)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (key_id(api_key), usage["rate_limit"], usage["remaining"], usage["window_start"], usage["reset_time"], time.time()))
+        self.conn.commit()
+
+    def _refresh(self, api_key, now):
+        usage = self.usage[api_key]
+        if usage["reset_time"] is not None and now >= usage["reset_time"]:
+            usage["remaining"] = usage["rate_limit"]
+            usage["window_start"] = None
+            usage["reset_time"] = None
+
+    @property
+    def hourly_quota(self):
+        return sum(usage["rate_limit"] for usage in self.usage.values())
+
+    def next_key(self):
+        # Returns (api_key, 0) for the key with the most quota left, or (None, seconds) until
+        # the earliest reset when every key is spent
+        now = time.time()
+        for api_key in self.api_keys:
+            self._refresh(api_key, now)
+
+        api_key = max(self.api_keys, key=lambda k: self.usage[k]["remaining"])
+        usage = self.usage[api_key]
+        if usage["remaining"] > 0:
+            # Reserve the call now so concurrent requests spread across keys
+            usage["remaining"] -= 1
+            if usage["window_start"] is None:
+                usage["window_start"] = now
+                usage["reset_time"] = now + WINDOW_SECONDS
+            return api_key, 0
+
+        resets = [u["reset_time"] for u in self.usage.values() if u["reset_time"] is not None]
+        return None, max(min(resets) - now, 1) if resets else WINDOW_SECONDS
+
+    async def acquire(self):
+        while True:
+            api_key, wait = self.next_key()
+            if api_key:
+                return api_key
+            logging.warning(f"All {len(self.api_keys)} API keys are out of quota. Sleeping {wait:.0f} seconds until the next reset.")
+            await asyncio.sleep(wait)
+
+    def record(self, api_key, status, headers):
+        usage = self.usage[api_key]
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        if limit and limit.isdigit():
+            usage["rate_limit"] = int(limit)
+        if remaining and remaining.isdigit():
+            usage["remaining"] = int(remaining)
+        if status == 429:
+            usage["remaining"] = 0
+            retry_after = headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                usage["reset_time"] = time.time() + int(retry_after)
+            elif usage["reset_time"] is None:
+                usage["reset_time"] = time.time() + WINDOW_SECONDS
+        self._save(api_key)
+
+    def close(self):
+        for api_key in self.api_keys:
+            usage = self.usage[api_key]
+            logging.info(f"API key {key_id(api_key)[:6]}: {usage['remaining']}/{usage['rate_limit']} requests remaining this hour")
+        self.conn.close()
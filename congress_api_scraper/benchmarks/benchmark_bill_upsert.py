@@ -0,0 +1,117 @@
+# Benchmark for the active_bill_list write path.
+# Loads a synthetic 15,000-bill congress in 250-bill pages, then re-applies it with a newer
+# latestActionDate on half of the bills, and reports rows/sec for the old per-row
+# SELECT + UPDATE/INSERT path (connection opened per page) and the executemany upsert.
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_bill_upsert.py [--bills 15000]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from active_bill_list_store import ensure_active_bill_list, upsert_bills
+
+PAGE_SIZE = 250
+BILL_TYPES = ["hr", "s", "hres", "sres", "hjres", "sjres", "hconres", "sconres"]
+
+def synthetic_bills(count, congress=118, action_date="2024-01-15"):
+    bills = []
+    for i in range(count):
+        bills.append({
+            "congress": congress,
+            "number": str(i // len(BILL_TYPES) + 1),
+            "type": BILL_TYPES[i % len(BILL_TYPES)].upper(),
+            "title": f"Synthetic Act of 2024 number {i}",
+            "originChamber": "House",
+            "originChamberCode": "H",
+            "latestAction": {"actionDate": action_date, "text": "Referred to the Committee on Synthetic Affairs."},
+            "updateDate": action_date,
+            "url": f"https://api.congress.gov/v3/bill/{congress}/hr/{i}?format=json"
+        })
+    return bills
+
+def pages(bills):
+    for i in range(0, len(bills), PAGE_SIZE):
+        yield bills[i:i + PAGE_SIZE]
+
+def legacy_insert_or_update_bills(db_path, bills):
+    # The per-row path get_recent_active_bills.py used before the bulk upsert
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for bill in bills:
+        cursor.execute('''
+        SELECT latestActionDate FROM active_bill_list
+        WHERE congress = ? AND billNumber = ? AND billType = ?
+        ''', (bill["congress"], bill["number"], bill["type"].lower()))
+        existing_bill = cursor.fetchone()
+        if existing_bill:
+            if existing_bill[0] < bill["latestAction"]["actionDate"]:
+                cursor.execute('''
+                UPDATE active_bill_list SET
+                title = ?, originChamber = ?, originChamberCode = ?, latestActionDate = ?,
+                latestActionText = ?, updateDate = ?, url = ?,
+                actions_updated = 0, importance = NULL, insert_date = CURRENT_TIMESTAMP, tweet_created = 0
+                WHERE congress = ? AND billNumber = ? AND billType = ?
+                ''', (bill["title"], bill["originChamber"], bill["originChamberCode"], bill["latestAction"]["actionDate"],
+                      bill["latestAction"]["text"], bill["updateDate"], bill["url"],
+                      bill["congress"], bill["number"], bill["type"].lower()))
+        else:
+            cursor.execute('''
+            INSERT INTO active_bill_list (
+                congress, billNumber, billType, title, originChamber, originChamberCode,
+                latestActionDate, latestActionText, updateDate, url, actions_updated, insert_date, importance
+            ) VALUES (?, ?, lower(?), ?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, NULL)
+            ''', (bill["congress"], bill["number"], bill["type"], bill["title"], bill["originChamber"],
+                  bill["originChamberCode"], bill["latestAction"]["actionDate"], bill["latestAction"]["text"],
+                  bill["updateDate"], bill["url"]))
+    conn.commit()
+    conn.close()
+
+def run_legacy(db_path, bills):
+    start = time.perf_counter()
+    for page in pages(bills):
+        legacy_insert_or_update_bills(db_path, page)
+    return time.perf_counter() - start
+
+def run_upsert(db_path, bills):
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for page in pages(bills):
+        upsert_bills(cursor, page)
+        conn.commit()
+    conn.close()
+    return time.perf_counter() - start
+
+def fresh_db(folder, name):
+    db_path = os.path.join(folder, name)
+    conn = sqlite3.connect(db_path)
+    ensure_active_bill_list(conn)
+    conn.close()
+    return db_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark active_bill_list upserts")
+    parser.add_argument("--bills", type=int, default=15000, help="Number of synthetic bills in the congress")
+    args = parser.parse_args()
+
+    initial = synthetic_bills(args.bills)
+    delta = synthetic_bills(args.bills)
+    for bill in delta[::2]:
+        bill["latestAction"]["actionDate"] = "2024-02-01"
+
+    with tempfile.TemporaryDirectory() as folder:
+        for label, runner in (("per-row (before)", run_legacy), ("executemany upsert (after)", run_upsert)):
+            db_path = fresh_db(folder, f"{runner.__name__}.db")
+            load_time = runner(db_path, initial)
+            delta_time = runner(db_path, delta)
+            print(f"{label:28} initial load: {args.bills / load_time:10,.0f} rows/sec   "
+                  f"re-apply with 50% updated: {args.bills / delta_time:10,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Benchmark for db_connections.py.
+# Replays the database side of a daily run on synthetic data, once the old way (a fresh
+# sqlite3.connect per helper call, rollback journal, synchronous=FULL, a commit per write) and
+# once through the shared layer (one connection per database, WAL, synchronous=NORMAL, mmap,
+# explicit transactions), and reports the DB time of each stage:
+#   bill list   250-bill upsert pages plus the sync watermark (get_recent_active_bills.py)
+#   actions     the bills needing actions, then each bill's actions and flag (get_active_bill_actions.py)
+#   lookups     per-bill title/actions reads done by the summary and importance scripts
+#   bill text   per-bill text parts replaced in active_bill_text.db (active_bill_tokenizer_15000.py)
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_db_connections.py [--bills 5000] [--actions 10]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db_connections
+from active_bill_list_store import ensure_active_bill_list, upsert_bills
+from bill_sync_state import ensure_sync_state_table, advance_watermark
+from benchmark_bill_upsert import synthetic_bills, pages
+
+PART_TEXT = "SEC. 101. AUTHORIZATION OF APPROPRIATIONS. There are authorized to be appropriated such sums as may be necessary. " * 150
+PARTS_PER_BILL = 3
+
+ACTIONS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bill_actions (
+    congress INTEGER, billType TEXT, billNumber INTEGER, actionCode TEXT, actionDate DATE,
+    actionText TEXT, actionType TEXT,
+    PRIMARY KEY (congress, billType, billNumber, actionCode, actionDate)
+)
+'''
+BILL_TEXT_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bill_text (
+    congress INTEGER, bill_type TEXT, bill_number INTEGER, tokenized_date TIMESTAMP,
+    token_count INTEGER, text_part INTEGER, bill_text TEXT
+)
+'''
+
+
+class LegacyConnections:
+    # What every stage did before: open, configure nothing, commit, close
+    def get(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def release(self, conn):
+        conn.commit()
+        conn.close()
+
+    def transaction(self, conn):
+        return conn  # sqlite3.Connection as a context manager commits on exit
+
+
+class SharedConnections:
+    def get(self, db_path):
+        return db_connections.get_connection(db_path)
+
+    def release(self, conn):
+        pass
+
+    def transaction(self, conn):
+        return db_connections.transaction(conn)
+
+
+def action_rows(bill, count):
+    number = int(bill["number"])
+    return [(bill["congress"], bill["type"].lower(), number, f"H{i:04d}", f"2024-01-{i % 28 + 1:02d}",
+             f"Action {i} on the bill.", "IntroReferral") for i in range(count)]
+
+def run_stages(connections, data_db, text_db, bills, actions_per_bill):
+    timings = {}
+
+    conn = connections.get(data_db)
+    ensure_active_bill_list(conn)
+    ensure_sync_state_table(conn)
+    conn.execute(ACTIONS_SCHEMA)
+    connections.release(conn)
+    conn = connections.get(text_db)
+    conn.execute(BILL_TEXT_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bill_text_bill ON bill_text (congress, bill_type, bill_number)")
+    connections.release(conn)
+
+    start = time.perf_counter()
+    for page in pages(bills):
+        conn = connections.get(data_db)
+        with connections.transaction(conn):
+            cursor = conn.cursor()
+            upsert_bills(cursor, page)
+            advance_watermark(cursor, 118, page)
+        connections.release(conn)
+    timings["bill list"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    conn = connections.get(data_db)
+    active = conn.execute("SELECT congress, billType, billNumber FROM active_bill_list WHERE actions_updated = 0").fetchall()
+    connections.release(conn)
+    for bill in bills:
+        conn = connections.get(data_db)
+        with connections.transaction(conn):
+            conn.executemany("INSERT OR IGNORE INTO bill_actions VALUES (?, ?, ?, ?, ?, ?, ?)", action_rows(bill, actions_per_bill))
+            conn.execute("UPDATE active_bill_list SET actions_updated = 1 WHERE congress = ? AND billType = ? AND billNumber = ?",
+                         (bill["congress"], bill["type"].lower(), bill["number"]))
+        connections.release(conn)
+    timings["actions"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for congress, bill_type, bill_number in active:
+        conn = connections.get(data_db)
+        conn.execute("SELECT title, importance, latestActionText FROM active_bill_list WHERE congress = ? AND billType = ? AND billNumber = ?",
+                     (congress, bill_type, bill_number)).fetchone()
+        connections.release(conn)
+        conn = connections.get(data_db)
+        conn.execute("SELECT actionDate, actionText FROM bill_actions WHERE congress = ? AND billType = ? AND billNumber = ? ORDER BY actionDate",
+                     (congress, bill_type, int(bill_number))).fetchall()
+        connections.release(conn)
+    timings["lookups"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for congress, bill_type, bill_number in active:
+        conn = connections.get(text_db)
+        with connections.transaction(conn):
+            conn.execute("DELETE FROM bill_text WHERE congress = ? AND bill_type = ? AND bill_number = ?", (congress, bill_type, bill_number))
+            conn.executemany("INSERT INTO bill_text VALUES (?, ?, ?, '2024-01-15', 15000, ?, ?)",
+                             [(congress, bill_type, bill_number, part, PART_TEXT) for part in range(1, PARTS_PER_BILL + 1)])
+        connections.release(conn)
+    timings["bill text"] = time.perf_counter() - start
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call SQLite connections with the shared db_connections layer")
+    parser.add_argument("--bills", type=int, default=5000)
+    parser.add_argument("--actions", type=int, default=10, help="Actions stored per bill")
+    parser.add_argument("--dir", help="Directory for the temporary databases (default: system temp; use a real disk for fsync costs)")
+    args = parser.parse_args()
+
+    bills = synthetic_bills(args.bills)
+    results = {}
+    for name, connections in (("before", LegacyConnections()), ("after", SharedConnections())):
+        with tempfile.TemporaryDirectory(dir=args.dir) as work:
+            results[name] = run_stages(connections, os.path.join(work, "active_bill_data.db"),
+                                       os.path.join(work, "active_bill_text.db"), bills, args.actions)
+            db_connections.close_connections()
+
+    print(f"{args.bills} bills, {args.actions} actions and {PARTS_PER_BILL} text parts per bill")
+    print(f"{'stage':<12}{'before':>10}{'after':>10}{'speedup':>10}")
+    for stage in results["before"]:
+        before, after = results["before"][stage], results["after"][stage]
+        print(f"{stage:<12}{before:>9.2f}s{after:>9.2f}s{before / after if after else 0:>9.1f}x")
+    before, after = sum(results["before"].values()), sum(results["after"].values())
+    print(f"{'total':<12}{before:>9.2f}s{after:>9.2f}s{before / after if after else 0:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
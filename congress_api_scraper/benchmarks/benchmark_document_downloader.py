@@ -0,0 +1,99 @@
+# Benchmark for document_downloader.py.
+# Serves bill documents from a local HTTP stand-in for govinfo and downloads all of them with
+# one connection (the old sequential behaviour, without its 1 second sleep) and with the
+# pooled concurrent downloader, reporting MB/s and docs/s for each.
+# By default the documents in active_bill_text_htm are served; when that folder is empty,
+# synthetic bill-sized htm documents are generated instead. --latency adds a per-request
+# delay on the server to approximate the round trip to govinfo.
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_document_downloader.py [--source DIR] [--latency 0.1]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import document_downloader
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_SOURCE = os.path.join(SCRIPT_DIR, "active_bill_text_htm")
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    latency = 0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+def synthetic_documents(folder, count, size_kb):
+    paragraph = ("<p>SEC. 101. The Secretary shall carry out a program to make grants to eligible "
+                 "entities for the purposes described in subsection (b).</p>\n")
+    body = paragraph * (size_kb * 1024 // len(paragraph) + 1)
+    for i in range(count):
+        with open(os.path.join(folder, f"118.hr.{i}.2024-01-15.2024-01-15-1200.htm"), 'w', encoding='utf-8') as f:
+            f.write(f"<html><body><pre>\n{body}</pre></body></html>\n")
+
+def start_server(folder, latency):
+    handler = type("Handler", (SlowHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run(jobs, max_connections, compress):
+    start = time.perf_counter()
+    results = asyncio.run(document_downloader.download_documents(jobs, max_connections, compress))
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if not r["ok"]]
+    if failed:
+        raise RuntimeError(f"{len(failed)} downloads failed, first error: {failed[0]['error']}")
+    return elapsed, sum(r["size"] for r in results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent document downloader")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Folder of documents to serve")
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic documents to generate when the source folder is empty")
+    parser.add_argument("--size-kb", type=int, default=250, help="Size of each synthetic document")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of server delay per request")
+    parser.add_argument("--connections", type=int, default=document_downloader.MAX_CONNECTIONS)
+    parser.add_argument("--compress", action="store_true", help="Also write gzip copies")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        source = args.source
+        files = sorted(os.listdir(source)) if os.path.isdir(source) else []
+        files = [f for f in files if os.path.isfile(os.path.join(source, f))]
+        if not files:
+            source = os.path.join(work, "source")
+            os.makedirs(source)
+            synthetic_documents(source, args.documents, args.size_kb)
+            files = sorted(os.listdir(source))
+
+        server = start_server(source, args.latency)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"Serving {len(files)} documents from {source} with {args.latency * 1000:.0f} ms latency")
+
+        try:
+            for label, connections in (("sequential (1 connection)", 1), (f"concurrent ({args.connections} connections)", args.connections)):
+                output = tempfile.mkdtemp(dir=work)
+                jobs = [(f"{base_url}/{quote(f)}", os.path.join(output, f)) for f in files]
+                elapsed, size = run(jobs, connections, args.compress)
+                mb = size / (1024 * 1024)
+                print(f"{label:28} {mb / elapsed:8.2f} MB/s   {len(jobs) / elapsed:8.2f} docs/s   ({mb:.1f} MB in {elapsed:.2f} s)")
+        finally:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Benchmark for llm_request_pool.py.
+# Runs a local HTTP stand-in for the Ollama /api/generate endpoint that behaves like a server
+# started with OLLAMA_NUM_PARALLEL slots: each request waits for a slot, spends time on prompt
+# evaluation in proportion to the prompt and on decoding in proportion to the generated tokens,
+# and returns Ollama's timing fields. Synthetic bill text parts are then summarized the old way
+# (one request at a time) and through the request pool, with the results written to a temporary
+# bill_text table on the main thread as the summary script does, reporting parts/min and tokens/sec.
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_ollama_workers.py [--parts 40] [--parallel 4] [--workers 4]
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from llm_request_pool import run_in_flight
+
+SUMMARY_WORDS = "The bill directs the Secretary to establish a grant program for eligible entities. "
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    slots = None
+    prompt_seconds_per_kb = 0.0
+    seconds_per_token = 0.0
+    eval_count = 0
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.slots:
+            prompt_seconds = len(request["prompt"]) / 1024 * self.prompt_seconds_per_kb
+            eval_seconds = self.eval_count * self.seconds_per_token
+            time.sleep(prompt_seconds + eval_seconds)
+        words = SUMMARY_WORDS.split()
+        body = json.dumps({
+            "model": request["model"],
+            "response": " ".join(words[i % len(words)] for i in range(self.eval_count)),
+            "done": True,
+            "prompt_eval_count": len(request["prompt"]) // 4,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": self.eval_count,
+            "eval_duration": int(eval_seconds * 1e9),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(parallel, prompt_seconds_per_kb, seconds_per_token, eval_count):
+    handler = type("Handler", (FakeOllamaHandler,), {
+        "slots": threading.BoundedSemaphore(parallel),
+        "prompt_seconds_per_kb": prompt_seconds_per_kb,
+        "seconds_per_token": seconds_per_token,
+        "eval_count": eval_count,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_generate(host):
+    # The same request the ollama client sends for client.generate(model=..., prompt=...)
+    def generate(prompt):
+        data = json.dumps({"model": "llama3.1:8b-instruct-q8_0", "prompt": prompt, "stream": False}).encode()
+        request = urllib.request.Request(f"{host}/api/generate", data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    return generate
+
+def create_bill_text(db_path, parts, part_kb):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE bill_text (congress INTEGER, bill_type TEXT, bill_number INTEGER, text_part INTEGER, bill_text TEXT, summary TEXT)")
+    text = ("SEC. 101. The Secretary shall carry out a program to make grants to eligible entities. " * (part_kb * 12))[:part_kb * 1024]
+    conn.executemany("INSERT INTO bill_text VALUES (118, 'hr', ?, ?, ?, NULL)",
+                     [(i // 3 + 1, i % 3 + 1, text) for i in range(parts)])
+    conn.commit()
+    return conn
+
+def run(db_path, host, parts, part_kb, workers):
+    conn = create_bill_text(db_path, parts, part_kb)
+    rows = conn.execute("SELECT congress, bill_type, bill_number, text_part, bill_text FROM bill_text WHERE summary IS NULL").fetchall()
+    jobs = (((c, t, n, p), f"Summarize the following legislation:\n\n{text}") for c, t, n, p, text in rows)
+
+    def write_summary(key, response):
+        conn.execute("UPDATE bill_text SET summary = ? WHERE congress = ? AND bill_type = ? AND bill_number = ? AND text_part = ?",
+                     (response["response"], *key))
+        conn.commit()
+
+    stats = run_in_flight(jobs, make_generate(host), write_summary, workers, report_every=0)
+    written = conn.execute("SELECT COUNT(*) FROM bill_text WHERE summary IS NOT NULL").fetchone()[0]
+    conn.close()
+    if written != parts:
+        raise RuntimeError(f"Only {written} of {parts} summaries were written")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent summary requests against a fake Ollama server")
+    parser.add_argument("--parts", type=int, default=40, help="Text parts to summarize")
+    parser.add_argument("--part-kb", type=int, default=40, help="Size of each text part")
+    parser.add_argument("--parallel", type=int, default=4, help="Server slots (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--workers", type=int, default=4, help="Requests kept in flight")
+    parser.add_argument("--prompt-ms-per-kb", type=float, default=2.0, help="Simulated prompt evaluation time")
+    parser.add_argument("--ms-per-token", type=float, default=0.5, help="Simulated decode time per generated token")
+    parser.add_argument("--eval-count", type=int, default=400, help="Tokens generated per summary")
+    args = parser.parse_args()
+
+    server = start_server(args.parallel, args.prompt_ms_per_kb / 1000, args.ms_per_token / 1000, args.eval_count)
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        for name, workers in (("sequential", 1), (f"{args.workers} in flight", args.workers)):
+            stats = run(os.path.join(work, f"{workers}.db"), host, args.parts, args.part_kb, workers)
+            results[name] = stats
+            print(f"{name:<14} {stats.report()}")
+    server.shutdown()
+
+    before, after = (stats.elapsed() for stats in results.values())
+    print(f"Speedup with {args.workers} requests in flight on {args.parallel} server slots: {before / after if after else 0:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Memory check for the streaming tokenizer mode (streaming_chunker.py).
+# Generates a synthetic 50 MB bill (DIVISION/TITLE/SEC. structure plus one oversized section
+# with no headings), streams it into a temporary bill_text table in a subprocess, and fails
+# with exit code 1 if that process's peak RSS exceeds --max-rss-mb.
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_streaming_tokenizer.py [--size-mb 50] [--memory-limit-mb 64] [--max-rss-mb 200]
+
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from streaming_chunker import stream_chunks
+from token_chunker import TokenChunker
+
+SECTION = ("SEC. {n}. AUTHORIZATION OF APPROPRIATIONS.\n\n    (a) In General.--There are authorized to be "
+           "appropriated to the Secretary &amp; the Administrator $1,000,000 for each of fiscal years "
+           "2025 through 2029 to carry out this section.\n\n")
+PARAGRAPH = "    (b) Report.--Not later than 180 days after the date of enactment of this Act, the Secretary shall submit a report.\n"
+
+
+def write_synthetic_bill(path, size_mb):
+    target = size_mb * 1024 * 1024
+    oversized = target // 4  # One section alone is a quarter of the bill
+    written = 0
+    n = 1
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<html><body><pre>\n<all>\nAn Act making consolidated appropriations.\n\n")
+        division = 0
+        while written < target:
+            if n % 2000 == 1:
+                f.write(f"DIVISION {chr(ord('A') + division % 26)}--APPROPRIATIONS\n\nTITLE I--GENERAL PROVISIONS\n\n")
+                division += 1
+            text = SECTION.format(n=n)
+            f.write(text)
+            written += len(text)
+            if n == 100:
+                f.write(f"SEC. {n}A. OVERSIZED PROVISION.\n\n")
+                for _ in range(oversized // len(PARAGRAPH)):
+                    f.write(PARAGRAPH)
+                written += oversized
+            n += 1
+        f.write("</pre></body></html>\n")
+
+def run_worker(path, max_tokens, memory_limit_mb):
+    chunker = TokenChunker()
+    conn = sqlite3.connect(os.path.join(os.path.dirname(path), "bill_text.db"))
+    conn.execute("CREATE TABLE bill_text (text_part INTEGER, token_count INTEGER, bill_text TEXT, section_start TEXT, section_end TEXT)")
+    start = time.perf_counter()
+    parts = 0
+    tokens = 0
+    largest = 0
+    for i, (text, token_count, section_start, section_end) in enumerate(stream_chunks(path, chunker, max_tokens, memory_limit_mb=memory_limit_mb), 1):
+        conn.execute("INSERT INTO bill_text VALUES (?, ?, ?, ?, ?)", (i, token_count, text, section_start, section_end))
+        parts = i
+        tokens += token_count
+        largest = max(largest, token_count)
+    conn.commit()
+    conn.close()
+    print(json.dumps({"elapsed": time.perf_counter() - start, "parts": parts, "tokens": tokens, "largest_part": largest,
+                      "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check peak RSS of the streaming tokenizer on a synthetic bill")
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--max-tokens", type=int, default=15000)
+    parser.add_argument("--memory-limit-mb", type=int, default=64, help="memory_limit_mb passed to stream_chunks")
+    parser.add_argument("--max-rss-mb", type=float, default=200, help="Fail if peak RSS exceeds this")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.max_tokens, args.memory_limit_mb)
+        return
+
+    with tempfile.TemporaryDirectory() as work:
+        path = os.path.join(work, "118.hr.9999.2024-01-15.2024-01-15-1200.htm")
+        write_synthetic_bill(path, args.size_mb)
+        print(f"Synthetic bill: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", path,
+                                 "--max-tokens", str(args.max_tokens), "--memory-limit-mb", str(args.memory_limit_mb)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['parts']} parts, {result['tokens']:,} tokens (largest part {result['largest_part']:,}) "
+              f"in {result['elapsed']:.1f} s, peak RSS {result['peak_rss_mb']:.1f} MB (bound {args.max_rss_mb:.0f} MB)")
+
+        if result['largest_part'] > args.max_tokens:
+            print(f"FAIL: a part exceeds the {args.max_tokens} token budget")
+            sys.exit(1)
+        if result['peak_rss_mb'] > args.max_rss_mb:
+            print("FAIL: peak RSS exceeds the bound")
+            sys.exit(1)
+        print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Benchmark for the HTML text extractors in text_extractor.py.
+# Runs every installed backend over a corpus of saved bill .htm files, each backend in its own
+# subprocess so peak RSS is measured independently, and reports ms/document and peak RSS.
+# Each backend's output is also compared with html.parser after whitespace normalisation, which
+# is what word_tokenize sees.
+# The corpus defaults to active_bill_text_htm and law_text_htm; when both are empty, synthetic
+# bills are generated, including one omnibus-sized document.
+#
+# Usage: python congress_api_scraper/benchmarks/benchmark_text_extractor.py [--corpus DIR ...] [--limit 500]
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from text_extractor import available_extractors, get_extractor
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_CORPUS = [os.path.join(SCRIPT_DIR, "active_bill_text_htm"), os.path.join(SCRIPT_DIR, "law_text_htm")]
+
+
+def corpus_files(folders, limit):
+    files = []
+    for folder in folders:
+        if os.path.isdir(folder):
+            files.extend(os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('.htm'))
+    return files[:limit]
+
+def synthetic_corpus(folder, count=50, omnibus_mb=20):
+    section = ("SEC. {n}. AUTHORIZATION OF APPROPRIATIONS.\n\n    (a) In General.--There are authorized to be "
+               "appropriated to the Secretary &amp; the Administrator $1,000,000 for each of fiscal years "
+               "2025 through 2029 to carry out this section.\n\n")
+    sizes = [200 * 1024] * (count - 1) + [omnibus_mb * 1024 * 1024]
+    for i, size in enumerate(sizes):
+        sections = []
+        total = 0
+        n = 1
+        while total < size:
+            text = section.format(n=n)
+            sections.append(text)
+            total += len(text)
+            n += 1
+        with open(os.path.join(folder, f"118.hr.{i}.2024-01-15.2024-01-15-1200.htm"), 'w', encoding='utf-8') as f:
+            f.write("<html><body><pre>\n<all>\n" + "".join(sections) + "</pre></body></html>\n")
+    return corpus_files([folder], count)
+
+def normalized_digest(text):
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+def run_worker(backend, files):
+    # Runs in the subprocess: extracts every file and prints one JSON line
+    extract = get_extractor(backend)
+    digests = []
+    elapsed = 0.0
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        start = time.perf_counter()
+        text = extract(html_content)
+        elapsed += time.perf_counter() - start
+        digests.append(normalized_digest(text))
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    print(json.dumps({"elapsed": elapsed, "peak_rss_mb": peak_rss_mb, "digests": digests}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML text extractors")
+    parser.add_argument("--corpus", nargs="*", default=DEFAULT_CORPUS, help="Folders of bill .htm files")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of documents")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--files", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.files, 'r', encoding='utf-8') as f:
+            run_worker(args.worker, json.load(f))
+        return
+
+    backends = list(reversed(available_extractors()))  # html.parser first, as the reference
+    if not backends:
+        print("No HTML text extractor is installed")
+        return
+
+    with tempfile.TemporaryDirectory() as work:
+        files = corpus_files(args.corpus, args.limit)
+        if not files:
+            print("No saved bill documents found, generating a synthetic corpus")
+            files = synthetic_corpus(work)
+        file_list = os.path.join(work, "files.json")
+        with open(file_list, 'w', encoding='utf-8') as f:
+            json.dump(files, f)
+
+        total_mb = sum(os.path.getsize(path) for path in files) / (1024 * 1024)
+        print(f"{len(files)} documents, {total_mb:.1f} MB")
+
+        reference = None
+        for backend in backends:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", backend, "--files", file_list],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if reference is None:
+                reference = result["digests"]
+            mismatches = sum(1 for a, b in zip(reference, result["digests"]) if a != b)
+            print(f"{backend:12} {result['elapsed'] * 1000 / len(files):10.2f} ms/doc   "
+                  f"peak RSS {result['peak_rss_mb']:8.1f} MB   "
+                  f"{mismatches} documents differ from {backends[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Query plan check for schema_migrations.py.
+# Builds each database in a temporary directory with the pipeline's schemas, fills it with
+# synthetic rows, applies the migrations and runs EXPLAIN QUERY PLAN on the hot queries of the
+# scripts that read it. A query fails the check when its plan scans a table without an index or
+# does not use the index it was given. Exits 1 if any query fails, so it can run before a deploy.
+#
+# Usage: python congress_api_scraper/benchmarks/check_query_plans.py [--bills 2000] [--verbose]
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db_connections
+from active_bill_list_store import ensure_active_bill_list, upsert_bills
+from schema_migrations import (ACTIVE_BILL_DATA, ACTIVE_BILL_TEXT, ACTIVE_BILLS_TWEETS, DID_YOU_KNOW_PARAMETERS,
+                               DID_YOU_KNOW_TWEETS, migrate)
+from benchmark_bill_upsert import synthetic_bills
+
+PARTS_PER_BILL = 3
+
+# Legacy schemas: no keys, as older deployments created them
+SCHEMAS = {
+    ACTIVE_BILL_TEXT: ['''
+        CREATE TABLE bill_text (
+            congress INTEGER, bill_type TEXT, bill_number INTEGER, tokenized_date TIMESTAMP, token_count INTEGER,
+            text_part INTEGER, bill_text TEXT, summary TEXT, section_start TEXT, section_end TEXT, chunk_sha256 TEXT
+        )
+    '''],
+    ACTIVE_BILL_DATA: ['''
+        CREATE TABLE bill_actions (
+            congress INTEGER, billType TEXT, billNumber INTEGER, actionCode TEXT, actionDate DATE,
+            actionText TEXT, actionType TEXT
+        )
+    '''],
+    ACTIVE_BILLS_TWEETS: ['''
+        CREATE TABLE active_bills_tweets (
+            bill_index INTEGER PRIMARY KEY, congress INTEGER, bill_type TEXT, bill_number INTEGER,
+            tweet_id TEXT UNIQUE, tweet_body TEXT, tweet_title TEXT, hashtags TEXT, created_date DATETIME,
+            tweeted INTEGER DEFAULT 0, tweeted_datetime DATETIME
+        )
+    '''],
+    DID_YOU_KNOW_PARAMETERS: ['''
+        CREATE TABLE didyouknow_bill_parameters (
+            bill_index INTEGER PRIMARY KEY, congress INTEGER, bill_type TEXT, bill_number INTEGER,
+            total_token_size INTEGER, total_expected_tweets INTEGER
+        )
+    '''],
+    DID_YOU_KNOW_TWEETS: ['''
+        CREATE TABLE didyouknow_tweet (
+            bill_index INTEGER, tweet_id TEXT UNIQUE, tweet_text TEXT, tweet_text_len INTEGER, created_date DATETIME,
+            bill_index_count INTEGER, tweeted INTEGER DEFAULT 0, tweeted_datetime DATETIME
+        )
+    '''],
+}
+
+# database: [(script, query, parameters, index the plan must use)]
+QUERIES = {
+    ACTIVE_BILL_TEXT: [
+        ("active_bill_data_collection_summary_local.get_all_bills",
+         "SELECT congress, bill_type, bill_number, text_part, bill_text, summary FROM bill_text WHERE summary IS NULL OR summary = ''",
+         (), "idx_bill_text_needs_summary"),
+        ("active_bill_data_collection_summary_local.update_summary",
+         "UPDATE bill_text SET summary = ? WHERE congress = ? AND bill_type = ? AND bill_number = ? AND text_part = ?",
+         ("summary", 118, "hr", 1, 1), "idx_bill_text_part"),
+        ("active_bill_importance_collection_local.get_bills_needing_importance",
+         "SELECT DISTINCT congress, bill_type, bill_number FROM bill_text WHERE summary IS NOT NULL AND summary != ''",
+         (), "idx_bill_text_summarized"),
+        ("bill_manifest.refresh_manifest",
+         "SELECT token_count, summary FROM bill_text WHERE congress = ? AND bill_type = ? AND bill_number = ? ORDER BY text_part",
+         (118, "hr", 1), "idx_bill_text_part"),
+    ],
+    ACTIVE_BILL_DATA: [
+        ("important_actions_tweet_generator.get_must_know_bills",
+         "SELECT congress, billType, billNumber, title, importance FROM active_bill_list "
+         "WHERE importance = 'Must Know' AND latestActionDate >= ? AND tweet_created = 0",
+         ("2024-01-01",), "idx_active_bill_list_tweet"),
+        ("get_active_bill_actions.get_active_bills",
+         "SELECT congress, LOWER(billType), billNumber FROM active_bill_list WHERE actions_updated = 0 ORDER BY congress DESC",
+         (), "idx_active_bill_list_actions_pending"),
+        ("active_bill_data_collection.get_bill_actions",
+         "SELECT actionDate, actionText FROM bill_actions WHERE congress = ? AND billType = ? AND billNumber = ? ORDER BY actionDate",
+         (118, "hr", 1), "idx_bill_actions_key"),
+    ],
+    ACTIVE_BILLS_TWEETS: [
+        ("x_bot/active_bills_post.get_random_tweet",
+         "SELECT bill_index, tweet_title, tweet_body, hashtags FROM active_bills_tweets WHERE tweeted = 0 ORDER BY RANDOM() LIMIT 1",
+         (), "idx_active_bills_tweets_untweeted"),
+    ],
+    DID_YOU_KNOW_PARAMETERS: [
+        ("x_bot/did_you_know_data_collection.process_bill_files",
+         "SELECT * FROM didyouknow_bill_parameters WHERE congress = ? AND bill_type = ? AND bill_number = ?",
+         (118, "hr", 1), "idx_didyouknow_bill_parameters_bill"),
+    ],
+    DID_YOU_KNOW_TWEETS: [
+        ("x_bot/did_you_know_data_collection.process_tweets",
+         "SELECT COUNT(*) FROM didyouknow_tweet WHERE bill_index = ?",
+         (1,), "idx_didyouknow_tweet_bill"),
+        ("x_bot/didyouknow_post.get_random_tweet",
+         "SELECT tweet_id, tweet_text FROM didyouknow_tweet WHERE tweeted = 0 ORDER BY RANDOM() LIMIT 1",
+         (), "idx_didyouknow_tweet_untweeted"),
+    ],
+}
+
+
+def fill(conn, database, bills):
+    keys = [(bill["congress"], bill["type"].lower(), int(bill["number"])) for bill in bills]
+    if database == ACTIVE_BILL_TEXT:
+        # Most parts are summarized already; a few appear twice, as legacy databases do
+        rows = [(c, t, n, part, f"text {part}", None if i % 10 == 0 else f"summary {part}")
+                for i, (c, t, n) in enumerate(keys) for part in range(1, PARTS_PER_BILL + 1)]
+        conn.executemany("INSERT INTO bill_text (congress, bill_type, bill_number, text_part, bill_text, summary) VALUES (?, ?, ?, ?, ?, ?)",
+                         rows + rows[:50])
+    elif database == ACTIVE_BILL_DATA:
+        ensure_active_bill_list(conn)
+        upsert_bills(conn.cursor(), bills)
+        conn.execute("UPDATE active_bill_list SET actions_updated = 1, importance = 'Good to Know', tweet_created = 1")
+        conn.execute("UPDATE active_bill_list SET actions_updated = 0, importance = 'Must Know', tweet_created = 0 WHERE rowid % 20 = 0")
+        conn.executemany("INSERT INTO bill_actions VALUES (?, ?, ?, ?, ?, 'Action', 'IntroReferral')",
+                         [(c, t, n, f"H{i:04d}", f"2024-01-{i + 1:02d}") for c, t, n in keys for i in range(5)])
+    elif database == ACTIVE_BILLS_TWEETS:
+        conn.executemany("INSERT INTO active_bills_tweets (congress, bill_type, bill_number, tweet_id, tweet_body, tweeted) VALUES (?, ?, ?, ?, 'body', ?)",
+                         [(c, t, n, f"t{i}", int(i % 20 != 0)) for i, (c, t, n) in enumerate(keys)])
+    elif database == DID_YOU_KNOW_PARAMETERS:
+        conn.executemany("INSERT INTO didyouknow_bill_parameters (congress, bill_type, bill_number, total_token_size) VALUES (?, ?, ?, 1000)", keys)
+    elif database == DID_YOU_KNOW_TWEETS:
+        conn.executemany("INSERT INTO didyouknow_tweet (bill_index, tweet_id, tweet_text, tweeted) VALUES (?, ?, 'text', ?)",
+                         [(i // 4 + 1, f"d{i}", int(i % 20 != 0)) for i in range(len(keys) * 4)])
+    conn.commit()
+
+def check_plan(conn, query, parameters, index):
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", parameters)]
+    full_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+    uses_index = any(index in step for step in plan)
+    return not full_scans and uses_index, plan
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the pipeline's hot queries use the migrated indexes")
+    parser.add_argument("--bills", type=int, default=2000)
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not only failures")
+    args = parser.parse_args()
+
+    bills = synthetic_bills(args.bills)
+    failures = 0
+    with tempfile.TemporaryDirectory() as work:
+        for database, schemas in SCHEMAS.items():
+            conn = db_connections.get_connection(os.path.join(work, f"{database}.db"))
+            for schema in schemas:
+                conn.execute(schema)
+            fill(conn, database, bills)
+            versions = migrate(conn, database)
+            print(f"{database}: applied migrations {versions}")
+            for script, query, parameters, index in QUERIES[database]:
+                ok, plan = check_plan(conn, query, parameters, index)
+                failures += not ok
+                print(f"  {'ok  ' if ok else 'FAIL'} {script} ({index})")
+                if args.verbose or not ok:
+                    for step in plan:
+                        print(f"         {step}")
+            if migrate(conn, database):
+                print(f"  FAIL migrations re-applied on a migrated {database} database")
+                failures += 1
+        db_connections.close_connections()
+
+    print(f"{failures} failing queries" if failures else "All queries use their indexes")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
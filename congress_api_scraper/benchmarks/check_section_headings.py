@@ -0,0 +1,73 @@
+# Heading check for bill_sections.py and streaming_chunker.py.
+# Splits a small govinfo-style bill whose first section is headed "SECTION 1." (the usual form)
+# and whose table of contents lists the sections in mixed case, and checks the section labels
+# both split_sections() and the streaming tokenizer produce. Section 1 must get its own label,
+# and the mixed-case table of contents lines must not start sections. Exits 1 if any label is wrong.
+#
+# Usage: python congress_api_scraper/benchmarks/check_section_headings.py
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bill_sections import PREAMBLE_LABEL, split_sections
+from streaming_chunker import stream_chunks
+from token_chunker import TokenChunker
+
+BILL_TEXT = """An Act to improve rural broadband access.
+
+    Be it enacted by the Senate and House of Representatives of the United States of America in Congress assembled,
+
+    SECTION 1. SHORT TITLE; TABLE OF CONTENTS.
+
+    (a) Short Title.--This Act may be cited as the ``Rural Broadband Act''.
+    (b) Table of Contents.--
+
+Sec. 1. Short title; table of contents.
+Sec. 2. Findings.
+
+TITLE I--GRANTS
+
+    SEC. 2. FINDINGS.
+
+    Congress finds that rural households lack broadband access.
+
+    SEC. 101A. GRANT PROGRAM.
+
+    The Secretary shall carry out a grant program.
+"""
+
+EXPECTED_LABELS = [PREAMBLE_LABEL, "Sec. 1", "Title I", "Title I, Sec. 2", "Title I, Sec. 101A"]
+
+
+def check(name, labels, expected):
+    ok = labels == expected
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}: {labels}")
+    return ok
+
+def main():
+    failures = 0
+    print("Section labels of a bill opening with a SECTION 1. heading")
+    labels = [label for _, _, label in split_sections(BILL_TEXT)]
+    failures += not check("split_sections", labels, EXPECTED_LABELS)
+
+    # Small parts so sections are spread over several parts; each label must appear in order
+    with tempfile.TemporaryDirectory() as work:
+        path = os.path.join(work, "118.hr.1.2024-01-01.2024-01-02-0000.htm")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"<html><body><pre>\n{BILL_TEXT}</pre></body></html>\n")
+        parts = list(stream_chunks(path, TokenChunker(), 30))
+    streamed = []
+    for _, _, section_start, section_end in parts:
+        for label in (section_start, section_end):
+            if not streamed or streamed[-1] != label:
+                streamed.append(label)
+    failures += not check("stream_chunks", streamed, EXPECTED_LABELS)
+
+    print(f"{failures} failing checks" if failures else "All section headings are recognised")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
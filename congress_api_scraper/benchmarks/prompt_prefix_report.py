@@ -0,0 +1,66 @@
+# Report for prompt_preamble.py.
+# Counts the tokens of the shared preamble and, for the bills in bill_manifest (or a synthetic size
+# spread when there is no database), how much of each bill's Gemini input can be served from the
+# prefix caches: the preamble on every prompt, and the bill context of bills large enough for a
+# Gemini context cache, which the summary and formal report prompts (and the tweet prompts) reuse.
+# Actual savings are logged per request by the scripts: prompt_eval_count/prompt_eval_duration for
+# Ollama and usage_metadata (prompt and cached_content token counts) for Gemini.
+#
+# Usage: python congress_api_scraper/benchmarks/prompt_prefix_report.py [--db sys_db/active_bill_text.db] [--prompts 2]
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prompt_preamble import legislation_preamble, dated_context, gemini_cache_min_tokens
+from token_chunker import TokenChunker
+from bill_manifest import BILL_TEXT_DB
+
+SYNTHETIC_BILL_TOKENS = [800, 2500, 6000, 15000, 40000, 120000, 400000]
+ACTIONS_TOKENS = 400  # a typical bill_actions listing
+
+
+def bill_sizes(db_path):
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            sizes = [row[0] for row in conn.execute("SELECT total_tokens FROM bill_manifest")]
+        except sqlite3.Error:
+            sizes = []
+        conn.close()
+        if sizes:
+            return sizes, f"{len(sizes)} bills in {db_path}"
+    return SYNTHETIC_BILL_TOKENS, "synthetic bill sizes"
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how much prompt input the shared prefix and context caches cover")
+    parser.add_argument("--db", default=BILL_TEXT_DB)
+    parser.add_argument("--prompts", type=int, default=2, help="Prompts per bill (2 for summary and formal report, 3 for tweets)")
+    args = parser.parse_args()
+
+    chunker = TokenChunker()
+    preamble = chunker.count(legislation_preamble("As an unbiased reporter, write about the legislation in question."))
+    tail = chunker.count(dated_context()) + 60  # task instructions
+    sizes, source = bill_sizes(args.db)
+
+    sent = reused = 0
+    cached_bills = 0
+    for bill_tokens in sizes:
+        context = bill_tokens + ACTIONS_TOKENS
+        sent += args.prompts * (preamble + context + tail)
+        if context >= gemini_cache_min_tokens and args.prompts > 1:
+            # Cached once at creation, then read from the cache by every prompt
+            cached_bills += 1
+            reused += (args.prompts - 1) * (preamble + context)
+        else:
+            reused += args.prompts * preamble
+
+    print(f"Shared preamble: {preamble} tokens; per-prompt tail: about {tail} tokens ({source})")
+    print(f"{args.prompts} prompts per bill: {sent} input tokens, {reused} ({reused / sent if sent else 0:.0%}) served from a reused prefix")
+    print(f"{cached_bills} of {len(sizes)} bills reach the {gemini_cache_min_tokens}-token Gemini context cache minimum")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Per-bill token manifest for prompt budgeting.
+# bill_manifest holds one row per bill in active_bill_text.db with the bill's total tokens, the
+# number of parts, the tokens of each part and the tokens of each part's summary. Prompt builders
+# look the row up and pick a strategy without reading or re-tokenizing any text:
+#   full       every text part fits the budget, send the whole bill
+#   summaries  every part is summarized and the summaries fit, send the summary of summaries
+#   chunked    nothing fits whole, send parts (or summaries) in order up to the budget and say where it stops
+# The tokenizer refreshes a bill's row after writing its parts, and the summary scripts do so after
+# each summary they write. Run this file directly to rebuild every row.
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+from token_chunker import TokenChunker
+from text_compression import register_text_codec
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+BILL_TEXT_DB = os.path.join(script_dir, 'sys_db', 'active_bill_text.db')
+
+STRATEGY_FULL = "full"
+STRATEGY_SUMMARIES = "summaries"
+STRATEGY_CHUNKED = "chunked"
+
+PART_SEPARATOR_TOKENS = 16  # "Part N (Sec. x - Sec. y):" header added per part or summary
+
+
+def create_manifest_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bill_manifest (
+            congress INTEGER,
+            bill_type TEXT,
+            bill_number INTEGER,
+            part_count INTEGER,
+            total_tokens INTEGER,
+            part_tokens TEXT,
+            summarized_parts INTEGER,
+            summary_tokens INTEGER,
+            part_summary_tokens TEXT,
+            updated_date TIMESTAMP,
+            PRIMARY KEY (congress, bill_type, bill_number)
+        )
+    ''')
+    # summary_tokens on bill_text caches each summary's token count so refreshes never re-tokenize
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(bill_text)')]
+    if columns and 'summary_tokens' not in columns:
+        conn.execute('ALTER TABLE bill_text ADD COLUMN summary_tokens INTEGER')
+    conn.commit()
+
+def count_missing_summary_tokens(conn, congress, bill_type, bill_number, chunker):
+    # Summaries written without a cached count (or before the column existed) are counted once
+    rows = conn.execute('''
+        SELECT text_part, decompress_text(summary) FROM bill_text
+        WHERE congress = ? AND bill_type = ? AND bill_number = ?
+        AND summary IS NOT NULL AND summary != '' AND summary_tokens IS NULL
+    ''', (congress, bill_type, bill_number)).fetchall()
+    for text_part, summary in rows:
+        conn.execute('''
+            UPDATE bill_text SET summary_tokens = ?
+            WHERE congress = ? AND bill_type = ? AND bill_number = ? AND text_part = ?
+        ''', (chunker.count(summary), congress, bill_type, bill_number, text_part))
+
+def refresh_manifest(conn, congress, bill_type, bill_number, chunker, commit=True):
+    # conn needs register_text_codec() for bills with compressed summaries
+    count_missing_summary_tokens(conn, congress, bill_type, bill_number, chunker)
+    rows = conn.execute('''
+        SELECT token_count, CASE WHEN summary IS NULL OR summary = '' THEN NULL ELSE summary_tokens END
+        FROM bill_text
+        WHERE congress = ? AND bill_type = ? AND bill_number = ?
+        ORDER BY text_part
+    ''', (congress, bill_type, bill_number)).fetchall()
+    if not rows:
+        conn.execute('DELETE FROM bill_manifest WHERE congress = ? AND bill_type = ? AND bill_number = ?',
+                     (congress, bill_type, bill_number))
+    else:
+        part_tokens = [token_count or 0 for token_count, _ in rows]
+        summary_tokens = [tokens for _, tokens in rows]
+        conn.execute('''
+            INSERT OR REPLACE INTO bill_manifest (congress, bill_type, bill_number, part_count, total_tokens, part_tokens,
+                                                  summarized_parts, summary_tokens, part_summary_tokens, updated_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (congress, bill_type, bill_number, len(rows), sum(part_tokens), json.dumps(part_tokens),
+              sum(1 for tokens in summary_tokens if tokens is not None), sum(tokens or 0 for tokens in summary_tokens),
+              json.dumps(summary_tokens), datetime.now().isoformat()))
+    if commit:
+        conn.commit()
+
+def get_manifest(conn, congress, bill_type, bill_number):
+    row = conn.execute('''
+        SELECT part_count, total_tokens, part_tokens, summarized_parts, summary_tokens, part_summary_tokens
+        FROM bill_manifest WHERE congress = ? AND bill_type = ? AND bill_number = ?
+    ''', (congress, bill_type, bill_number)).fetchone()
+    if not row:
+        return None
+    part_count, total_tokens, part_tokens, summarized_parts, summary_tokens, part_summary_tokens = row
+    return {
+        "part_count": part_count,
+        "total_tokens": total_tokens,
+        "part_tokens": json.loads(part_tokens),
+        "summarized_parts": summarized_parts,
+        "summary_tokens": summary_tokens,
+        "part_summary_tokens": json.loads(part_summary_tokens),
+    }
+
+def choose_prompt_strategy(manifest, token_budget, prefer=STRATEGY_FULL):
+    overhead = manifest["part_count"] * PART_SEPARATOR_TOKENS
+    fits = {
+        STRATEGY_FULL: manifest["total_tokens"] + overhead <= token_budget,
+        STRATEGY_SUMMARIES: (manifest["summarized_parts"] == manifest["part_count"]
+                             and manifest["summary_tokens"] + overhead <= token_budget),
+    }
+    order = [STRATEGY_FULL, STRATEGY_SUMMARIES] if prefer == STRATEGY_FULL else [STRATEGY_SUMMARIES, STRATEGY_FULL]
+    for strategy in order:
+        if fits[strategy]:
+            return strategy
+    return STRATEGY_CHUNKED
+
+def part_header(text_part, section_start, section_end):
+    if section_start and section_end and section_start != section_end:
+        return f"Part {text_part} ({section_start} - {section_end})"
+    if section_start:
+        return f"Part {text_part} ({section_start})"
+    return f"Part {text_part}"
+
+def build_prompt_text(conn, congress, bill_type, bill_number, token_budget, prefer=STRATEGY_FULL, chunker=None):
+    # Returns (strategy, text) for a bill, reading only the column the strategy needs.
+    # conn needs register_text_codec(). A missing manifest row is built when a chunker is given;
+    # otherwise, or when the bill has no text, (None, None) is returned.
+    manifest = get_manifest(conn, congress, bill_type, bill_number)
+    if not manifest and chunker:
+        refresh_manifest(conn, congress, bill_type, bill_number, chunker)
+        manifest = get_manifest(conn, congress, bill_type, bill_number)
+    if not manifest:
+        return None, None
+    strategy = choose_prompt_strategy(manifest, token_budget, prefer)
+
+    use_summaries = strategy == STRATEGY_SUMMARIES or (strategy == STRATEGY_CHUNKED and prefer == STRATEGY_SUMMARIES)
+    column = "summary" if use_summaries else "bill_text"
+    unit_tokens = manifest["part_summary_tokens"] if use_summaries else manifest["part_tokens"]
+
+    # Parts are taken in order while they fit; the token counts come from the manifest, so
+    # text past the budget is never read or decompressed
+    included = []
+    used = 0
+    for text_part, tokens in enumerate(unit_tokens, 1):
+        if tokens is None:
+            continue
+        if used + tokens + PART_SEPARATOR_TOKENS > token_budget:
+            break
+        included.append(text_part)
+        used += tokens + PART_SEPARATOR_TOKENS
+
+    if not included:
+        logging.info(f"Nothing from {congress}.{bill_type}.{bill_number} fits a {token_budget} token prompt")
+        return strategy, None
+
+    placeholders = ",".join("?" for _ in included)
+    rows = conn.execute(f'''
+        SELECT text_part, section_start, section_end, decompress_text({column}) FROM bill_text
+        WHERE congress = ? AND bill_type = ? AND bill_number = ? AND text_part IN ({placeholders})
+        ORDER BY text_part
+    ''', (congress, bill_type, bill_number, *included)).fetchall()
+    pieces = [f"{part_header(text_part, section_start, section_end)}:\n{text}" for text_part, section_start, section_end, text in rows]
+
+    if strategy == STRATEGY_CHUNKED:
+        pieces.append(f"[Only {len(included)} of {manifest['part_count']} {'summarized parts' if use_summaries else 'parts'} "
+                      f"of this bill fit in this prompt; the remaining parts are omitted.]")
+    logging.info(f"Prompt strategy for {congress}.{bill_type}.{bill_number}: {strategy} "
+                 f"({manifest['total_tokens']} text tokens, {manifest['summary_tokens']} summary tokens, budget {token_budget})")
+    return strategy, "\n\n".join(pieces)
+
+
+def main():
+    # Rebuilds the manifest for every bill in active_bill_text.db
+    conn = sqlite3.connect(BILL_TEXT_DB)
+    register_text_codec(conn)
+    create_manifest_table(conn)
+    chunker = TokenChunker()
+    bills = conn.execute('SELECT DISTINCT congress, bill_type, bill_number FROM bill_text').fetchall()
+    for congress, bill_type, bill_number in bills:
+        refresh_manifest(conn, congress, bill_type, bill_number, chunker, commit=False)
+    conn.commit()
+    conn.close()
+    print(f"Refreshed the manifest for {len(bills)} bills")
+
+if __name__ == "__main__":
+    main()
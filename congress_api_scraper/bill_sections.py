@@ -0,0 +1,91 @@
+# Structure-aware chunking for bill/law text.
+# govinfo documents are organised as DIVISION > TITLE > Subtitle > SEC. headings. The text is
+# split at those headings and whole sections are packed into chunks up to the token budget, so
+# a section is only ever split when it alone exceeds the budget. Each chunk records the first
+# and last section it covers (e.g. "Division A, Title I, Sec. 101"), which lets prompts cite
+# sections without storing overlapping context copies.
+
+import re
+
+# Extracted .htm text. Section headings are upper case ("SEC. 101. SHORT TITLE.", and usually
+# "SECTION 1. SHORT TITLE." for the first); the table of contents uses "Sec. 101. Short title."
+# and is deliberately not matched.
+TEXT_HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'DIVISION (?P<division>[A-Z]{1,3})\b'
+    r'|TITLE (?P<title>[IVXLC]+)\b'
+    r'|Subtitle (?P<subtitle>[A-Z]{1,2})\b'
+    r'|(?:SEC\.|SECTION) (?P<section>\d+[A-Za-z]*(?:-\d+)?)\.'
+    r')', re.MULTILINE)
+
+# Raw USLM/bill XML: <division>, <title>, <subtitle>, <section> elements followed by their <enum>
+XML_HEADING_PATTERN = re.compile(
+    r'<(?P<tag>division|title|subtitle|section)\b[^>]*>\s*<enum>(?P<enum>[^<]*)</enum>')
+
+LEVELS = ["division", "title", "subtitle", "section"]
+LEVEL_NAMES = {"division": "Division", "title": "Title", "subtitle": "Subtitle", "section": "Sec."}
+PREAMBLE_LABEL = "Preamble"
+
+
+def find_headings(text, is_xml=False):
+    # Yields (offset, level, label) for every structural heading in order
+    if is_xml:
+        for match in XML_HEADING_PATTERN.finditer(text):
+            yield match.start(), match.group('tag'), match.group('enum').strip().rstrip('.')
+    else:
+        for match in TEXT_HEADING_PATTERN.finditer(text):
+            level = match.lastgroup
+            yield match.start(), level, match.group(level)
+
+def section_label(path):
+    # path is {level: label}; subtitles are left out of citations to keep them short
+    parts = [f"{LEVEL_NAMES[level]} {path[level]}" for level in LEVELS if path.get(level) and level != "subtitle"]
+    return ", ".join(parts) if parts else PREAMBLE_LABEL
+
+def split_sections(text, is_xml=False):
+    # Returns [(start, end, label)] covering the whole text, one entry per heading
+    segments = []
+    path = {}
+    segment_start = 0
+    label = PREAMBLE_LABEL
+    for offset, level, value in find_headings(text, is_xml):
+        if offset > segment_start:
+            segments.append((segment_start, offset, label))
+        segment_start = offset
+        # A heading resets every level below it
+        path = {l: path[l] for l in LEVELS[:LEVELS.index(level)] if l in path}
+        path[level] = value
+        label = section_label(path)
+    if segment_start < len(text):
+        segments.append((segment_start, len(text), label))
+    return segments
+
+def chunk_sections(chunker, text, max_tokens, is_xml=False):
+    # Returns [(start, end, token_count, section_start, section_end)] covering the whole text.
+    # Whole sections are packed up to max_tokens; oversized sections are split by tokens.
+    chunks = []
+    current = None  # [start, end, token_count, section_start, section_end]
+
+    for start, end, label in split_sections(text, is_xml):
+        token_count = chunker.count_span(text, start, end)
+        if current and current[2] + token_count <= max_tokens:
+            current[1] = end
+            current[2] += token_count
+            current[4] = label
+            continue
+
+        if current:
+            chunks.append(tuple(current))
+            current = None
+        if token_count <= max_tokens:
+            current = [start, end, token_count, label, label]
+        else:
+            # The last piece stays open so the following sections can still be packed into it
+            pieces = chunker.chunk(text, max_tokens, start, end)
+            for piece_start, piece_end, piece_tokens in pieces[:-1]:
+                chunks.append((piece_start, piece_end, piece_tokens, label, label))
+            current = list(pieces[-1]) + [label, label]
+
+    if current:
+        chunks.append(tuple(current))
+    return chunks
@@ -0,0 +1,75 @@
+# Sync state for the active_bill_list scrapers.
+# bill_sync_state records, per congress, the highest bill updateDate that has been committed to
+# active_bill_list. Bill lists are paged in ascending updateDate order from that watermark via
+# fromDateTime, so hourly runs only fetch the delta and an interrupted load resumes from its
+# last committed page.
+# base_load_watermark is the base load's own progress and is only written by
+# get_base_active_bills.py: the hourly script also creates and advances the row, so its
+# last_update_date says nothing about whether a base load was ever started.
+
+from datetime import datetime
+
+
+def ensure_sync_state_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS bill_sync_state (
+        congress INTEGER PRIMARY KEY,
+        last_update_date TEXT,
+        base_load_complete INTEGER DEFAULT 0,
+        base_load_watermark TEXT,
+        updated DATETIME
+    )
+    ''')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(bill_sync_state)')]
+    if 'base_load_watermark' not in columns:
+        conn.execute('ALTER TABLE bill_sync_state ADD COLUMN base_load_watermark TEXT')
+    conn.commit()
+
+def get_sync_state(conn, congress):
+    # Returns (last_update_date, base_load_complete) or (None, 0) if the congress was never synced
+    cursor = conn.execute('''
+    SELECT last_update_date, base_load_complete FROM bill_sync_state WHERE congress = ?
+    ''', (congress,))
+    result = cursor.fetchone()
+    return result if result else (None, 0)
+
+def get_base_load_watermark(conn, congress):
+    # Returns the watermark of a base load that was started and never finished, otherwise None
+    cursor = conn.execute('''
+    SELECT base_load_watermark FROM bill_sync_state WHERE congress = ? AND base_load_complete = 0
+    ''', (congress,))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def reset_sync_state(conn, congress):
+    conn.execute('DELETE FROM bill_sync_state WHERE congress = ?', (congress,))
+    conn.commit()
+
+def advance_watermark(cursor, congress, bills, base_load=False):
+    # Called inside the same transaction as the page insert, so the watermark never runs ahead
+    # of the data. The watermark only ever moves forward. base_load also advances the base
+    # load's own watermark.
+    update_dates = [bill["updateDate"] for bill in bills if bill.get("updateDate")]
+    if not update_dates:
+        return
+    cursor.execute('''
+    INSERT INTO bill_sync_state (congress, last_update_date, base_load_watermark, updated)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(congress) DO UPDATE SET
+        last_update_date = MAX(COALESCE(last_update_date, ''), excluded.last_update_date),
+        base_load_watermark = CASE WHEN excluded.base_load_watermark IS NULL THEN base_load_watermark
+                                   ELSE MAX(COALESCE(base_load_watermark, ''), excluded.base_load_watermark) END,
+        updated = CURRENT_TIMESTAMP
+    ''', (congress, max(update_dates), max(update_dates) if base_load else None))
+
+def mark_base_load_complete(conn, congress):
+    conn.execute('''
+    UPDATE bill_sync_state SET base_load_complete = 1, updated = CURRENT_TIMESTAMP WHERE congress = ?
+    ''', (congress,))
+    conn.commit()
+
+def to_from_date_time(update_date):
+    # updateDate is usually a plain date ("2024-09-20"), but full timestamps are accepted as well
+    if len(update_date) == 10:
+        return datetime.strptime(update_date, "%Y-%m-%d").strftime("%Y-%m-%dT00:00:00Z")
+    return update_date
@@ -0,0 +1,91 @@
+# Trains a compression dictionary on active_bill_text.db, compresses the existing text columns
+# (see text_compression.py) and reports the on-disk size before and after.
+# By default the work is done on a copy so the report can be produced on a live corpus without
+# touching it; --in-place rewrites the database itself.
+#
+# Usage: python congress_api_scraper/compress_bill_text_db.py [--db sys_db/active_bill_text.db] [--in-place] [--samples 1000]
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from text_compression import CODEC_ZSTD, COMPRESSED_COLUMNS, register_text_codec, train_dictionary, zstandard
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+BILL_TEXT_DB = os.path.join(script_dir, 'sys_db', 'active_bill_text.db')
+
+
+def column_sizes(conn):
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(bill_text)') if row[1] in COMPRESSED_COLUMNS]
+    sums = ", ".join(f"COALESCE(SUM(LENGTH(CAST({column} AS BLOB))), 0)" for column in columns)
+    return dict(zip(columns, conn.execute(f"SELECT {sums} FROM bill_text").fetchone()))
+
+def vacuumed_size(db_path):
+    # File size once free pages are dropped, so the before/after numbers are comparable
+    with tempfile.TemporaryDirectory() as work:
+        copy_path = os.path.join(work, "size.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("VACUUM INTO ?", (copy_path,))
+        conn.close()
+        return os.path.getsize(copy_path)
+
+def compress_database(db_path, samples):
+    conn = sqlite3.connect(db_path)
+    register_text_codec(conn)
+    sample_texts = [row[0] for row in conn.execute(
+        f"SELECT decompress_text(bill_text) FROM bill_text WHERE bill_text IS NOT NULL ORDER BY RANDOM() LIMIT {int(samples)}")]
+    dict_id = train_dictionary(conn, sample_texts)
+    conn.close()
+
+    # Reconnect so the codec picks up the new dictionary
+    conn = sqlite3.connect(db_path)
+    codec = register_text_codec(conn)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(bill_text)') if row[1] in COMPRESSED_COLUMNS]
+    updates = ", ".join(f"{column} = compress_text(decompress_text({column}))" for column in columns)
+    conn.execute(f"UPDATE bill_text SET {updates}")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return dict_id, codec.codec
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress active_bill_text.db and report its size before and after")
+    parser.add_argument("--db", default=BILL_TEXT_DB)
+    parser.add_argument("--in-place", action="store_true", help="Rewrite the database instead of a copy")
+    parser.add_argument("--samples", type=int, default=1000, help="bill_text rows used to train the dictionary")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    rows = conn.execute("SELECT COUNT(*) FROM bill_text").fetchone()[0]
+    before_columns = column_sizes(conn)
+    conn.close()
+    before_size = vacuumed_size(args.db)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(args.db))) as work:
+        target = args.db
+        if not args.in_place:
+            target = os.path.join(work, os.path.basename(args.db))
+            shutil.copy2(args.db, target)
+
+        start_time = time.monotonic()
+        dict_id, codec = compress_database(target, args.samples)
+        elapsed = time.monotonic() - start_time
+
+        conn = sqlite3.connect(target)
+        after_columns = column_sizes(conn)
+        conn.close()
+        after_size = os.path.getsize(target)
+
+    print(f"{rows} bill_text rows, compressed with {'zstd' if codec == CODEC_ZSTD else 'zlib'} dictionary {dict_id} in {elapsed:.1f} seconds"
+          f"{'' if zstandard else ' (install zstandard for better ratios)'}")
+    for column, before in before_columns.items():
+        after = after_columns[column]
+        print(f"  {column:<16} {before / 1048576:9.1f} MB -> {after / 1048576:9.1f} MB ({after / before if before else 0:.0%})")
+    print(f"Database file: {before_size / 1048576:.1f} MB -> {after_size / 1048576:.1f} MB ({after_size / before_size if before_size else 0:.0%})"
+          f"{'' if args.in_place else ' (copy; run with --in-place to apply)'}")
+
+if __name__ == "__main__":
+    main()
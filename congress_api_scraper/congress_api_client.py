@@ -0,0 +1,199 @@
+# Shared asyncio/aiohttp client for the congress.gov API.
+# Every scraper goes through this module so that throughput is set by the api.data.gov quota
+# instead of by round-trip latency plus a fixed sleep between calls.
+# Up to MAX_IN_FLIGHT requests are kept open at once and a token bucket holds the overall
+# request rate to the combined hourly quota of the configured keys. Single-resource requests are revalidated against the on-disk
+# response cache so unchanged payloads come back as 304s.
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import aiohttp
+
+from api_key_manager import ApiKeyManager
+from response_cache import ResponseCache, cache_key
+
+# Add the adjacent 'keys' folder to the Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'keys'))
+
+import keys
+
+# API configuration
+API_ROOT_URL = "https://api.congress.gov/v3"
+# keys.API_KEYS may list several api.data.gov keys; older keys.py files only define Key_1
+API_KEYS = getattr(keys, "API_KEYS", [keys.Key_1])
+PAGE_LIMIT = 250  # Maximum allowed by the API
+
+# Rate limit configuration (api.data.gov allows 5,000 requests per key per rolling hour)
+HOURLY_QUOTA = 5000  # Per key; the bucket uses the limit the API reports once known
+BURST_SIZE = 10  # Requests that may be sent back to back before the bucket throttles
+MAX_IN_FLIGHT = 8  # Concurrent open requests
+
+# Retry configuration
+REQUEST_TIMEOUT = 60  # Seconds before a single request is abandoned
+MAX_RETRIES = 5
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    # Token bucket shared by every request of a client. Tokens refill continuously at
+    # rate_per_hour / 3600 per second up to capacity, and each request takes one token.
+
+    def __init__(self, rate_per_hour=HOURLY_QUOTA, capacity=BURST_SIZE):
+        self.rate = rate_per_hour / 3600.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order so no request is starved
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class CongressApiClient:
+    # Usage:
+    #     async with CongressApiClient() as client:
+    #         data = await client.get_json(f"{API_ROOT_URL}/bill/118/hr/1/actions")
+
+    def __init__(self, api_keys=API_KEYS, max_in_flight=MAX_IN_FLIGHT, rate_per_hour=None, burst_size=BURST_SIZE,
+                 use_cache=True):
+        # rate_per_hour defaults to the summed quota of every key
+        self.api_keys = api_keys
+        self.keys = None
+        self.use_cache = use_cache
+        self.cache = None
+        self.max_in_flight = max_in_flight
+        self.rate_per_hour = rate_per_hour
+        self.burst_size = burst_size
+        self.session = None
+        self.request_count = 0
+        self.error_count = 0
+        self.started = None
+
+    async def __aenter__(self):
+        self.keys = ApiKeyManager(self.api_keys)
+        self.bucket = TokenBucket(self.rate_per_hour or self.keys.hourly_quota, self.burst_size)
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight)
+        )
+        if self.use_cache:
+            self.cache = ResponseCache()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        if self.cache:
+            self.cache.close()
+        self.keys.close()
+        elapsed = time.monotonic() - self.started
+        rate = self.request_count / elapsed * 60 if elapsed > 0 else 0
+        logging.info(f"API client closed. {self.request_count} requests, {self.error_count} errors "
+                     f"in {elapsed:.1f} seconds ({rate:.1f} requests/min)")
+
+    async def get_json(self, url, params=None, cached=True):
+        # cached=False skips the response cache, for listings whose params change every run
+        params = dict(params or {})
+        params.setdefault("format", "json")
+
+        key = entry = None
+        headers = {}
+        if cached and self.cache:
+            key = cache_key(url, params)
+            entry = self.cache.lookup(key)
+            headers = self.cache.conditional_headers(entry)
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            api_key = await self.keys.acquire()
+            delay = None
+            async with self.semaphore:
+                try:
+                    async with self.session.get(url, params={**params, "api_key": api_key}, headers=headers) as response:
+                        self.request_count += 1
+                        self.keys.record(api_key, response.status, response.headers)
+                        if response.status == 304 and entry:
+                            logging.info(f"API call {url} status: 304, served from cache")
+                            return self.cache.hit(key, entry)
+                        elif response.status in RETRYABLE_STATUSES and attempt < MAX_RETRIES:
+                            delay = retry_delay(response, attempt)
+                            logging.warning(f"API call {url} status: {response.status}, retrying in {delay:.0f} seconds "
+                                            f"(attempt {attempt}/{MAX_RETRIES})")
+                        else:
+                            response.raise_for_status()
+                            body = await response.text()
+                            if key:
+                                self.cache.store(key, url, response.headers, body)
+                            logging.info(f"API call {url} status: {response.status}, successful!")
+                            return json.loads(body)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt == MAX_RETRIES:
+                        self.error_count += 1
+                        raise aiohttp.ClientError(f"API call {url} failed after {MAX_RETRIES} attempts: {e}") from e
+                    delay = 2 ** attempt
+                    logging.warning(f"API call {url} connection error: {e}, retrying in {delay} seconds")
+                except aiohttp.ClientResponseError:
+                    self.error_count += 1
+                    raise
+            await asyncio.sleep(delay)
+
+    async def iter_pages(self, url, params=None, limit=PAGE_LIMIT, cached=False):
+        # Yields every page of a paginated endpoint in offset order. The first page reports
+        # pagination.count, after which all remaining pages are requested concurrently.
+        params = dict(params or {})
+        params["limit"] = limit
+        start = params.setdefault("offset", 0)
+
+        first_page = await self.get_json(url, params, cached=cached)
+        yield first_page
+
+        pagination = first_page.get("pagination", {})
+        if "count" not in pagination:
+            # Without a total the remaining pages can only be walked one pagination.next at a time
+            offset = start
+            while pagination.get("next"):
+                offset += limit
+                page = await self.get_json(url, {**params, "offset": offset}, cached=cached)
+                yield page
+                pagination = page.get("pagination", {})
+            return
+
+        count = pagination["count"]
+        tasks = [asyncio.ensure_future(self.get_json(url, {**params, "offset": offset}, cached=cached))
+                 for offset in range(start + limit, count, limit)]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            # Stop any pages still outstanding when the caller breaks out early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def retry_delay(response, attempt):
+    if response.status == 429:
+        # The key manager has marked this key spent; the next acquire() moves to another key
+        # or sleeps until the earliest reset
+        return 0
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return 2 ** attempt
@@ -0,0 +1,93 @@
+# Shared SQLite connections for every pipeline stage.
+# Each database is opened once per process (and thread) by get_connection() and configured for the
+# pipeline's workload: WAL journaling so readers never block the writer, synchronous=NORMAL (durable
+# at every checkpoint, no fsync per commit), a memory-mapped file and a larger page cache. The
+# sqlite3 module keeps a per-connection cache of prepared statements, sized by cached_statements,
+# so reusing one connection also reuses the compiled INSERT/SELECT statements.
+# transaction() wraps a stage's writes in one explicit BEGIN IMMEDIATE ... COMMIT.
+# Connections closed by a caller are reopened on the next get_connection(); all are closed at exit.
+
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SYS_DB_DIR = os.path.join(script_dir, "sys_db")
+X_BOT_DB_DIR = os.path.join(os.path.dirname(script_dir), "x_bot", "DB")
+
+ACTIVE_BILL_DATA_DB = os.path.join(SYS_DB_DIR, "active_bill_data.db")
+ACTIVE_BILL_TEXT_DB = os.path.join(SYS_DB_DIR, "active_bill_text.db")
+CONGRESS_DB = os.path.join(SYS_DB_DIR, "congress.db")
+LAWS_DB = os.path.join(SYS_DB_DIR, "laws.db")
+BILL_URL_LIST_DB = os.path.join(SYS_DB_DIR, "bill_url_list.db")
+ACTIVE_BILLS_TWEETS_DB = os.path.join(X_BOT_DB_DIR, "active_bills_tweets.db")
+DID_YOU_KNOW_TWEET_DB = os.path.join(X_BOT_DB_DIR, "didyouknow_tweet.db")
+DID_YOU_KNOW_PARAMETERS_DB = os.path.join(X_BOT_DB_DIR, "didyouknow_bill_parameters.db")
+
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+BUSY_TIMEOUT = 30  # seconds
+CACHED_STATEMENTS = 256
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+]
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def open_connection(db_path):
+    # A new configured connection owned by the caller (e.g. a store object that closes it itself)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def is_open(conn):
+    try:
+        conn.total_changes
+        return True
+    except sqlite3.ProgrammingError:
+        return False
+
+def get_connection(db_path):
+    # The process-wide connection for db_path, opened on first use
+    key = (os.getpid(), threading.get_ident(), os.path.abspath(db_path))
+    with _lock:
+        conn = _connections.get(key)
+        if conn is None or not is_open(conn):
+            os.makedirs(os.path.dirname(key[2]), exist_ok=True)
+            conn = open_connection(key[2])
+            _connections[key] = conn
+        return conn
+
+@contextmanager
+def transaction(conn):
+    # Commits the block's writes together or rolls them all back. Inside an enclosing
+    # transaction() the block simply joins it.
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def close_connections():
+    with _lock:
+        for key, conn in list(_connections.items()):
+            if key[0] == os.getpid() and is_open(conn):
+                conn.close()
+        _connections.clear()
+
+atexit.register(close_connections)
@@ -0,0 +1,125 @@
+# Shared downloader for govinfo bill and law documents (htm/xml).
+# Documents are fetched concurrently over one pooled aiohttp session and streamed to a temporary
+# file next to their destination. The temp file is fsynced and then renamed into place, so a
+# crash never leaves a half-written document under its final name. A gzip-compressed copy can
+# optionally be stored alongside each document.
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import aiohttp
+
+MAX_CONNECTIONS = 8  # Concurrent downloads against govinfo
+REQUEST_TIMEOUT = 120  # Seconds; omnibus bills are several MB
+CHUNK_SIZE = 64 * 1024
+MAX_RETRIES = 3
+RETRY_DELAY = 5  # Seconds, doubled on every retry
+
+
+def fsync_directory(folder):
+    # Makes the rename itself durable; not supported on Windows
+    if os.name != 'nt':
+        fd = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def write_gzip_copy(path):
+    gz_path = f"{path}.gz"
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(gz_path)}.", suffix=".part")
+    try:
+        with open(path, 'rb') as source, os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as target:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+            target.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, gz_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return gz_path
+
+async def stream_to_file(session, url, path):
+    # Returns (size, sha256) of the document written to path
+    folder = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".part")
+    size = 0
+    sha256 = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_directory(folder)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, sha256.hexdigest()
+
+async def download_document(session, semaphore, url, path, compress=False):
+    result = {"url": url, "path": path, "ok": False, "size": 0, "sha256": None, "error": None}
+    async with semaphore:
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                logging.info(f"Attempting to fetch URL: {url}")
+                result["size"], result["sha256"] = await stream_to_file(session, url, path)
+                if compress:
+                    write_gzip_copy(path)
+                result["ok"] = True
+                logging.info(f"Successfully saved content to {path}")
+                return result
+            except aiohttp.ClientResponseError as e:
+                # 4xx answers will not change on retry
+                result["error"] = str(e)
+                if e.status < 500:
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                result["error"] = str(e) or type(e).__name__
+            except Exception as e:
+                # Anything else (e.g. an invalid URL) fails this document only; retrying will not help
+                result["error"] = f"{type(e).__name__}: {e}"
+                break
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+    logging.error(f"Failed to fetch or save URL {url}. Error: {result['error']}")
+    return result
+
+async def download_documents(jobs, max_connections=MAX_CONNECTIONS, compress=False):
+    # jobs is a list of (url, path). Returns one result dict per job, in job order.
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    semaphore = asyncio.Semaphore(max_connections)
+    start_time = time.monotonic()
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        results = await asyncio.gather(*(download_document(session, semaphore, url, path, compress)
+                                         for url, path in jobs))
+
+    elapsed = time.monotonic() - start_time
+    saved = [r for r in results if r["ok"]]
+    total_mb = sum(r["size"] for r in saved) / (1024 * 1024)
+    if elapsed > 0:
+        logging.info(f"Downloaded {len(saved)}/{len(results)} documents ({total_mb:.1f} MB) in {elapsed:.1f} seconds: "
+                     f"{len(saved) / elapsed:.2f} docs/s, {total_mb / elapsed:.2f} MB/s")
+    return results
+
+def download_all(jobs, max_connections=MAX_CONNECTIONS, compress=False):
+    # Synchronous entry point for the scraper scripts
+    if not jobs:
+        return []
+    return asyncio.run(download_documents(jobs, max_connections, compress))
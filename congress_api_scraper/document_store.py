@@ -0,0 +1,171 @@
+# Indexed manifest of the bill/law documents saved by the add_update_* scripts.
+# Documents are named {congress}.{type}.{number}.{version_date}.{fetched_at}.{htm|xml} inside a
+# collection folder (active_bill_text_htm, law_text_htm, bill_text_xml). Instead of listing the
+# folder for every bill, each document is recorded in the document_manifest table and
+# existence checks, "latest file for bill" and stale-version deletion are indexed queries.
+# sync() reconciles the manifest with the folder once per run, so documents added or removed
+# outside of these scripts are still picked up.
+
+import hashlib
+import logging
+import os
+from datetime import datetime
+
+from db_connections import open_connection
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DOCUMENT_DB = os.path.join(script_dir, "sys_db", "document_store.db")
+
+DOCUMENT_EXTENSIONS = ('.htm', '.xml')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def parse_document_name(filename):
+    # Returns (congress, bill_type, bill_number, version_date, fetched_at) or None for files that
+    # are not documents (temp .part files, gzip copies, anything else in the folder)
+    if filename.startswith('.') or not filename.endswith(DOCUMENT_EXTENSIONS):
+        return None
+    parts = filename.split('.')
+    if len(parts) != 6 or not parts[0].isdigit() or not parts[2].isdigit():
+        return None
+    congress, bill_type, bill_number, version_date, fetched_at = parts[:5]
+    try:
+        datetime.strptime(version_date, "%Y-%m-%d")
+    except ValueError:
+        return None
+    return int(congress), bill_type.lower(), int(bill_number), version_date, fetched_at
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class DocumentStore:
+    def __init__(self, folder, db_path=DOCUMENT_DB):
+        self.folder = os.path.abspath(folder)
+        self.collection = os.path.basename(self.folder)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = open_connection(db_path)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS document_manifest (
+            collection TEXT,
+            filename TEXT,
+            congress INTEGER,
+            bill_type TEXT,
+            bill_number INTEGER,
+            version_date TEXT,
+            fetched_at TEXT,
+            size INTEGER,
+            sha256 TEXT,
+            PRIMARY KEY (collection, filename)
+        )
+        ''')
+        self.conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_document_manifest_bill
+        ON document_manifest (collection, congress, bill_type, bill_number, version_date)
+        ''')
+        self.conn.commit()
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def sync(self):
+        # One directory listing per run: register unknown documents and forget missing ones
+        on_disk = set(f for f in os.listdir(self.folder) if parse_document_name(f)) if os.path.isdir(self.folder) else set()
+        known = set(row[0] for row in self.conn.execute(
+            'SELECT filename FROM document_manifest WHERE collection = ?', (self.collection,)))
+
+        missing = known - on_disk
+        if missing:
+            self.conn.executemany('DELETE FROM document_manifest WHERE collection = ? AND filename = ?',
+                                  [(self.collection, f) for f in missing])
+        for filename in on_disk - known:
+            self.register(self.path(filename), commit=False)
+        self.conn.commit()
+        logging.info(f"Document store {self.collection}: {len(on_disk)} documents, "
+                     f"{len(on_disk - known)} registered, {len(missing)} removed from manifest")
+
+    def register(self, path, size=None, sha256=None, commit=True):
+        filename = os.path.basename(path)
+        parsed = parse_document_name(filename)
+        if parsed is None:
+            logging.warning(f"Not registering {filename}: name does not match congress.type.number.date.fetched.ext")
+            return False
+        if size is None:
+            size = os.path.getsize(path)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+        self.conn.execute('''
+        INSERT OR REPLACE INTO document_manifest
+        (collection, filename, congress, bill_type, bill_number, version_date, fetched_at, size, sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (self.collection, filename) + parsed + (size, sha256))
+        if commit:
+            self.conn.commit()
+        return True
+
+    def has_version(self, congress, bill_type, bill_number, version_date):
+        cursor = self.conn.execute('''
+        SELECT 1 FROM document_manifest
+        WHERE collection = ? AND congress = ? AND bill_type = ? AND bill_number = ? AND version_date = ?
+        LIMIT 1
+        ''', (self.collection, int(congress), bill_type.lower(), int(bill_number), version_date))
+        return cursor.fetchone() is not None
+
+    def latest_path(self, congress, bill_type, bill_number):
+        cursor = self.conn.execute('''
+        SELECT filename FROM document_manifest
+        WHERE collection = ? AND congress = ? AND bill_type = ? AND bill_number = ?
+        ORDER BY version_date DESC, fetched_at DESC
+        LIMIT 1
+        ''', (self.collection, int(congress), bill_type.lower(), int(bill_number)))
+        result = cursor.fetchone()
+        return self.path(result[0]) if result else None
+
+    def documents(self):
+        # Latest document per bill as (congress, bill_type, bill_number, path)
+        cursor = self.conn.execute('''
+        SELECT congress, bill_type, bill_number, filename FROM document_manifest AS d
+        WHERE collection = ? AND filename = (
+            SELECT filename FROM document_manifest
+            WHERE collection = d.collection AND congress = d.congress AND bill_type = d.bill_type AND bill_number = d.bill_number
+            ORDER BY version_date DESC, fetched_at DESC
+            LIMIT 1
+        )
+        ORDER BY congress, bill_type, bill_number
+        ''', (self.collection,))
+        return [(congress, bill_type, bill_number, self.path(filename)) for congress, bill_type, bill_number, filename in cursor]
+
+    def delete_stale(self, latest_versions):
+        # latest_versions: iterable of (congress, bill_type, bill_number, version_date) from the url
+        # tables. Deletes every document older than its bill's latest version and returns the count.
+        self.conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS latest_versions (
+            congress INTEGER, bill_type TEXT, bill_number INTEGER, version_date TEXT
+        )
+        ''')
+        self.conn.execute('DELETE FROM latest_versions')
+        self.conn.executemany('INSERT INTO latest_versions VALUES (?, ?, ?, ?)',
+                              [(int(c), t.lower(), int(n), v) for c, t, n, v in latest_versions])
+        stale = self.conn.execute('''
+        SELECT d.filename FROM document_manifest AS d
+        JOIN latest_versions AS l
+        ON d.congress = l.congress AND d.bill_type = l.bill_type AND d.bill_number = l.bill_number
+        WHERE d.collection = ? AND d.version_date < l.version_date
+        ''', (self.collection,)).fetchall()
+
+        for (filename,) in stale:
+            for path in (self.path(filename), self.path(filename) + '.gz'):
+                if os.path.exists(path):
+                    os.remove(path)
+            logging.info(f"Deleted outdated file: {filename}")
+        self.conn.executemany('DELETE FROM document_manifest WHERE collection = ? AND filename = ?',
+                              [(self.collection, filename) for (filename,) in stale])
+        self.conn.commit()
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
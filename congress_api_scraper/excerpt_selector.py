@@ -0,0 +1,155 @@
+# Plain-text excerpts of a bill or law for prompts with a token budget.
+# The tweet and did-you-know generators used to paste the raw govinfo .htm file into the prompt;
+# the markup roughly doubles the token count and omnibus bills overran Gemini's input limit. The
+# tokenizers already store every document as extracted, whitespace-normalized text parts with
+# their token counts (bill_text in active_bill_text.db, law_text_htm in law_text.db), so the
+# generators read those instead:
+#   load_parts()       the stored parts of a document, in order
+#   extract_parts()    the .htm extracted in memory, for documents the tokenizers have not reached
+#   split_units()      the parts cut into sections (bill_sections.split_sections), each with a token
+#                      count scaled from its part's stored count, so nothing is re-tokenized
+#   select_excerpts()  the sections most relevant to a query (the bill title and latest action)
+#                      packed into the budget and returned in document order with their labels
+#   excerpt_window()   consecutive sections from a rotating offset, so successive did-you-know
+#                      tweets about one law are drawn from different parts of it
+# Relevance is the frequency of the query's terms in a section, weighted by how few sections use
+# them and damped by the section's length; the opening sections (short title, findings, purpose)
+# get a small boost since they say what the bill is for.
+
+import logging
+import math
+import re
+from collections import Counter
+
+from bill_sections import PREAMBLE_LABEL, split_sections
+from token_chunker import normalize_whitespace
+
+TERM_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+STOP_WORDS = frozenset("""
+a an and are as at be by for from in is it its of on or that the this to was with
+act acts amend amended any other purposes sec section shall such under may
+""".split())
+
+LEADING_UNITS = 2         # Sections counted as the opening of a document
+LEADING_UNIT_BOOST = 0.5  # Added to their relevance, on a scale where the best section scores 1
+EXCERPT_HEADER_TOKENS = 8  # "[Sec. 101]" header and separator per excerpt
+MIN_TRIMMED_TOKENS = 200   # Smaller leftovers are not filled with the beginning of a section
+
+
+def load_parts(conn, table, congress, bill_type, bill_number, compressed=False):
+    # Returns [(text, token_count, section_start)] in part order. Compressed tables (bill_text in
+    # active_bill_text.db) need register_text_codec() on conn.
+    column = "decompress_text(bill_text)" if compressed else "bill_text"
+    rows = conn.execute(f'''
+        SELECT {column}, token_count, section_start FROM {table}
+        WHERE congress = ? AND bill_type = ? AND bill_number = ?
+        ORDER BY text_part
+    ''', (congress, bill_type.lower(), bill_number)).fetchall()
+    return [(text, token_count, section_start) for text, token_count, section_start in rows if text]
+
+def extract_parts(htm_path, chunker, extractor=None):
+    # The whole document as one part, counted with the chunker
+    from text_extractor import get_extractor
+    with open(htm_path, 'r', encoding='utf-8') as file:
+        html_content = file.read()
+    text = normalize_whitespace(get_extractor(extractor)(html_content))
+    return [(text, chunker.count(text), None)] if text else []
+
+def split_units(parts):
+    # Returns [(label, text, token_count)] for every section of every part
+    units = []
+    for text, token_count, section_start in parts:
+        token_count = token_count or 0
+        for start, end, label in split_sections(text):
+            # A part that opens mid-section continues the section it was cut from
+            if start == 0 and label == PREAMBLE_LABEL and section_start and section_start != PREAMBLE_LABEL:
+                label = f"{section_start} (continued)"
+            units.append((label, text[start:end].strip(), math.ceil(token_count * (end - start) / len(text))))
+    return [unit for unit in units if unit[1]]
+
+def terms(text):
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOP_WORDS]
+
+def rank_units(units, query):
+    # Returns unit indexes, most relevant first; ties keep document order
+    query_terms = set(terms(query or ""))
+    unit_terms = [Counter(term for term in terms(text) if term in query_terms) for _, text, _ in units]
+    document_frequency = Counter(term for counts in unit_terms for term in counts)
+    scores = []
+    for (_, _, token_count), counts in zip(units, unit_terms):
+        score = sum((1 + math.log(count)) * math.log(1 + len(units) / document_frequency[term])
+                    for term, count in counts.items())
+        scores.append(score / math.log(2 + token_count))
+    best = max(scores, default=0) or 1
+    scores = [score / best + (LEADING_UNIT_BOOST if i < LEADING_UNITS else 0) for i, score in enumerate(scores)]
+    return sorted(range(len(units)), key=lambda i: -scores[i])
+
+def trim_unit(unit, token_budget):
+    # Cuts an oversized section down to about token_budget tokens, at a line or word break
+    label, text, token_count = unit
+    cut = int(len(text) * token_budget / token_count)
+    cut = max(text.rfind('\n', 0, cut), text.rfind(' ', 0, cut)) if cut < len(text) else cut
+    return label, text[:max(cut, 0)].rstrip() + " ...", token_budget
+
+def render_units(units, selected, document="bill"):
+    # selected maps unit index to the (possibly trimmed) unit; returns (text, tokens used)
+    pieces = [f"[{selected[i][0]}]\n{selected[i][1]}" for i in sorted(selected)]
+    if len(selected) < len(units) or any(selected[i] is not units[i] for i in selected):
+        pieces.append(f"[Excerpts from {len(selected)} of the {len(units)} sections of this {document}; the rest of the text is omitted.]")
+    used = sum(unit[2] + EXCERPT_HEADER_TOKENS for unit in selected.values())
+    return "\n\n".join(pieces), used
+
+def select_excerpts(units, token_budget, query=None, document="bill"):
+    # Returns (text, tokens used). A document that fits is returned whole; otherwise the sections
+    # are taken by relevance (or in order without a query) while they fit
+    total = sum(token_count for _, _, token_count in units)
+    if total <= token_budget:
+        return "\n\n".join(text for _, text, _ in units), total
+
+    order = rank_units(units, query) if query else range(len(units))
+    selected = {}
+    remaining = token_budget
+    for i in order:
+        cost = units[i][2] + EXCERPT_HEADER_TOKENS
+        if cost <= remaining:
+            selected[i] = units[i]
+            remaining -= cost
+        elif remaining - EXCERPT_HEADER_TOKENS >= MIN_TRIMMED_TOKENS or not selected:
+            # The most relevant section that does not fit fills the rest with its beginning
+            selected[i] = trim_unit(units[i], remaining - EXCERPT_HEADER_TOKENS)
+            break
+        if remaining <= EXCERPT_HEADER_TOKENS:
+            break
+    text, used = render_units(units, selected, document)
+    logging.info(f"Selected {len(selected)} of {len(units)} sections ({used} of {total} tokens, budget {token_budget})")
+    return text, used
+
+def excerpt_window(units, token_budget, offset, document="bill"):
+    # Returns (text, tokens used) for consecutive sections starting offset budgets into the
+    # document, wrapping around at the end
+    total = sum(token_count for _, _, token_count in units)
+    if total <= token_budget:
+        return "\n\n".join(text for _, text, _ in units), total
+
+    start_token = (offset * token_budget) % total
+    first = 0
+    position = 0
+    for i, (_, _, token_count) in enumerate(units):
+        if position + token_count > start_token:
+            first = i
+            break
+        position += token_count
+
+    selected = {}
+    remaining = token_budget
+    for i in list(range(first, len(units))) + list(range(first)):
+        cost = units[i][2] + EXCERPT_HEADER_TOKENS
+        if cost > remaining:
+            if not selected:
+                selected[i] = trim_unit(units[i], remaining - EXCERPT_HEADER_TOKENS)
+            break
+        selected[i] = units[i]
+        remaining -= cost
+    text, used = render_units(units, selected, document)
+    logging.info(f"Window {offset} covers {len(selected)} of {len(units)} sections ({used} of {total} tokens)")
+    return text, used
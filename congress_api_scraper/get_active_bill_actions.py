@@ -1,18 +1,15 @@
-import requests
-import sqlite3
+import asyncio
+import aiohttp
 import logging
 import os
-import sys
 import time
 
-# Add the adjacent 'keys' folder to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'keys'))
-
-import keys
+from congress_api_client import CongressApiClient, API_ROOT_URL, PAGE_LIMIT
+from db_connections import get_connection, transaction
+from schema_migrations import ACTIVE_BILL_DATA, migrate
 
 # API configuration
-API_BASE_URL = "https://api.congress.gov/v3/bill"
-API_KEY = keys.Key_1
+API_BASE_URL = f"{API_ROOT_URL}/bill"
 
 # Database configuration
 ACTIVE_BILLS_DB = os.path.join(os.getcwd(), "congress_api_scraper", "sys_db", "active_bill_data.db")
@@ -26,7 +23,7 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 def create_database():
-    conn = sqlite3.connect(ACTIVE_BILLS_DB)
+    conn = get_connection(ACTIVE_BILLS_DB)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -42,11 +39,11 @@ def create_database():
     )
     ''')
     conn.commit()
-    conn.close()
+    migrate(conn, ACTIVE_BILL_DATA)
     logging.info("Database created/checked successfully")
 
 def get_active_bills():
-    conn = sqlite3.connect(ACTIVE_BILLS_DB)
+    conn = get_connection(ACTIVE_BILLS_DB)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -57,98 +54,92 @@ def get_active_bills():
     ''')
     
     bills = cursor.fetchall()
-    conn.close()
     return bills
 
-def fetch_bill_actions(congress, bill_type, bill_number):
-    params = {
-        "format": "json",
-        "api_key": API_KEY
-    }
-
+async def fetch_bill_actions(client, congress, bill_type, bill_number):
+    # Follows the pagination so bills with more than one page of actions are not truncated
     url = f"{API_BASE_URL}/{congress}/{bill_type}/{bill_number}/actions"
-    response = requests.get(url, params=params)
-    logging.info(f"API call to {url} successful.")
-    response.raise_for_status()
-    return response.json().get("actions", [])
-
-def action_exists(cursor, congress, bill_type, bill_number, action_code, action_date):
-    cursor.execute('''
-    SELECT 1 FROM bill_actions
-    WHERE congress = ? AND billType = ? AND billNumber = ? AND actionCode = ? AND actionDate = ?
-    ''', (congress, bill_type, bill_number, action_code, action_date))
-    return cursor.fetchone() is not None
-
-def insert_actions(actions, congress, bill_type, bill_number):
-    conn = sqlite3.connect(ACTIVE_BILLS_DB)
-    cursor = conn.cursor()
-
-    inserted_count = 0
-    skipped_count = 0
+    actions = []
+    async for page in client.iter_pages(url, limit=PAGE_LIMIT, cached=True):
+        actions.extend(page.get("actions", []))
+    return actions
+
+def insert_actions(conn, actions, congress, bill_type, bill_number):
+    # One executemany for the bill's actions and the actions_updated flag, committed together
+    rows = []
     error_count = 0
 
     for action in actions:
-        action_code = action.get("actionCode", "")
         action_date = action.get("actionDate", "")
-        action_text = action.get("text", "")
-        action_type = action.get("type", "")
 
         if not action_date:
             logging.warning(f"Skipping action with missing date for {congress} {bill_type}-{bill_number}")
             error_count += 1
             continue
 
-        if not action_exists(cursor, congress, bill_type, bill_number, action_code, action_date):
-            try:
-                cursor.execute('''
-                INSERT INTO bill_actions (
-                    congress, billType, billNumber, actionCode, actionDate, actionText, actionType
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    congress,
-                    bill_type,
-                    bill_number,
-                    action_code,
-                    action_date,
-                    action_text,
-                    action_type
-                ))
-                inserted_count += 1
-            except sqlite3.IntegrityError:
-                logging.warning(f"Integrity error inserting record: {congress}, {bill_type}, {bill_number}, {action_code}, {action_date}")
-                error_count += 1
-        else:
-            skipped_count += 1
-
-    # Update the actions_updated flag in the active_bill_list table
-    cursor.execute('''
-    UPDATE active_bill_list
-    SET actions_updated = 1
-    WHERE congress = ? AND billType = ? AND billNumber = ?
-    ''', (congress, bill_type, bill_number))
-
-    conn.commit()
-    conn.close()
-    logging.info(f"Inserted {inserted_count} new actions, skipped {skipped_count} existing actions, and encountered {error_count} errors for {congress} {bill_type}-{bill_number}")
+        rows.append((
+            congress,
+            bill_type,
+            bill_number,
+            action.get("actionCode", ""),
+            action_date,
+            action.get("text", ""),
+            action.get("type", "")
+        ))
+
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.executemany('''
+        INSERT OR IGNORE INTO bill_actions (
+            congress, billType, billNumber, actionCode, actionDate, actionText, actionType
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        inserted_count = cursor.rowcount if rows else 0
+
+        # Update the actions_updated flag in the active_bill_list table
+        cursor.execute('''
+        UPDATE active_bill_list
+        SET actions_updated = 1
+        WHERE congress = ? AND billType = ? AND billNumber = ?
+        ''', (congress, bill_type, bill_number))
+
+    logging.info(f"Inserted {inserted_count} new actions, skipped {len(rows) - inserted_count} existing actions, and encountered {error_count} errors for {congress} {bill_type}-{bill_number}")
+
+async def update_bill_actions(client, conn, congress, bill_type, bill_number):
+    # Returns True when the bill's actions were stored
+    try:
+        actions = await fetch_bill_actions(client, congress, bill_type, bill_number)
+        insert_actions(conn, actions, congress, bill_type, bill_number)
+        logging.info(f"Fetched and inserted {len(actions)} actions for {congress} {bill_type}-{bill_number}")
+        return True
+    except aiohttp.ClientError as e:
+        logging.error(f"Error fetching data for {congress} {bill_type}-{bill_number}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error processing {congress} {bill_type}-{bill_number}: {e}")
+    return False
+
+async def update_all_bill_actions(active_bills):
+    # Every bill is scheduled at once; the client bounds how many requests are actually in flight.
+    # Writes happen on the event loop thread, so the single connection is never shared across threads.
+    conn = get_connection(ACTIVE_BILLS_DB)
+    async with CongressApiClient() as client:
+        results = await asyncio.gather(*(update_bill_actions(client, conn, congress, bill_type, bill_number)
+                                         for congress, bill_type, bill_number in active_bills))
+    return sum(results)
 
 def main():
     logging.info("Starting bill actions update process")
     create_database()
     active_bills = get_active_bills()
     logging.info(f"{len(active_bills)} active bills requiring updates.")
-    
-    for congress, bill_type, bill_number in active_bills:
-        try:
-            actions = fetch_bill_actions(congress, bill_type, bill_number)
-            insert_actions(actions, congress, bill_type, bill_number)
-            logging.info(f"Fetched and inserted actions for {congress} {bill_type}-{bill_number}")
-            time.sleep(1)  # Add a delay to avoid hitting rate limits
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching data for {congress} {bill_type}-{bill_number}: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error processing {congress} {bill_type}-{bill_number}: {e}")
-
-    logging.info("Completed bill actions update process")
+
+    start_time = time.time()
+    updated_bills = asyncio.run(update_all_bill_actions(active_bills))
+    elapsed = time.time() - start_time
+    bills_per_minute = updated_bills / elapsed * 60 if elapsed > 0 else 0
+
+    logging.info(f"Completed bill actions update process. {updated_bills}/{len(active_bills)} bills updated "
+                 f"in {elapsed:.1f} seconds ({bills_per_minute:.1f} bills/min)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
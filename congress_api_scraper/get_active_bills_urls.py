@@ -1,24 +1,17 @@
 import os
+import re
 import sqlite3
-import requests
-from datetime import datetime
+import asyncio
+import aiohttp
+from datetime import datetime, timedelta
 import logging
-import time
-import sys
+
+from congress_api_client import CongressApiClient, API_ROOT_URL
+from db_connections import get_connection
 
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
 script_dir = os.path.dirname(script_path)
-parent_dir = os.path.dirname(script_dir)
-
-# Construct the path to the keys.py file
-keys_path = os.path.join(parent_dir, 'keys', 'keys.py')
-
-# Add the directory containing keys.py to sys.path
-sys.path.append(os.path.dirname(keys_path))
-
-# Import the Key_1 from keys.py
-from keys import Key_1
 
 # Set up logging
 log_dir = os.path.join(script_dir, "Logs")
@@ -28,14 +21,23 @@ log_file = os.path.join(log_dir, "active_bill_urls.log")
 logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Constants
-API_BASE_URL = "https://api.congress.gov/v3/bill"
-API_KEY = Key_1
+API_BASE_URL = f"{API_ROOT_URL}/bill"
 DB_PATH = os.path.join(script_dir, "sys_db", "active_bill_data.db")
-DELAY_BETWEEN_CALLS = 1  # 1 second delay between API calls
+
+# Text version detection
+# Most actions (referrals, hearings) never produce a new text version, so /text is only re-queried
+# when an action since the last check matches one of these, or the last check is older than
+# TEXT_RECHECK_DAYS.
+TEXT_VERSION_ACTION_PATTERN = re.compile(
+    r'\b(reported|passed|agreed to|engrossed|enrolled|amendment|presented to president|'
+    r'signed by president|became public law|placed on .{0,40}calendar)\b',
+    re.IGNORECASE
+)
+TEXT_RECHECK_DAYS = 14
 
 def create_target_table():
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS active_bill_urls (
@@ -51,25 +53,31 @@ def create_target_table():
             )
         """)
         conn.commit()
+        ensure_text_version_columns(conn)
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
 
-def fetch_bill_data(congress, bill_type, bill_number):
+def ensure_text_version_columns(conn):
+    # text_version_count/text_checked_date record what the last /text call returned and when
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(active_bill_urls)")]
+    if "text_version_count" not in columns:
+        conn.execute("ALTER TABLE active_bill_urls ADD COLUMN text_version_count INTEGER")
+    if "text_checked_date" not in columns:
+        conn.execute("ALTER TABLE active_bill_urls ADD COLUMN text_checked_date DATETIME")
+    conn.commit()
+
+def has_text_version_signal(cursor, congress, bill_number, bill_type, since_date):
+    cursor.execute("""
+        SELECT actionText FROM bill_actions
+        WHERE congress = ? AND billType = ? AND billNumber = ? AND actionDate >= ?
+    """, (congress, bill_type.lower(), bill_number, since_date.strftime("%Y-%m-%d")))
+    return any(TEXT_VERSION_ACTION_PATTERN.search(action_text or "") for (action_text,) in cursor.fetchall())
+
+async def fetch_bill_data(client, congress, bill_type, bill_number):
     url = f"{API_BASE_URL}/{congress}/{bill_type}/{bill_number}/text"
-    params = {
-        "format": "json",
-        "api_key": API_KEY
-    }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        if response.status_code == 200:
-            logging.info(f"API call {url} status: {response.status_code}, successful!")
-        return response.json()
-    except requests.RequestException as e:
+        return await client.get_json(url)
+    except aiohttp.ClientError as e:
         logging.error(f"API request failed: {e}")
         return None
 
@@ -96,21 +104,66 @@ def get_latest_formatted_urls(text_versions):
     
     return latest_date.strftime("%Y-%m-%d %H:%M:%S") if latest_date else None, latest_urls
 
-def update_active_bill_urls():
-    conn = sqlite3.connect(DB_PATH)
+async def update_bill_urls(client, conn, congress, bill_number, bill_type, known_version_count, stats):
     cursor = conn.cursor()
+    bill_data = await fetch_bill_data(client, congress, bill_type.lower(), bill_number)
+    if bill_data is None:
+        stats["failed_calls"] += 1
+        return
+    stats["text_calls"] += 1
+
+    if bill_data and 'textVersions' in bill_data:
+        version_count = len(bill_data['textVersions'])
+        if known_version_count is not None and version_count == known_version_count:
+            stats["unchanged"] += 1
+        latest_date, latest_urls = get_latest_formatted_urls(bill_data['textVersions'])
+        if latest_date:
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Replacing only after a successful fetch keeps the old URLs if the call fails
+            cursor.execute('''
+                INSERT OR REPLACE INTO active_bill_urls 
+                (congress, billNumber, billType, latest_date, formatted_text_url, formatted_xml_url, pdf_url, insert_date,
+                 text_version_count, text_checked_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (congress, bill_number, bill_type.lower(), latest_date, 
+                  latest_urls["formatted_text_url"], 
+                  latest_urls["formatted_xml_url"], 
+                  latest_urls["pdf_url"],
+                  current_time,
+                  version_count,
+                  current_time))
+            conn.commit()
+            logging.info(f"Updated data for bill {bill_type}{bill_number} in congress {congress} ({version_count} text versions)")
+        else:
+            logging.warning(f"No formatted URLs found for bill {bill_type}{bill_number} in congress {congress}")
+    else:
+        logging.warning(f"No text versions found for bill {bill_type}{bill_number} in congress {congress}")
+
+def mark_text_current(cursor, congress, bill_number, bill_type):
+    # Moves insert_date past the latest action so the bill is not re-evaluated until its next action
+    cursor.execute("""
+        UPDATE active_bill_urls SET insert_date = ?
+        WHERE congress = ? AND billNumber = ? AND billType = ?
+    """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), congress, bill_number, bill_type.lower()))
+
+async def update_active_bill_urls():
+    conn = get_connection(DB_PATH)
+    cursor = conn.cursor()
+    stats = {"text_calls": 0, "failed_calls": 0, "avoided": 0, "unchanged": 0}
 
     try:
         cursor.execute("""
-            SELECT a.congress, a.billNumber, a.billType, a.latestActionDate, 
-                   u.latest_date, u.insert_date
+            SELECT a.congress, a.billNumber, a.billType, a.latestActionDate, a.actions_updated,
+                   u.insert_date, u.text_version_count, COALESCE(u.text_checked_date, u.insert_date)
             FROM active_bill_list a
             LEFT JOIN active_bill_urls u
             ON a.congress = u.congress AND a.billNumber = u.billNumber AND a.billType = u.billType
         """)
         
+        recheck_before = datetime.now() - timedelta(days=TEXT_RECHECK_DAYS)
+        bills_to_update = []
         for row in cursor.fetchall():
-            congress, bill_number, bill_type, latest_action_date, existing_latest_date, existing_insert_date = row
+            congress, bill_number, bill_type, latest_action_date, actions_updated, existing_insert_date, known_version_count, text_checked_date = row
             
             should_update = False
             if existing_insert_date is None:
@@ -118,51 +171,36 @@ def update_active_bill_urls():
             else:
                 latest_action_date = datetime.strptime(latest_action_date, "%Y-%m-%d")
                 existing_insert_date = datetime.strptime(existing_insert_date, "%Y-%m-%d %H:%M:%S")
-                if latest_action_date > existing_insert_date:
+                text_checked_date = datetime.strptime(text_checked_date, "%Y-%m-%d %H:%M:%S")
+                if latest_action_date <= existing_insert_date:
+                    logging.info(f"Skipping bill {congress}.{bill_type}.{bill_number}. Latest text already pulled.")
+                elif not actions_updated or text_checked_date < recheck_before:
+                    # Actions not loaded yet, or the last /text check is too old to trust
+                    should_update = True
+                elif has_text_version_signal(cursor, congress, bill_number, bill_type, text_checked_date):
                     should_update = True
                 else:
-                    logging.info(f"Skipping bill {congress}.{bill_type}.{bill_number}. Latest text already pulled.")
+                    stats["avoided"] += 1
+                    mark_text_current(cursor, congress, bill_number, bill_type)
+                    logging.info(f"Skipping bill {congress}.{bill_type}.{bill_number}. No action since the last text check produces a new text version.")
             if should_update:
-                # Delete existing row if it's outdated
-                if existing_insert_date is not None:
-                    cursor.execute("""
-                        DELETE FROM active_bill_urls
-                        WHERE congress = ? AND billNumber = ? AND billType = ?
-                    """, (congress, bill_number, bill_type.lower()))
-                
-                bill_data = fetch_bill_data(congress, bill_type.lower(), bill_number)
-                
-                if bill_data and 'textVersions' in bill_data:
-                    latest_date, latest_urls = get_latest_formatted_urls(bill_data['textVersions'])
-                    if latest_date:
-                        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        cursor.execute('''
-                            INSERT INTO active_bill_urls 
-                            (congress, billNumber, billType, latest_date, formatted_text_url, formatted_xml_url, pdf_url, insert_date)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (congress, bill_number, bill_type.lower(), latest_date, 
-                              latest_urls["formatted_text_url"], 
-                              latest_urls["formatted_xml_url"], 
-                              latest_urls["pdf_url"],
-                              current_time))
-                        conn.commit()
-                        logging.info(f"Updated data for bill {bill_type}{bill_number} in congress {congress}")
-                        time.sleep(DELAY_BETWEEN_CALLS)
-                    else:
-                        logging.warning(f"No formatted URLs found for bill {bill_type}{bill_number} in congress {congress}")
-                        time.sleep(DELAY_BETWEEN_CALLS)
-                else:
-                    logging.warning(f"No text versions found for bill {bill_type}{bill_number} in congress {congress}")
-                    time.sleep(DELAY_BETWEEN_CALLS)            
+                bills_to_update.append((congress, bill_number, bill_type, known_version_count))
+        conn.commit()
+
+        logging.info(f"{len(bills_to_update)} bills require a text URL update")
+        async with CongressApiClient() as client:
+            await asyncio.gather(*(update_bill_urls(client, conn, congress, bill_number, bill_type, known_version_count, stats)
+                                   for congress, bill_number, bill_type, known_version_count in bills_to_update))
+
+        logging.info(f"Made {stats['text_calls']} /text calls ({stats['failed_calls']} more failed) and avoided {stats['avoided']}. "
+                     f"{stats['unchanged']} calls found no new text version.")
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
-    finally:
-        conn.close()
 
 def main():
     create_target_table()
-    update_active_bill_urls()
+    asyncio.run(update_active_bill_urls())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
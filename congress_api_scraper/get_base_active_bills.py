@@ -1,22 +1,23 @@
 # This script will create the DB active_bills_data.db and pull all activities for the current congressional period.
 # EACH TIME THIS SCRIPT RUNS IT WILL TUNCATE THE ACTIVE_BILLS TABLE AND RECREATE THE WHOLE THING
+# If the previous base load was interrupted it resumes from the last committed page (see bill_sync_state.py) instead.
 
-import requests
-import sqlite3
+import asyncio
+import aiohttp
 from datetime import datetime, timedelta
 import sys
-import time
 import os
 import logging
 
-# Add the adjacent 'keys' folder to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'keys'))
-
-import keys
+from congress_api_client import CongressApiClient, API_ROOT_URL, PAGE_LIMIT
+from active_bill_list_store import ensure_active_bill_list, upsert_bills
+from db_connections import get_connection, transaction
+from schema_migrations import ACTIVE_BILL_DATA, migrate
+from bill_sync_state import (ensure_sync_state_table, get_base_load_watermark, reset_sync_state, advance_watermark,
+                             mark_base_load_complete, to_from_date_time)
 
 # API configuration
-API_BASE_URL = "https://api.congress.gov/v3/bill"
-API_KEY = keys.Key_1
+API_BASE_URL = f"{API_ROOT_URL}/bill"
 
 # Database configuration
 DB_NAME = os.path.join(os.getcwd(), "congress_api_scraper", "sys_db", "active_bill_data.db")
@@ -30,36 +31,34 @@ LOG_FILE = os.path.join(LOG_DIR, "get_base_active_bills.log")
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def create_database():
-    conn = sqlite3.connect(DB_NAME)
+def create_database(reset=True):
+    conn = get_connection(DB_NAME)
     cursor = conn.cursor()
     
-    # Drop the table if it exists
-    cursor.execute('DROP TABLE IF EXISTS active_bill_list')
+    # Drop the table if it exists, unless an interrupted load is being resumed
+    if reset:
+        cursor.execute('DROP TABLE IF EXISTS active_bill_list')
     
-    cursor.execute('''
-    CREATE TABLE active_bill_list (
-        congress INTEGER,
-        billNumber TEXT,
-        billType TEXT,
-        title TEXT,
-        originChamber TEXT,
-        originChamberCode TEXT,
-        latestActionDate TEXT,
-        latestActionText TEXT,
-        updateDate TEXT,
-        url TEXT,
-        actions_updated INTEGER DEFAULT 0,
-        insert_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-        importance TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
-    logging.info("Database created/reset successfully")
+    ensure_active_bill_list(conn)
+    migrate(conn, ACTIVE_BILL_DATA)
+    logging.info(f"Database {'created/reset' if reset else 'opened for resume'} successfully")
+
+def get_base_load_start(congress, session_start_date):
+    # Returns (fromDateTime, resuming). A base load that never finished resumes from its own
+    # watermark; otherwise the whole congress is reloaded from the session start. The hourly
+    # script's watermark is never resumed from.
+    conn = get_connection(DB_NAME)
+    ensure_sync_state_table(conn)
+    base_load_watermark = get_base_load_watermark(conn, congress)
+
+    if base_load_watermark:
+        return to_from_date_time(base_load_watermark), True
+
+    reset_sync_state(conn, congress)
+    return to_from_date_time(session_start_date), False
 
 def get_active_congress_and_start_date():
-    conn = sqlite3.connect(CONGRESS_DB)
+    conn = get_connection(CONGRESS_DB)
     cursor = conn.cursor()
     
     today = datetime.now().strftime("%Y-%m-%d")
@@ -71,7 +70,6 @@ def get_active_congress_and_start_date():
     ''', (today,))
     
     result = cursor.fetchone()
-    conn.close()
     
     if result:
         return result[0], result[1]
@@ -79,116 +77,66 @@ def get_active_congress_and_start_date():
         logging.error("No active congress found")
         sys.exit(1)
 
-def fetch_bills(congress, offset=0):
+async def fetch_bills(client, congress, from_date_time):
+    # Yields one page of bills at a time; later pages are already in flight while a page is processed.
+    # Ascending order lets the sync watermark advance page by page.
     params = {
-        "format": "json",
-        "offset": offset,
-        "limit": 250,  # Maximum allowed by the API
-        "sort": "updateDate+desc",
-        "api_key": API_KEY
+        "fromDateTime": from_date_time,
+        "sort": "updateDate+asc"
     }
 
     url = f"{API_BASE_URL}/{congress}"
-    response = requests.get(url, params=params)
-    logging.info(f"API call {requests.get(url, params=params)} successful.")
-    response.raise_for_status()
-    return response.json()["bills"]
-
-def insert_or_update_bills(bills):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    for bill in bills:
-        # Check if the bill already exists
-        cursor.execute('''
-        SELECT updateDate FROM active_bill_list
-        WHERE congress = ? AND billNumber = ? AND billType = ? AND title = ? AND latestActionDate = ?
-        ''', (
-            bill["congress"],
-            bill["number"],
-            bill["type"].lower(),
-            bill["title"],
-            bill["latestAction"]["actionDate"]
-        ))
-
-        existing_bill = cursor.fetchone()
-
-        if existing_bill:
-            # If the existing bill is older, delete it
-            if existing_bill[0] < bill["updateDate"]:
-                cursor.execute('''
-                DELETE FROM active_bill_list
-                WHERE congress = ? AND billNumber = ? AND billType = ? AND title = ? AND latestActionDate = ?
-                ''', (
-                    bill["congress"],
-                    bill["number"],
-                    bill["type"].lower(),
-                    bill["title"],
-                    bill["latestAction"]["actionDate"]
-                ))
-            else:
-                continue  # Skip this bill if it's not newer
-
-        # Insert the new or updated bill
-        cursor.execute('''
-        INSERT INTO active_bill_list (
-            congress, billNumber, billType, title, originChamber, originChamberCode,
-            latestActionDate, latestActionText, updateDate, url, actions_updated, insert_date, importance
-        ) VALUES (?, ?, lower(?), ?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, NULL)
-        ''', (
-            bill["congress"],
-            bill["number"],
-            bill["type"],
-            bill["title"],
-            bill["originChamber"],
-            bill["originChamberCode"],
-            bill["latestAction"]["actionDate"],
-            bill["latestAction"]["text"],
-            bill["updateDate"],
-            bill["url"]
-        ))
-
-    conn.commit()
-    conn.close()
-
-def main():
-    logging.info("Starting bill update process")
-    create_database()
+    async for page in client.iter_pages(url, params, limit=PAGE_LIMIT):
+        yield page["bills"]
+
+def insert_or_update_bills(conn, congress, bills):
+    # The page and its watermark are committed together
+    with transaction(conn):
+        cursor = conn.cursor()
+        updated_count, inserted_count = upsert_bills(cursor, bills)
+        advance_watermark(cursor, congress, bills, base_load=True)
+    return updated_count, inserted_count
+
+async def fetch_and_store_bills(active_congress, from_date_time):
+    # Returns (total_bills, completed)
     total_bills = 0
-    offset = 0
-    active_congress, session_start_date = get_active_congress_and_start_date()
-    logging.info(f"Active Congress: {active_congress}, Session Start Date: {session_start_date}")
-
-    session_start_datetime = datetime.strptime(session_start_date, "%Y-%m-%d")
+    conn = get_connection(DB_NAME)
 
-    while True:
+    async with CongressApiClient() as client:
         try:
-            bills = fetch_bills(active_congress, offset)
-            if not bills:
-                break
+            async for bills in fetch_bills(client, active_congress, from_date_time):
+                if not bills:
+                    break
 
-            # Check if the oldest bill in this batch is older than the session start date
-            oldest_bill_date = datetime.strptime(bills[-1]["updateDate"], "%Y-%m-%d").replace(tzinfo=None)
-            if oldest_bill_date < session_start_datetime:
-                logging.info("Reached bills older than the session start date. Stopping the process.")
-                break
+                insert_or_update_bills(conn, active_congress, bills)
+                total_bills += len(bills)
 
-            insert_or_update_bills(bills)
-            total_bills += len(bills)
-            offset += len(bills)
+                logging.info(f"Fetched and processed {len(bills)} bills. Total: {total_bills}")
 
-            logging.info(f"Fetched and processed {len(bills)} bills. Total: {total_bills}")
+        except aiohttp.ClientError as e:
+            logging.error(f"Error fetching data: {e}")
+            return total_bills, False
 
-            if len(bills) < 250:  # If we get less than the maximum, we've reached the end
-                break
+    return total_bills, True
 
-            time.sleep(1)  # Add a delay to avoid hitting rate limits
+def main():
+    logging.info("Starting bill update process")
+    active_congress, session_start_date = get_active_congress_and_start_date()
+    logging.info(f"Active Congress: {active_congress}, Session Start Date: {session_start_date}")
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching data: {e}")
-            break
+    from_date_time, resuming = get_base_load_start(active_congress, session_start_date)
+    create_database(reset=not resuming)
+    if resuming:
+        logging.info(f"Resuming interrupted base load from {from_date_time}")
 
-    logging.info(f"Completed. Total bills fetched and processed: {total_bills}")
+    total_bills, completed = asyncio.run(fetch_and_store_bills(active_congress, from_date_time))
+
+    if completed:
+        conn = get_connection(DB_NAME)
+        mark_base_load_complete(conn, active_congress)
+        logging.info(f"Completed. Total bills fetched and processed: {total_bills}")
+    else:
+        logging.warning(f"Base load interrupted after {total_bills} bills. The next run resumes from the last committed page.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
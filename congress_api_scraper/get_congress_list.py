@@ -1,22 +1,16 @@
 # This python script gets a list of all congress sessions, congresses, and creates a dataset.  This data is pulled from congress.gov API located here: https://gpo.congress.gov/#/congress/congress_list1
 # This is version 1.2 of the script
 
-import requests
-import sqlite3
-import time
+import asyncio
+import aiohttp
 import re
-import sys
 import os
 
-# Add the adjacent 'keys' folder to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'keys'))
-
-import keys
+from congress_api_client import CongressApiClient, API_ROOT_URL
+from db_connections import get_connection, transaction
 
 # API configuration
-API_BASE_URL = "https://api.congress.gov/v3/congress"
-API_KEY = keys.Key_1
-FORMAT = "json"
+API_BASE_URL = f"{API_ROOT_URL}/congress"
 LIMIT = 250
 
 # Database configuration
@@ -24,7 +18,7 @@ DB_NAME = os.path.join(os.getcwd(),"congress_api_scraper", "sys_db", "congress.d
 TABLE_NAME = "congress_list"
 
 def create_database():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(DB_NAME)
     cursor = conn.cursor()
     
     cursor.execute(f"""
@@ -42,22 +36,13 @@ def create_database():
     """)
     
     conn.commit()
-    conn.close()
 
-def fetch_data(offset):
-    params = {
-        "api_key": API_KEY,
-        "format": FORMAT,
-        "offset": offset,
-        "limit": LIMIT
-    }
-    
-    response = requests.get(API_BASE_URL, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching data: {response.status_code}")
-        return None
+async def fetch_data(client):
+    try:
+        async for page in client.iter_pages(API_BASE_URL, limit=LIMIT):
+            yield page
+    except aiohttp.ClientError as e:
+        print(f"Error fetching data: {e}")
 
 def extract_congress_number(congress_name):
     match = re.search(r'(\d+)', congress_name)
@@ -66,52 +51,46 @@ def extract_congress_number(congress_name):
     return None
 
 def insert_data(data):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    conn = get_connection(DB_NAME)
+    with transaction(conn):
+        cursor = conn.cursor()
     
-    for congress in data["congresses"]:
-        for session in congress["sessions"]:
-            cursor.execute(f"""
-            INSERT INTO {TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                extract_congress_number(congress_name=congress["name"]),
-                congress["name"],
-                int(congress["startYear"]),
-                int(congress["endYear"]),
-                session.get("number", None), # Use None if number is not present
-                session["chamber"],
-                session["startDate"],
-                session.get("endDate", None),  # Use None if endDate is not present
-                session["type"]
-            ))
-    
-    conn.commit()
-    conn.close()
+        for congress in data["congresses"]:
+            for session in congress["sessions"]:
+                cursor.execute(f"""
+                INSERT INTO {TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    extract_congress_number(congress_name=congress["name"]),
+                    congress["name"],
+                    int(congress["startYear"]),
+                    int(congress["endYear"]),
+                    session.get("number", None), # Use None if number is not present
+                    session["chamber"],
+                    session["startDate"],
+                    session.get("endDate", None),  # Use None if endDate is not present
+                    session["type"]
+                ))
 
-def main():
-    create_database()
-    offset = 0
+async def fetch_and_store_congresses():
     total_records = 0
     
-    while True:
-        print(f"Fetching data with offset {offset}...")
-        data = fetch_data(offset)
-        
-        if data is None or not data["congresses"]:
-            break
-        
-        insert_data(data)
-        
-        records_fetched = len(data["congresses"])
-        total_records += records_fetched
-        print(f"Inserted {records_fetched} records. Total records: {total_records}")
-        
-        if records_fetched < LIMIT:
-            break
-        
-        offset += LIMIT
-        time.sleep(1)  # Wait for 1 second before the next request
+    async with CongressApiClient() as client:
+        async for data in fetch_data(client):
+            if not data["congresses"]:
+                break
+            
+            insert_data(data)
+            
+            records_fetched = len(data["congresses"])
+            total_records += records_fetched
+            print(f"Inserted {records_fetched} records. Total records: {total_records}")
     
+    return total_records
+
+def main():
+    create_database()
+    print("Fetching congress data...")
+    total_records = asyncio.run(fetch_and_store_congresses())
     print(f"Data collection complete. Total records inserted: {total_records}")
 
 if __name__ == "__main__":
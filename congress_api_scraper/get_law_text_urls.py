@@ -2,13 +2,15 @@
 # This is version 2.0 and now includes xml and pdf urls
 
 import sqlite3
-import requests
+import asyncio
+import aiohttp
 from datetime import datetime
 import logging
-import time
-import sys
 import os
 
+from congress_api_client import CongressApiClient, API_ROOT_URL
+from db_connections import get_connection
+
 
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
@@ -16,34 +18,19 @@ script_path = os.path.abspath(__file__)
 # Get the directory containing the script
 script_dir = os.path.dirname(script_path)
 
-# Get the parent directory (cong-scrape-1)
-parent_dir = os.path.dirname(script_dir)
-
-# Construct the path to the keys.py file
-keys_path = os.path.join(parent_dir, 'keys', 'keys.py')
-
-# Add the directory containing keys.py to sys.path
-sys.path.append(os.path.dirname(keys_path))
-
-# Import the Key_1 from keys.py
-from keys import Key_1
-
 # Set up logging
 log_file = os.path.join(script_dir, "Logs", "get_law_text_urls.log")
 logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Constants
-API_BASE_URL = "https://api.congress.gov/v3/bill"
-API_KEY = Key_1
+API_BASE_URL = f"{API_ROOT_URL}/bill"
 SOURCE_DB = os.path.join(script_dir, "sys_db", "laws.db")
 TARGET_DB = os.path.join(script_dir, "sys_db", "bill_url_list.db")
 TARGET_TABLE = "bill_urls"
-DELAY_BETWEEN_CALLS = 1  # 1 second delay between API calls
-RETRY_DELAY = 60  # 60 second retry delay on connection error
 
 def create_target_table():
     try:
-        conn = sqlite3.connect(TARGET_DB)
+        conn = get_connection(TARGET_DB)
         cursor = conn.cursor()
         cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS {TARGET_TABLE} (
@@ -60,23 +47,12 @@ def create_target_table():
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
 
-def fetch_bill_data(congress, bill_type, bill_number):
+async def fetch_bill_data(client, congress, bill_type, bill_number):
     url = f"{API_BASE_URL}/{congress}/{bill_type}/{bill_number}/text"
-    params = {
-        "format": "json",
-        "api_key": API_KEY
-    }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        if response.status_code == 200:
-            logging.info(f"API call {url} status: {response}, successful!")
-        return response.json()
-    except requests.RequestException as e:
+        return await client.get_json(url)
+    except aiohttp.ClientError as e:
         logging.error(f"API request failed: {e}")
         return None
 
@@ -99,48 +75,48 @@ def get_latest_formatted_urls(text_versions):
     
     return latest_date.strftime("%Y-%m-%dT%H:%M:%SZ") if latest_date else None, latest_urls
 
+async def update_bill_urls(client, target_conn, congress, bill_type, bill_number):
+    bill_data = await fetch_bill_data(client, congress, bill_type, bill_number)
+    
+    if bill_data and 'textVersions' in bill_data:
+        latest_date, latest_urls = get_latest_formatted_urls(bill_data['textVersions'])
+        if latest_date:
+            target_conn.execute('''
+                INSERT OR REPLACE INTO bill_urls 
+                (bill_number, bill_type, congress, latest_date, formatted_text_url, formatted_xml_url, pdf_url)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (bill_number, bill_type, congress, latest_date, 
+                  latest_urls["Formatted Text"], 
+                  latest_urls["Formatted XML"], 
+                  latest_urls["PDF"]))
+            target_conn.commit()
+            logging.info(f"Inserted/Updated data for bill {bill_type}{bill_number} in congress {congress}")
+        else:
+            logging.warning(f"No formatted URLs found for bill {bill_type}{bill_number} in congress {congress}")
+    else:
+        logging.warning(f"No text versions found for bill {bill_type}{bill_number} in congress {congress}")
+
+async def update_all_bill_urls(target_conn, laws):
+    async with CongressApiClient() as client:
+        await asyncio.gather(*(update_bill_urls(client, target_conn, congress, bill_type, bill_number)
+                               for congress, bill_type, bill_number in laws))
+
 def main():
     create_target_table()
 
     try:
-        source_conn = sqlite3.connect(SOURCE_DB)
+        source_conn = get_connection(SOURCE_DB)
         source_cursor = source_conn.cursor()
-        target_conn = sqlite3.connect(TARGET_DB)
-        target_cursor = target_conn.cursor()
+        target_conn = get_connection(TARGET_DB)
 
         source_cursor.execute("SELECT congress_number, lower(bill_type), bill_number FROM law_list")
-        for row in source_cursor.fetchall():
-            congress, bill_type, bill_number = row
-            bill_data = fetch_bill_data(congress, bill_type, bill_number)
-            
-            if bill_data and 'textVersions' in bill_data:
-                latest_date, latest_urls = get_latest_formatted_urls(bill_data['textVersions'])
-                if latest_date:
-                    target_cursor.execute('''
-                        INSERT OR REPLACE INTO bill_urls 
-                        (bill_number, bill_type, congress, latest_date, formatted_text_url, formatted_xml_url, pdf_url)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (bill_number, bill_type, congress, latest_date, 
-                          latest_urls["Formatted Text"], 
-                          latest_urls["Formatted XML"], 
-                          latest_urls["PDF"]))
-                    target_conn.commit()
-                    logging.info(f"Inserted/Updated data for bill {bill_type}{bill_number} in congress {congress}")
-                else:
-                    logging.warning(f"No formatted URLs found for bill {bill_type}{bill_number} in congress {congress}")
-            else:
-                logging.warning(f"No text versions found for bill {bill_type}{bill_number} in congress {congress}")
-            
-            # Add delay between API calls
-            time.sleep(DELAY_BETWEEN_CALLS)
+        laws = source_cursor.fetchall()
+        logging.info(f"Fetching text URLs for {len(laws)} laws")
+
+        asyncio.run(update_all_bill_urls(target_conn, laws))
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
-    finally:
-        if source_conn:
-            source_conn.close()
-        if target_conn:
-            target_conn.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
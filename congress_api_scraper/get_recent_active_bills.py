@@ -1,22 +1,25 @@
 # This script functions similar to the get_active_bills_base.py
-# EACH TIME THIS SCRIPT RUNS IT WILL PULL UPDATES FROM THE LAST 4 DAYS AND INSERT OR UPDATE THEM
+# EACH TIME THIS SCRIPT RUNS IT WILL PULL UPDATES SINCE THE LAST SYNCED updateDate AND INSERT OR UPDATE THEM
+# The watermark lives in the bill_sync_state table (see bill_sync_state.py). Without one it falls back to the last 4 days.
 
-import requests
-import sqlite3
+import asyncio
+import aiohttp
 from datetime import datetime, timedelta
 import sys
-import time
 import os
 import logging
 
-# Add the adjacent 'keys' folder to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'keys'))
-
-import keys
+from congress_api_client import CongressApiClient, API_ROOT_URL, PAGE_LIMIT
+from active_bill_list_store import ensure_active_bill_list, upsert_bills
+from db_connections import get_connection, transaction
+from schema_migrations import ACTIVE_BILL_DATA, migrate
+from bill_sync_state import ensure_sync_state_table, get_sync_state, advance_watermark, to_from_date_time
 
 # API configuration
-API_BASE_URL = "https://api.congress.gov/v3/bill"
-API_KEY = keys.Key_1
+API_BASE_URL = f"{API_ROOT_URL}/bill"
+
+# Sync configuration
+LOOKBACK_DAYS = 4  # Window used when no watermark has been recorded yet
 
 # Database configuration
 DB_NAME = os.path.join(os.getcwd(), "congress_api_scraper", "sys_db", "active_bill_data.db")
@@ -31,33 +34,23 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 def ensure_database():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS active_bill_list (
-        congress INTEGER,
-        billNumber TEXT,
-        billType TEXT,
-        title TEXT,
-        originChamber TEXT,
-        originChamberCode TEXT,
-        latestActionDate TEXT,
-        latestActionText TEXT,
-        updateDate TEXT,
-        url TEXT,
-        actions_updated INTEGER DEFAULT 0,
-        insert_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-        importance TEXT,
-        PRIMARY KEY (congress, billNumber, billType)
-    )
-    ''')
-    conn.commit()
-    conn.close()
+    conn = get_connection(DB_NAME)
+    ensure_active_bill_list(conn)
+    ensure_sync_state_table(conn)
+    migrate(conn, ACTIVE_BILL_DATA)
     logging.info("Database structure ensured")
 
+def get_from_date_time(congress):
+    conn = get_connection(DB_NAME)
+    last_update_date, _ = get_sync_state(conn, congress)
+
+    if last_update_date:
+        return to_from_date_time(last_update_date)
+    lookback = datetime.now() - timedelta(days=LOOKBACK_DAYS)
+    return lookback.strftime("%Y-%m-%dT00:00:00Z")
+
 def get_active_congress():
-    conn = sqlite3.connect(CONGRESS_DB)
+    conn = get_connection(CONGRESS_DB)
     cursor = conn.cursor()
     
     today = datetime.now().strftime("%Y-%m-%d")
@@ -69,7 +62,6 @@ def get_active_congress():
     ''', (today,))
     
     result = cursor.fetchone()
-    conn.close()
     
     if result:
         return result[0]
@@ -77,123 +69,58 @@ def get_active_congress():
         logging.error("No active congress found")
         sys.exit(1)
 
-def fetch_bills(congress, offset=0):
-    four_days_ago = datetime.now() - timedelta(days=4)
-    now = datetime.now()
+async def fetch_bills(client, congress, from_date_time):
+    # Yields one page of bills at a time; later pages are already in flight while a page is processed.
+    # Ascending order lets the sync watermark advance page by page.
     params = {
-        "format": "json",
-        "offset": offset,
-        "limit": 250,  # Maximum allowed by the API
-        "fromDateTime": four_days_ago.strftime("%Y-%m-%dT00:00:00Z"),
-        "toDateTime": now.strftime("%Y-%m-%dT00:00:00Z"),
-        "sort": "updateDate+desc",
-        "api_key": API_KEY
+        "fromDateTime": from_date_time,
+        "sort": "updateDate+asc"
     }
 
     url = f"{API_BASE_URL}/{congress}"
-    response = requests.get(url, params=params)
-    logging.info(f"API call {url} successful.")
-    response.raise_for_status()
-    return response.json()["bills"]
-
-def insert_or_update_bills(bills):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    updated_count = 0
-    inserted_count = 0
-    for bill in bills:
-        # Check if the bill already exists
-        cursor.execute('''
-        SELECT latestActionDate FROM active_bill_list
-        WHERE congress = ? AND billNumber = ? AND billType = ?
-        ''', (
-            bill["congress"],
-            bill["number"],
-            bill["type"].lower()
-        ))
-
-        existing_bill = cursor.fetchone()
-
-        if existing_bill:
-            # Update the existing record if the new latestActionDate is more recent
-            if existing_bill[0] < bill["latestAction"]["actionDate"]:
-                cursor.execute('''
-                UPDATE active_bill_list SET
-                title = ?, originChamber = ?, originChamberCode = ?, latestActionDate = ?, 
-                latestActionText = ?, updateDate = ?, url = ?, 
-                actions_updated = 0, importance = NULL, insert_date = CURRENT_TIMESTAMP, tweet_created = 0
-                WHERE congress = ? AND billNumber = ? AND billType = ?
-                ''', (
-                    bill["title"],
-                    bill["originChamber"],
-                    bill["originChamberCode"],
-                    bill["latestAction"]["actionDate"],
-                    bill["latestAction"]["text"],
-                    bill["updateDate"],
-                    bill["url"],
-                    bill["congress"],
-                    bill["number"],
-                    bill["type"].lower()
-                ))
-                updated_count += 1
-        else:
-            # Insert the new bill
-            cursor.execute('''
-            INSERT INTO active_bill_list (
-                congress, billNumber, billType, title, originChamber, originChamberCode,
-                latestActionDate, latestActionText, updateDate, url, actions_updated, insert_date, importance
-            ) VALUES (?, ?, lower(?), ?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, NULL)
-            ''', (
-                bill["congress"],
-                bill["number"],
-                bill["type"],
-                bill["title"],
-                bill["originChamber"],
-                bill["originChamberCode"],
-                bill["latestAction"]["actionDate"],
-                bill["latestAction"]["text"],
-                bill["updateDate"],
-                bill["url"]
-            ))
-            inserted_count += 1
-
-    conn.commit()
-    conn.close()
+    async for page in client.iter_pages(url, params, limit=PAGE_LIMIT):
+        yield page["bills"]
+
+def insert_or_update_bills(conn, congress, bills):
+    # The page and its watermark are committed together
+    with transaction(conn):
+        cursor = conn.cursor()
+        updated_count, inserted_count = upsert_bills(cursor, bills)
+        advance_watermark(cursor, congress, bills)
     return updated_count, inserted_count
 
-def main():
-    logging.info("Starting recent bill update process")
-    ensure_database()
+async def fetch_and_store_bills(active_congress, from_date_time):
     total_bills = 0
     total_updated = 0
     total_inserted = 0
-    offset = 0
-    active_congress = get_active_congress()
-    logging.info(f"Active Congress: {active_congress}")
+    conn = get_connection(DB_NAME)
 
-    while True:
+    async with CongressApiClient() as client:
         try:
-            bills = fetch_bills(active_congress, offset)
-            if not bills:
-                break
+            async for bills in fetch_bills(client, active_congress, from_date_time):
+                if not bills:
+                    break
 
-            updated_count, inserted_count = insert_or_update_bills(bills)
-            total_updated += updated_count
-            total_inserted += inserted_count
-            total_bills += len(bills)
-            offset += len(bills)
+                updated_count, inserted_count = insert_or_update_bills(conn, active_congress, bills)
+                total_updated += updated_count
+                total_inserted += inserted_count
+                total_bills += len(bills)
 
-            logging.info(f"Fetched {len(bills)} bills, updated {updated_count}, inserted {inserted_count}. Total processed: {total_bills}")
+                logging.info(f"Fetched {len(bills)} bills, updated {updated_count}, inserted {inserted_count}. Total processed: {total_bills}")
 
-            if len(bills) < 250:  # If we get less than the maximum, we've reached the end
-                break
+        except aiohttp.ClientError as e:
+            logging.error(f"Error fetching data: {e}")
 
-            time.sleep(1)  # Add a delay to avoid hitting rate limits
+    return total_bills, total_updated, total_inserted
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching data: {e}")
-            break
+def main():
+    logging.info("Starting recent bill update process")
+    ensure_database()
+    active_congress = get_active_congress()
+    from_date_time = get_from_date_time(active_congress)
+    logging.info(f"Active Congress: {active_congress}, fetching bills updated since {from_date_time}")
+
+    total_bills, total_updated, total_inserted = asyncio.run(fetch_and_store_bills(active_congress, from_date_time))
 
     logging.info(f"Completed. Total bills processed: {total_bills}, updated: {total_updated}, inserted: {total_inserted}")
 
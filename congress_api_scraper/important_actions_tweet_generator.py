@@ -1,4 +1,6 @@
 import os
+import re
+import json
 import sqlite3
 import datetime
 import logging
@@ -7,7 +9,16 @@ from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import sys
 import time
 import secrets
-import re
+
+from document_store import DocumentStore
+from db_connections import get_connection
+from token_chunker import TokenChunker
+from text_compression import register_text_codec
+from bill_manifest import (STRATEGY_CHUNKED, STRATEGY_FULL, build_prompt_text, choose_prompt_strategy, create_manifest_table,
+                           get_manifest, refresh_manifest)
+from excerpt_selector import extract_parts, load_parts, select_excerpts, split_units
+from prompt_preamble import legislation_preamble, dated_context, bill_generator, delete_gemini_cache, log_gemini_usage
+from schema_migrations import ACTIVE_BILL_DATA, ACTIVE_BILL_TEXT, ACTIVE_BILLS_TWEETS, migrate
 
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
@@ -65,18 +76,80 @@ safety_settings = [
     },
 ]
 
+# Shared by every prompt and sent as the system instruction; the bill and the task follow it
+TWEET_PREAMBLE = legislation_preamble("""
+As an unbiased reporter, you write tweets about the recent important actions and key facts of the legislation in question, as the task at the end of the prompt asks.
+Focus on the most recent and significant developments, and on key, important facts from the bill text.
+Do not provide any party affiliations of sponsors or co-sponsors.
+""")
+
+BODY_TASK = """Provide a short report about the recent important actions and key facts of this legislation.
+The report should be 4-5 paragraphs long.
+Do not include a title in the response.
+Always include the section notation of the text if referencing it so that your reader can easily look it up."""
+
+TITLE_TASK = """Provide a concise and informative title for a tweet about the most recent important action and key facts of this legislation.
+The title should be no longer than 100 characters."""
+
+HASHTAG_TASK = """Provide 5 relevant hashtags for a tweet about the recent important actions and key facts of this legislation.
+One hashtag should always include the bill number in the format #{congress}_{bill_type}{bill_number} (e.g., #118_S_2024).
+If the bill has become a public law, use the format #PL{congress}_{law_number} instead (e.g., #PL118_53).
+The other hashtags should be related to the bill's content, recent actions, or key topics.
+Do not include any party affiliations or politician names in the hashtags.
+Provide only the hashtags, separated by spaces, without any additional text or explanation."""
+
+# Single-call mode asks for the title, body and hashtags together as one JSON object; only the
+# fields that fail validation are asked for again with the targeted task above
+single_call_mode = True
+
+TWEET_TASK = """Write a tweet about the recent important actions and key facts of this legislation as a JSON object with these fields:
+title: a concise and informative title about the most recent important action or a key fact, no longer than 100 characters.
+body: a short report of 4-5 paragraphs about the recent important actions and key facts, without a title. Always include the section notation of the text if referencing it so that your reader can easily look it up.
+hashtags: 5 relevant hashtags. One hashtag should always include the bill number in the format #{congress}_{bill_type}{bill_number} (e.g., #118_S_2024); if the bill has become a public law, use the format #PL{congress}_{law_number} instead (e.g., #PL118_53). The others should be related to the bill's content, recent actions, or key topics, without party affiliations or politician names."""
+
+TWEET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "body": {"type": "string"},
+        "hashtags": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["title", "body", "hashtags"],
+}
+
+TITLE_MAX_LENGTH = 100
+HASHTAG_PATTERN = re.compile(r'^#\w+$')
+
+model_name = "gemini-1.5-flash"
+
 try:
-    model = genai.GenerativeModel(model_name="gemini-1.5-flash",
+    model = genai.GenerativeModel(model_name=model_name,
                                   generation_config=generation_config,
-                                  safety_settings=safety_settings)
+                                  safety_settings=safety_settings,
+                                  system_instruction=TWEET_PREAMBLE)
+    json_model = genai.GenerativeModel(model_name=model_name,
+                                       generation_config={**generation_config,
+                                                          "response_mime_type": "application/json",
+                                                          "response_schema": TWEET_SCHEMA},
+                                       safety_settings=safety_settings,
+                                       system_instruction=TWEET_PREAMBLE)
     logging.info("Generative model initialized successfully")
 except Exception as e:
     logging.error(f"Failed to initialize generative model: {str(e)}")
     raise
 
+# Bill text tokens allowed in a tweet prompt. The extracted text from active_bill_text.db is sent
+# whole when it fits, then the part summaries; past that, the sections most relevant to the title
+# and latest action are selected (with use_excerpt_selector off, the first parts that fit)
+tweet_prompt_token_budget = 100000
+use_excerpt_selector = True
+
+# Sizes bill contexts for the Gemini context cache
+chunker = TokenChunker()
+
 def connect_to_db(db_path):
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         conn.text_factory = str
         logging.info(f"Successfully connected to database: {db_path}")
         return conn
@@ -134,58 +207,55 @@ def get_mostrecent_bill_action(conn, congress, bill_type, bill_number):
         logging.error(f"Error retrieving bill actions: {str(e)}")
         raise
 
-def find_bill_file(bill_text_dir, congress, bill_type, bill_number):
-    logging.info(f"Bill text directory is: {bill_text_dir}")
+def find_bill_file(store, congress, bill_type, bill_number):
     logging.debug(f"Looking for bill file: {congress}.{bill_type}.{bill_number}")
-    for filename in os.listdir(bill_text_dir):
-        if filename.endswith('.htm'):
-            # This regex pattern is more flexible and will match variations in naming
-            pattern = rf"{congress}\.{bill_type}\.{bill_number}\."
-            if re.search(pattern, filename):
-                return os.path.join(bill_text_dir, filename)
-    logging.warning(f"No bill file found for {congress}.{bill_type}.{bill_number}")
-    return None
-
-def get_bill_text(bill_file):
+    bill_file = store.latest_path(congress, bill_type, bill_number)
+    if bill_file is None:
+        logging.warning(f"No bill file found for {congress}.{bill_type}.{bill_number}")
+    return bill_file
+
+def get_bill_text(conn_text, store, congress, bill_type, bill_number, query):
+    # Plain text under tweet_prompt_token_budget, never the .htm markup. query (title and latest
+    # action) ranks the sections of bills too large to send whole.
+    bill_type = bill_type.lower()
+    try:
+        manifest = get_manifest(conn_text, congress, bill_type, bill_number)
+        if manifest is None:
+            refresh_manifest(conn_text, congress, bill_type, bill_number, chunker)
+            manifest = get_manifest(conn_text, congress, bill_type, bill_number)
+        if manifest and use_excerpt_selector and choose_prompt_strategy(manifest, tweet_prompt_token_budget) == STRATEGY_CHUNKED:
+            parts = load_parts(conn_text, "bill_text", congress, bill_type, bill_number, compressed=True)
+            bill_text, _ = select_excerpts(split_units(parts), tweet_prompt_token_budget, query)
+            logging.info(f"Retrieved bill text excerpts for {congress}.{bill_type}.{bill_number}")
+            return bill_text
+        if manifest:
+            _, bill_text = build_prompt_text(conn_text, congress, bill_type, bill_number, tweet_prompt_token_budget, STRATEGY_FULL, chunker)
+            if bill_text:
+                logging.info(f"Retrieved bill text for {congress}.{bill_type}.{bill_number} from the bill_text table")
+                return bill_text
+    except sqlite3.Error as e:
+        logging.error(f"Error reading bill text for {congress}.{bill_type}.{bill_number}: {str(e)}")
+
+    # Not tokenized yet: extract the text of the latest .htm instead
+    bill_file = find_bill_file(store, congress, bill_type, bill_number)
     if bill_file is None:
         logging.warning("No bill file found")
         return "Bill text not available"
     try:
-        with open(bill_file, 'r', encoding='utf-8') as file:
-            content = file.read()
-        logging.info(f"Retrieved bill text from {bill_file}")
-        return content
-    except IOError as e:
+        bill_text, _ = select_excerpts(split_units(extract_parts(bill_file, chunker)), tweet_prompt_token_budget, query)
+        logging.info(f"Extracted bill text from {bill_file}")
+        return bill_text or "Bill text not available"
+    except (IOError, ImportError) as e:
         logging.error(f"Error reading bill text file {bill_file}: {str(e)}")
         return "Error reading bill text"
 
-def construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
+def construct_bill_context(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action):
+    # Everything about the bill that the body, title and hashtag prompts share
     bill_text_preview = bill_text[:15] if bill_text else "N/A"
     bill_actions_preview = bill_actions[:15] if bill_actions else "N/A"
-    mostrecent_bill_action_preview = mostrecent_bill_action[:15] if bill_actions else "N/A"
-    
-    prompt = f"""
-    <Instructions>
-    As an unbiased reporter, provide a short report about the recent important actions and key facts of this legislation.
-    The report should be 4-5 paragraphs long.
-    Do not include a title in the response.
-    Focus on the most recent and significant developments, and provide key, important facts from the bill text.
-    Always include the section notation of the text if referencing it so that your reader can easily look it up.
-    Do not provide any party affiliations of sponsors or co-sponsors.
-    </Instructions>
-    <Additional Details>
-    The most recent bill action is: "{mostrecent_bill_action}"
-    Today's date is {today_date}. Current sitting President: Joe Biden
-    Key action meanings:
-    "Presented to President" - This means the legislation has been brought forward to the President's office but the legislation has not yet been signed or vetoed.
-    "Signed by President" - This means the legislation has been signed by the president and become public law.
-    Bills: A bill is the form used for most legislation, whether permanent or temporary, general or special, public or private. Bills are presented to the President for action when approved in identical form by both the House of Representatives and the Senate.
-    Joint Resolutions: Joint resolutions may originate either in the House of Representatives or in the Senate. They are subject to the same procedure as bills, except for joint resolutions proposing amendments to the Constitution.
-    Concurrent Resolutions: Matters affecting the operations of both the House of Representatives and Senate are usually initiated by means of concurrent resolutions. They are not presented to the President for action.
-    Simple Resolutions: A matter concerning the operation of either the House of Representatives or Senate alone is initiated by a simple resolution. They are not presented to the President for action.
-    </Additional Details>
 
+    context = f"""
+    <Most Recent Bill Action>{mostrecent_bill_action}</Most Recent Bill Action>
     <Congress>{congress}</Congress>
     <Bill Title>{bill_title}</Bill Title>
     <Bill Number>{bill_type}{bill_number}</Bill Number>
@@ -196,120 +266,114 @@ def construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bi
     {bill_actions}
     </Bill Actions>
     """
-    logging.info(f"Constructed prompt for bill {congress}.{bill_type}.{bill_number}.  Here is the info included.. Date: {today_date} \ Bill text preview: {bill_text_preview} \ Bill actions preview: {bill_actions_preview}.")
-    return prompt
-
-def construct_title_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
-    bill_text_preview = bill_text[:15] if bill_text else "N/A"
-    bill_actions_preview = bill_actions[:15] if bill_actions else "N/A"
-    mostrecent_bill_action_preview = mostrecent_bill_action[:15] if bill_actions else "N/A"
-
-    prompt = f"""
-    <Instructions>
-    As an unbiased reporter, provide a concise and informative title for a tweet about the most recent important action and key facts of this legislation.
-    The title should be no longer than 100 characters.
-    Focus on the most recent and significant developments, or a key important fact from the bill text.
-    Do not include any party affiliations of sponsors or co-sponsors.
-    </Instructions>
-    <Additional Details>
-    The most recent bill action is: "{mostrecent_bill_action}"
-    Today's date is {today_date}. Current sitting President: Joe Biden
-    Key action meanings:
-    "Presented to President" - This means the legislation has been brought forward to the President's office but the legislation has not yet been signed or vetoed.
-    "Signed by President" - This means the legislation has been signed by the president and become public law.
-    </Additional Details>
-
-    <Congress>{congress}</Congress>
-    <Bill Title>{bill_title}</Bill Title>
-    <Bill Number>{bill_type}{bill_number}</Bill Number>
-    <Bill Text>
-    {bill_text}
-    </Bill Text>
-    <Bill Actions>
-    {bill_actions}
-    </Bill Actions>
+    logging.info(f"Constructed bill context for bill {congress}.{bill_type}.{bill_number}.  Here is the info included.. Bill text preview: {bill_text_preview} \ Bill actions preview: {bill_actions_preview}.")
+    return context
+
+def construct_prompt(bill_context, task):
+    # The task goes last so the preamble and the bill context stay a shared prefix. bill_context
+    # is None when the model already holds it in a context cache.
+    return f"""{bill_context or ""}
+    <Task>
+    {dated_context()}
+    {task}
+    </Task>
     """
-    logging.info(f"Constructed title prompt for bill {congress}.{bill_type}.{bill_number}")
-    return prompt
-
-def construct_hashtag_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action):
-    today_date = datetime.date.today().strftime("%B %d, %Y")
-    bill_text_preview = bill_text[:15] if bill_text else "N/A"
-    bill_actions_preview = bill_actions[:15] if bill_actions else "N/A"
-    mostrecent_bill_action_preview = mostrecent_bill_action[:15] if bill_actions else "N/A"
-    
-    prompt = f"""
-    <Instructions>
-    As an unbiased reporter, provide 5 relevant hashtags for a tweet about the recent important actions and key facts of this legislation.
-    One hashtag should always include the bill number in the format #{{congress}}_{{bill_type}}{{bill_number}} (e.g., #118_S_2024).
-    If the bill has become a public law, use the format #PL{{congress}}_{{law_number}} instead (e.g., #PL118_53).
-    The other hashtags should be related to the bill's content, recent actions, or key topics.
-    Do not include any party affiliations or politician names in the hashtags.
-    Provide only the hashtags, separated by spaces, without any additional text or explanation.
-    </Instructions>
-    <Additional Details>
-    The most recent bill action is: "{mostrecent_bill_action}"
-    Today's date is {today_date}. Current sitting President: Joe Biden
-    Key action meanings:
-    "Presented to President" - This means the legislation has been brought forward to the President's office but the legislation has not yet been signed or vetoed.
-    "Signed by President" - This means the legislation has been signed by the president and become public law.
-    </Additional Details>
 
-    <Congress>{congress}</Congress>
-    <Bill Title>{bill_title}</Bill Title>
-    <Bill Number>{bill_type}{bill_number}</Bill Number>
-    <Bill Text>
-    {bill_text}
-    </Bill Text>
-    <Bill Actions>
-    {bill_actions}
-    </Bill Actions>
-    """
-    logging.info(f"Constructed hashtag prompt for bill {congress}.{bill_type}.{bill_number}")
-    return prompt
+def generate_text(prompt, generator, label):
+    response = (generator or model).generate_content(prompt)
+    logging.info(f"Generated {label} content from AI model")
+    log_gemini_usage(response, f"Gemini {label} usage")
+    return response.text
 
-def generate_tweet(prompt):
+def generate_tweet(prompt, generator=None):
     try:
-        response = model.generate_content(prompt)
-        logging.info("Generated tweet content from AI model")
-        return response.text
+        return generate_text(prompt, generator, "tweet")
     except Exception as e:
         logging.error(f"Error generating tweet content: {str(e)}")
         raise
 
-def generate_title(prompt):
+def generate_title(prompt, generator=None):
     try:
-        response = model.generate_content(prompt)
-        logging.info("Generated title content from AI model")
-        return response.text.strip()
+        return generate_text(prompt, generator, "title").strip()
     except Exception as e:
         logging.error(f"Error generating title content: {str(e)}")
         raise
 
-def generate_hashtags(prompt, congress, bill_type, bill_number):
+def generate_hashtags(prompt, congress, bill_type, bill_number, generator=None):
     try:
-        response = model.generate_content(prompt)
-        hashtags = response.text.strip().split()
-        
-        # Ensure the bill number hashtag is included and in the correct format
-        bill_hashtag = f"#{congress}_{bill_type}{bill_number}"
-        if not any(h.upper() == bill_hashtag.upper() for h in hashtags):
-            if any(h.upper().startswith("#PL") for h in hashtags):
-                # If it's a public law, don't add the bill number hashtag
-                pass
-            else:
-                hashtags.insert(0, bill_hashtag)
-        
-        # Limit to 4 hashtags if more are generated
-        hashtags = hashtags[:4]
-        
+        hashtags = finalize_hashtags(generate_text(prompt, generator, "hashtag").strip().split(), congress, bill_type, bill_number)
         logging.info(f"Generated hashtags for bill {congress}.{bill_type}.{bill_number}")
-        return " ".join(hashtags)
+        return hashtags
     except Exception as e:
         logging.error(f"Error generating hashtags: {str(e)}")
         raise
 
+def finalize_hashtags(hashtags, congress, bill_type, bill_number):
+    # Ensure the bill number hashtag is included and in the correct format
+    bill_hashtag = f"#{congress}_{bill_type}{bill_number}"
+    if not any(h.upper() == bill_hashtag.upper() for h in hashtags):
+        if any(h.upper().startswith("#PL") for h in hashtags):
+            # If it's a public law, don't add the bill number hashtag
+            pass
+        else:
+            hashtags.insert(0, bill_hashtag)
+
+    # Limit to 4 hashtags if more are generated
+    hashtags = hashtags[:4]
+    return " ".join(hashtags)
+
+def validate_tweet_fields(fields):
+    # Returns the names of the fields that are missing or unusable
+    failed = []
+    title = fields.get("title")
+    if not isinstance(title, str) or not title.strip() or len(title.strip()) > TITLE_MAX_LENGTH:
+        failed.append("title")
+    body = fields.get("body")
+    if not isinstance(body, str) or not body.strip():
+        failed.append("body")
+    hashtags = fields.get("hashtags")
+    if (not isinstance(hashtags, list) or not hashtags
+            or not all(isinstance(h, str) and HASHTAG_PATTERN.match(h.strip()) for h in hashtags)):
+        failed.append("hashtags")
+    return failed
+
+def generate_tweet_fields(bill_context, congress, bill_type, bill_number):
+    # One JSON call for the title, body and hashtags; returns (body, title, hashtags)
+    try:
+        fields = json.loads(generate_text(construct_prompt(bill_context, TWEET_TASK), json_model, "structured tweet"))
+        if not isinstance(fields, dict):
+            fields = {}
+    except json.JSONDecodeError as e:
+        logging.warning(f"Structured tweet for bill {congress}.{bill_type}.{bill_number} was not valid JSON: {str(e)}")
+        fields = {}
+
+    failed = validate_tweet_fields(fields)
+    if failed:
+        logging.warning(f"Re-asking for {', '.join(failed)} of bill {congress}.{bill_type}.{bill_number}")
+    tweet_body = generate_tweet(construct_prompt(bill_context, BODY_TASK)) if "body" in failed else fields["body"]
+    tweet_title = generate_title(construct_prompt(bill_context, TITLE_TASK)) if "title" in failed else fields["title"].strip()
+    if "hashtags" in failed:
+        hashtags = generate_hashtags(construct_prompt(bill_context, HASHTAG_TASK), congress, bill_type, bill_number)
+    else:
+        hashtags = finalize_hashtags([h.strip() for h in fields["hashtags"]], congress, bill_type, bill_number)
+    return tweet_body, tweet_title, hashtags
+
+def generate_tweet_separately(bill_context, congress, bill_type, bill_number):
+    # The three-call path: body, title and hashtags each get their own prompt about the same bill
+    generator, cache, prompt_context = bill_generator(model, model_name, TWEET_PREAMBLE, generation_config, safety_settings,
+                                                      bill_context, 3, chunker.count)
+    try:
+        tweet_body = generate_tweet(construct_prompt(prompt_context, BODY_TASK), generator)
+        time.sleep(5) # 5 Seconds between next API Call
+
+        tweet_title = generate_title(construct_prompt(prompt_context, TITLE_TASK), generator)
+        time.sleep(5) # 5 Seconds between next API Call
+
+        hashtags = generate_hashtags(construct_prompt(prompt_context, HASHTAG_TASK), congress, bill_type, bill_number, generator)
+    finally:
+        delete_gemini_cache(cache)
+    return tweet_body, tweet_title, hashtags
+
 def create_tweet_table(conn):
     try:
         cursor = conn.cursor()
@@ -330,6 +394,7 @@ def create_tweet_table(conn):
             )
         ''')
         conn.commit()
+        migrate(conn, ACTIVE_BILLS_TWEETS)
         logging.info("Created or confirmed existence of active_bills_tweets table")
     except sqlite3.Error as e:
         logging.error(f"Error creating tweet table: {str(e)}")
@@ -370,13 +435,22 @@ def update_tweet_created(conn, congress, bill_type, bill_number):
 def main():
     try:
         active_bill_data_db = os.path.join(script_dir, 'sys_db', 'active_bill_data.db')
+        active_bill_text_db = os.path.join(script_dir, 'sys_db', 'active_bill_text.db')
         active_bills_tweets_db = os.path.join(parent_dir, 'x_bot', 'DB', 'active_bills_tweets.db')
         bill_text_dir = os.path.join(script_dir, 'active_bill_text_htm')
+        logging.info(f"Bill text directory is: {bill_text_dir}")
+        store = DocumentStore(bill_text_dir)
+        store.sync()
 
         conn_data = connect_to_db(active_bill_data_db)
+        conn_text = connect_to_db(active_bill_text_db)
         conn_tweets = connect_to_db(active_bills_tweets_db)
+        register_text_codec(conn_text)
 
         create_tweet_table(conn_tweets)
+        create_manifest_table(conn_text)
+        migrate(conn_data, ACTIVE_BILL_DATA)
+        migrate(conn_text, ACTIVE_BILL_TEXT)
 
         must_know_bills = get_must_know_bills(conn_data)
 
@@ -385,19 +459,14 @@ def main():
             bill_actions = get_bill_actions(conn_data, congress, bill_type, bill_number)
             mostrecent_bill_action = get_mostrecent_bill_action(conn_data, congress, bill_type, bill_number)
             
-            bill_file = find_bill_file(bill_text_dir, congress, bill_type, bill_number)
-            bill_text = get_bill_text(bill_file)
+            query = " ".join([bill_title or ""] + [action_text for _, action_text in mostrecent_bill_action])
+            bill_text = get_bill_text(conn_text, store, congress, bill_type, bill_number, query)
 
-            prompt = construct_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action)
-            tweet_body = generate_tweet(prompt)
-            time.sleep(5) # 5 Seconds between next API Call
-
-            title_prompt = construct_title_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action)
-            tweet_title = generate_title(title_prompt)
-            time.sleep(5) # 5 Seconds between next API Call
-
-            hashtag_prompt = construct_hashtag_prompt(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action)
-            hashtags = generate_hashtags(hashtag_prompt, congress, bill_type, bill_number)
+            bill_context = construct_bill_context(congress, bill_type, bill_number, bill_title, bill_text, bill_actions, mostrecent_bill_action)
+            if single_call_mode:
+                tweet_body, tweet_title, hashtags = generate_tweet_fields(bill_context, congress, bill_type, bill_number)
+            else:
+                tweet_body, tweet_title, hashtags = generate_tweet_separately(bill_context, congress, bill_type, bill_number)
 
             if insert_tweet(conn_tweets, congress, bill_type, bill_number, tweet_body, tweet_title, hashtags):
                 update_tweet_created(conn_data, congress, bill_type, bill_number)
@@ -408,7 +477,9 @@ def main():
             time.sleep(30)  # Wait for 30 seconds before processing the next bill
 
         conn_data.close()
+        conn_text.close()
         conn_tweets.close()
+        store.close()
         logging.info("Database connections closed")
 
     except Exception as e:
@@ -9,8 +9,12 @@ def main():
     
     dependencies = [
         "requests",
+        "aiohttp",
         "beautifulsoup4",
         "bs4",
+        "lxml",
+        "tokenizers",
+        "zstandard",
         "nltk"
     ]
     
@@ -0,0 +1,89 @@
+# Consolidated store for tokenized law text.
+# law_tokenizer_htm_7000.py and law_tokenizer_xml_7000.py used to create one SQLite file per law
+# under law_text_db/ and law_xml_db/. All laws now live in sys_db/law_text.db: one table per
+# source format (law_text_htm, law_text_xml) keyed by (congress, bill_type, bill_number,
+# text_part), plus law_text_state with one row per tokenized law so staleness checks are a
+# primary-key lookup instead of MAX(tokenized_date) over a whole table.
+# migrate_law_text_dbs.py copies the old per-law files into this store.
+
+import os
+
+from db_connections import get_connection
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+LAW_TEXT_DB = os.path.join(script_dir, "sys_db", "law_text.db")
+
+LAW_TEXT_TABLES = {"htm": "law_text_htm", "xml": "law_text_xml"}
+
+LAW_TEXT_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    congress INTEGER,
+    bill_type TEXT,
+    bill_number INTEGER,
+    text_part INTEGER,
+    tokenized_date TIMESTAMP,
+    token_count INTEGER,
+    bill_text TEXT,
+    prompt_text TEXT,
+    prompt_response TEXT,
+    section_start TEXT,
+    section_end TEXT,
+    PRIMARY KEY (congress, bill_type, bill_number, text_part)
+)
+'''
+
+LAW_TEXT_COLUMNS = ["congress", "bill_type", "bill_number", "text_part", "tokenized_date", "token_count",
+                    "bill_text", "prompt_text", "prompt_response", "section_start", "section_end"]
+
+
+def connect_law_text_store(db_path=LAW_TEXT_DB):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = get_connection(db_path)
+    for table in LAW_TEXT_TABLES.values():
+        conn.execute(LAW_TEXT_SCHEMA.format(table=table))
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS law_text_state (
+        source TEXT,
+        congress INTEGER,
+        bill_type TEXT,
+        bill_number INTEGER,
+        tokenized_date TIMESTAMP,
+        part_count INTEGER,
+        PRIMARY KEY (source, congress, bill_type, bill_number)
+    )
+    ''')
+    conn.commit()
+    return conn
+
+def get_tokenized_date(conn, source, congress, bill_type, bill_number):
+    cursor = conn.execute('''
+    SELECT tokenized_date FROM law_text_state
+    WHERE source = ? AND congress = ? AND bill_type = ? AND bill_number = ?
+    ''', (source, congress, bill_type, bill_number))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def replace_law_rows(cursor, source, congress, bill_type, bill_number, rows, tokenized_date):
+    # rows are tuples in LAW_TEXT_COLUMNS order. The caller owns the transaction.
+    table = LAW_TEXT_TABLES[source]
+    cursor.execute(f'''
+    DELETE FROM {table} WHERE congress = ? AND bill_type = ? AND bill_number = ?
+    ''', (congress, bill_type, bill_number))
+    cursor.executemany(f'''
+    INSERT INTO {table} ({", ".join(LAW_TEXT_COLUMNS)})
+    VALUES ({", ".join("?" for _ in LAW_TEXT_COLUMNS)})
+    ''', rows)
+    part_count = cursor.execute(f'''
+    SELECT COUNT(*) FROM {table} WHERE congress = ? AND bill_type = ? AND bill_number = ?
+    ''', (congress, bill_type, bill_number)).fetchone()[0]
+    cursor.execute('''
+    INSERT OR REPLACE INTO law_text_state (source, congress, bill_type, bill_number, tokenized_date, part_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (source, congress, bill_type, bill_number, tokenized_date, part_count))
+    return part_count
+
+def replace_law_parts(cursor, source, congress, bill_type, bill_number, parts, tokenized_date):
+    # parts are (text, token_count, section_start, section_end) from the tokenizers
+    rows = ((congress, bill_type, bill_number, i, tokenized_date, token_count, text, None, None, section_start, section_end)
+            for i, (text, token_count, section_start, section_end) in enumerate(parts, 1))
+    return replace_law_rows(cursor, source, congress, bill_type, bill_number, rows, tokenized_date)
@@ -1,38 +1,31 @@
 import os
-import sqlite3
 import re
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-import nltk
-nltk.download('punkt_tab', quiet=True)
-from nltk.tokenize import word_tokenize
 from xml.etree import ElementTree as ET
 
+from token_chunker import TokenChunker, normalize_whitespace
+from bill_sections import chunk_sections
+from streaming_chunker import stream_chunks
+from law_text_store import connect_law_text_store, get_tokenized_date, replace_law_parts
+
 # constraints
 token_max_size = 7000
 
+# Documents larger than stream_threshold_mb are parsed in blocks, holding at most memory_limit_mb of text
+stream_threshold_mb = 4
+memory_limit_mb = 256
+
+# With --workers N, laws written per commit by the single writer
+write_batch_size = 50
+
 # Define the paths relative to the script's location
 script_dir = os.path.dirname(os.path.abspath(__file__))
 xml_folder = os.path.join(script_dir, 'law_text_xml')
-db_folder = os.path.join(script_dir, 'law_xml_db')
-
-def create_database(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS bill_text (
-            congress INTEGER,
-            bill_type TEXT,
-            bill_number INTEGER,
-            tokenized_date TIMESTAMP,
-            token_count INTEGER,
-            text_part INTEGER,
-            bill_text TEXT,
-            prompt_text TEXT,
-            prompt_response TEXT
-        )
-    ''')
-    conn.commit()
-    return conn
+
+chunker = TokenChunker()
 
 def parse_filename(filename):
     pattern = r'(\d+)\.(\w+)\.(\d+)\.(\d{4}-\d{2}-\d{2})\.(\d{4}-\d{2}-\d{2}-\d{4})\.xml'
@@ -46,87 +39,106 @@ def parse_filename(filename):
         return congress, bill_type, bill_number, last_action_date, file_gen_date
     return None, None, None, None, None
 
-def tokenize_text(text):
-    return word_tokenize(text)
+def tokenize_file(xml_path):
+    # Returns the law's parts as (text, token_count, section_start, section_end). Large
+    # documents are streamed, so the result is a generator that fills as it is consumed.
+    if os.path.getsize(xml_path) > stream_threshold_mb * 1024 * 1024:
+        return stream_chunks(xml_path, chunker, token_max_size, is_xml=True, memory_limit_mb=memory_limit_mb)
+
+    # Read the entire XML content as a string
+    with open(xml_path, 'r', encoding='utf-8') as file:
+        xml_content = file.read()
+
+    # Whole sections are packed into each part; chunks are offsets into the normalized text
+    text = normalize_whitespace(xml_content)
+    return [(text[start:end], token_count, section_start, section_end)
+            for start, end, token_count, section_start, section_end in chunk_sections(chunker, text, token_max_size, is_xml=True)]
 
-def insert_tokens(conn, congress, bill_type, bill_number, content):
-    cursor = conn.cursor()
+def tokenize_worker(xml_path):
+    # Runs in a worker process; parts are returned to the writer as a list
+    return list(tokenize_file(xml_path))
+
+def write_law(conn, congress, bill_type, bill_number, parts, commit=True):
+    # Existing parts for the law are replaced in the same transaction
     current_time = datetime.now().isoformat()
-    
-    tokens = tokenize_text(content)
-    text_parts = []
-    current_part = []
-    
-    for token in tokens:
-        if len(current_part) + 1 > token_max_size:
-            text_parts.append(' '.join(current_part))
-            current_part = [token]
-        else:
-            current_part.append(token)
-    
-    if current_part:
-        text_parts.append(' '.join(current_part))
-    
-    for i, text in enumerate(text_parts, 1):
-        cursor.execute('''
-            INSERT INTO bill_text (congress, bill_type, bill_number, tokenized_date, token_count, text_part, bill_text)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (congress, bill_type, bill_number, current_time, len(text.split()), i, text))
-    
-    conn.commit()
+    replace_law_parts(conn.cursor(), "xml", congress, bill_type, bill_number, parts, current_time)
+    if commit:
+        conn.commit()
 
-def process_xml_file(xml_path, db_path):
+def law_to_tokenize(xml_path, conn):
+    # Returns (congress, bill_type, bill_number) when the file is newer than the stored parts
     congress, bill_type, bill_number, last_action_date, file_gen_date = parse_filename(os.path.basename(xml_path))
     if not all((congress, bill_type, bill_number, last_action_date, file_gen_date)):
         print(f"Skipping {xml_path}: Unable to parse filename")
-        return
-
-    # Check if DB exists and compare dates
-    if os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(tokenized_date) FROM bill_text")
-        last_tokenized_date = cursor.fetchone()[0]
-        conn.close()
-
-        if last_tokenized_date:
-            last_tokenized_date = datetime.fromisoformat(last_tokenized_date)
-            if last_tokenized_date >= file_gen_date:
-                print(f"Skipping {xml_path}: DB is up to date")
-                return
-        
-        # If DB exists but is outdated, delete it
-        os.remove(db_path)
-        print(f"Deleted outdated DB: {db_path}")
-
-    conn = create_database(db_path)
-
-    # Read the entire XML content as a string
-    with open(xml_path, 'r', encoding='utf-8') as file:
-        xml_content = file.read()
+        return None
+
+    last_tokenized_date = get_tokenized_date(conn, "xml", congress, bill_type, bill_number)
+    if last_tokenized_date:
+        last_tokenized_date = datetime.fromisoformat(last_tokenized_date)
+        if last_tokenized_date >= file_gen_date:
+            print(f"Skipping {xml_path}: DB is up to date")
+            return None
+
+    return congress, bill_type, bill_number
+
+def process_xml_file(xml_path, conn):
+    law = law_to_tokenize(xml_path, conn)
+    if not law:
+        return False
+    write_law(conn, *law, tokenize_file(xml_path))
+    return True
+
+def process_parallel(xml_paths, conn, workers):
+    # Parsing and tokenizing fan out to worker processes; this process is the only writer
+    laws = {}
+    for xml_path in xml_paths:
+        law = law_to_tokenize(xml_path, conn)
+        if law:
+            laws[xml_path] = law
+
+    written = 0
+    unwritten = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(tokenize_worker, xml_path): xml_path for xml_path in laws}
+        for future in as_completed(futures):
+            xml_path = futures[future]
+            try:
+                parts = future.result()
+            except Exception as e:
+                print(f"Failed to tokenize {xml_path}: {e}")
+                continue
+            write_law(conn, *laws[xml_path], parts, commit=False)
+            written += 1
+            unwritten += 1
+            if unwritten >= write_batch_size:
+                conn.commit()
+                unwritten = 0
+            print(f"Processed {os.path.basename(xml_path)}")
+    conn.commit()
+    return written
 
-    insert_tokens(conn, congress, bill_type, bill_number, xml_content)
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize law text (xml) into sys_db/law_text.db")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for parsing and tokenizing")
+    args = parser.parse_args()
+
+    conn = connect_law_text_store()
+    start_time = time.monotonic()
+
+    xml_paths = [os.path.join(xml_folder, filename) for filename in os.listdir(xml_folder) if filename.endswith('.xml')]
+    if args.workers > 1:
+        tokenized = process_parallel(xml_paths, conn, args.workers)
+    else:
+        tokenized = 0
+        for xml_path in xml_paths:
+            if process_xml_file(xml_path, conn):
+                tokenized += 1
+            print(f"Processed {os.path.basename(xml_path)}")
 
     conn.close()
 
-def main():
-    if not os.path.exists(db_folder):
-        os.makedirs(db_folder)
-        print(f"Created database folder: {db_folder}")
-
-    for filename in os.listdir(xml_folder):
-        if filename.endswith('.xml'):
-            xml_path = os.path.join(xml_folder, filename)
-            
-            # Extract only the necessary parts for the DB filename
-            congress, bill_type, bill_number, _, _ = parse_filename(filename)
-            if all((congress, bill_type, bill_number)):
-                db_name = f"{congress}.{bill_type}.{bill_number}.xml.db"
-                db_path = os.path.join(db_folder, db_name)
-                process_xml_file(xml_path, db_path)
-                print(f"Processed {filename} -> {db_path}")
-            else:
-                print(f"Skipping {filename}: Unable to parse filename")
+    elapsed = time.monotonic() - start_time
+    print(f"Tokenized {tokenized} of {len(xml_paths)} files in {elapsed:.1f} seconds ({tokenized / elapsed if elapsed else 0:.2f} files/sec)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
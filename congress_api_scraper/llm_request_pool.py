@@ -0,0 +1,90 @@
+# Bounded pool of concurrent requests to the local Ollama server.
+# The server answers up to OLLAMA_NUM_PARALLEL generations at once, but the scripts used to send
+# one request, wait for it, write it, and only then build the next prompt. run_in_flight() keeps
+# max_in_flight requests running on worker threads while the calling thread builds the next
+# prompts and writes the finished results, so SQLite is only ever touched from the caller's thread.
+#
+# jobs yields (key, prompt) pairs and is consumed lazily, one job per free slot. generate(prompt)
+# runs on a worker thread and returns the Ollama response; on_result(key, response) runs on the
+# calling thread. A failed request or write is logged and counted, the rest carry on.
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def response_value(response, field):
+    # Ollama responses are dicts from older clients and subscriptable models from newer ones
+    try:
+        return response[field] or 0
+    except (KeyError, TypeError):
+        return 0
+
+
+class GenerationStats:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.completed = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.prompt_seconds = 0.0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+
+    def add(self, response):
+        self.completed += 1
+        self.prompt_tokens += response_value(response, 'prompt_eval_count')
+        self.prompt_seconds += response_value(response, 'prompt_eval_duration') / 1e9
+        self.eval_tokens += response_value(response, 'eval_count')
+        self.eval_seconds += response_value(response, 'eval_duration') / 1e9
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def elapsed(self):
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    def report(self, unit="parts"):
+        elapsed = self.elapsed()
+        throughput = self.eval_tokens / elapsed if elapsed else 0
+        per_request = self.eval_tokens / self.eval_seconds if self.eval_seconds else 0
+        per_minute = self.completed / elapsed * 60 if elapsed else 0
+        return (f"{self.completed} {unit} in {elapsed:.1f}s ({self.failed} failed): {per_minute:.1f} {unit}/min, "
+                f"{throughput:.1f} generated tokens/sec overall ({per_request:.1f} tokens/sec per request), "
+                f"{self.prompt_tokens} prompt tokens evaluated in {self.prompt_seconds:.1f}s")
+
+
+def run_in_flight(jobs, generate, on_result, max_in_flight, stats=None, report_every=25):
+    stats = stats or GenerationStats()
+    jobs = iter(jobs)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending = {}
+
+        def fill():
+            while len(pending) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    return
+                key, prompt = job
+                pending[executor.submit(generate, prompt)] = key
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finished = [(pending.pop(future), future) for future in done]
+            # Refill before writing so the server never idles while results are stored
+            fill()
+            for key, future in finished:
+                try:
+                    response = future.result()
+                    on_result(key, response)
+                except Exception as e:
+                    stats.failed += 1
+                    logging.error(f"Generation failed for {key}: {str(e)}")
+                    continue
+                stats.add(response)
+                if report_every and stats.completed % report_every == 0:
+                    logging.info(stats.report())
+    stats.finish()
+    return stats
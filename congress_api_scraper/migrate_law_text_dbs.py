@@ -0,0 +1,102 @@
+# One-shot migration of the per-law SQLite files into sys_db/law_text.db.
+# law_text_db/{congress}.{type}.{number}.htm.db and law_xml_db/{congress}.{type}.{number}.xml.db
+# each hold a bill_text table for a single law. Their rows are copied into law_text_htm /
+# law_text_xml. Laws the store already has with a newer tokenized_date are left alone, so the
+# script is safe to re-run. Files written before section_start/section_end existed migrate with
+# those columns empty.
+#
+# Usage: python congress_api_scraper/migrate_law_text_dbs.py [--delete-old] [--batch-size 200]
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+from law_text_store import LAW_TEXT_COLUMNS, LAW_TEXT_DB, connect_law_text_store, get_tokenized_date, replace_law_rows
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FOLDERS = {
+    "htm": os.path.join(script_dir, 'law_text_db'),
+    "xml": os.path.join(script_dir, 'law_xml_db'),
+}
+
+DB_NAME_PATTERN = re.compile(r'(\d+)\.(\w+)\.(\d+)\.(htm|xml)\.db$')
+
+
+def read_law_rows(db_path):
+    # Returns (rows in LAW_TEXT_COLUMNS order, latest tokenized_date) from one per-law file
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(bill_text)")}
+        if not columns:
+            return [], None
+        select = ", ".join(column if column in columns else "NULL" for column in LAW_TEXT_COLUMNS)
+        rows = conn.execute(f"SELECT {select} FROM bill_text ORDER BY text_part").fetchall()
+    finally:
+        conn.close()
+    tokenized_date = max((row[4] for row in rows if row[4]), default=None)
+    return rows, tokenized_date
+
+def migrate_source(conn, source, folder, batch_size, delete_old):
+    counts = {"migrated": 0, "skipped": 0, "failed": 0}
+    if not os.path.isdir(folder):
+        print(f"{folder} does not exist, nothing to migrate for {source}")
+        return counts
+
+    cursor = conn.cursor()
+    migrated_paths = []
+    unwritten = 0
+    for filename in sorted(os.listdir(folder)):
+        match = DB_NAME_PATTERN.match(filename)
+        if not match or match.group(4) != source:
+            continue
+        congress, bill_type, bill_number = int(match.group(1)), match.group(2), int(match.group(3))
+        db_path = os.path.join(folder, filename)
+
+        try:
+            rows, tokenized_date = read_law_rows(db_path)
+        except sqlite3.Error as e:
+            print(f"Failed to read {filename}: {e}")
+            counts["failed"] += 1
+            continue
+
+        stored_date = get_tokenized_date(conn, source, congress, bill_type, bill_number)
+        if not rows or (stored_date and tokenized_date and stored_date >= tokenized_date):
+            counts["skipped"] += 1
+            migrated_paths.append(db_path)
+            continue
+
+        replace_law_rows(cursor, source, congress, bill_type, bill_number, rows, tokenized_date)
+        counts["migrated"] += 1
+        migrated_paths.append(db_path)
+        unwritten += 1
+        if unwritten >= batch_size:
+            conn.commit()
+            unwritten = 0
+            print(f"{source}: {counts['migrated']} laws migrated")
+    conn.commit()
+
+    # Old files are only removed once everything from this folder is committed
+    if delete_old:
+        for db_path in migrated_paths:
+            os.remove(db_path)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy per-law text databases into sys_db/law_text.db")
+    parser.add_argument("--db", default=LAW_TEXT_DB, help="Consolidated law text database")
+    parser.add_argument("--batch-size", type=int, default=200, help="Laws copied per commit")
+    parser.add_argument("--delete-old", action="store_true", help="Remove the per-law files after migrating them")
+    args = parser.parse_args()
+
+    conn = connect_law_text_store(args.db)
+    start_time = time.monotonic()
+    for source, folder in SOURCE_FOLDERS.items():
+        counts = migrate_source(conn, source, folder, args.batch_size, args.delete_old)
+        print(f"{source}: {counts['migrated']} migrated, {counts['skipped']} already current, {counts['failed']} failed")
+    conn.close()
+    print(f"Migration finished in {time.monotonic() - start_time:.1f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Static instruction preamble shared by the LLM prompt builders.
+# The prompts used to open with the date, the bill and the instructions mixed together, so no two
+# prompts shared a prefix. They now start with a preamble that is byte-identical for every bill and
+# every day (role, formatting rules, key action meanings, bill type definitions) and end with the
+# per-bill tail (date, bill data, task). That prefix is what the model servers can reuse:
+#   Ollama   keeps the model loaded for ollama_keep_alive and reuses the KV cache of the longest
+#            prefix shared with the slot's previous prompt, so only the tail is evaluated
+#   Gemini   gets the preamble as the model's system instruction. The API refuses context caches
+#            under gemini_cache_min_tokens, far more than the preamble, so gemini_model() caches
+#            the preamble together with a large bill's text and actions when several prompts about
+#            that bill follow each other (cached tokens are billed at the cached rate)
+
+import datetime
+import logging
+
+CURRENT_PRESIDENT = "Joe Biden"
+
+# Keep the local model and its prompt cache resident between requests
+ollama_keep_alive = "30m"
+
+# Gemini refuses context caches smaller than this many tokens
+gemini_cache_min_tokens = 32768
+gemini_cache_ttl = datetime.timedelta(minutes=30)
+
+KEY_ACTION_MEANINGS = """Key action meanings:
+"Presented to President" - This means the legislation has been brought forward to the President's office but the legislation has not yet been signed or vetoed.
+"Signed by President" - This means the legislation has been signed by the president and become public law."""
+
+BILL_TYPE_DEFINITIONS = """Bills: A bill is the form used for most legislation, whether permanent or temporary, general or special, public or private.  A bill originating in the Senate is designated by the letters “S”, signifying “Senate”, followed by a number that it retains throughout all its parliamentary stages. A bill originating in the House of Representatives is designated by the letters “H.R.”, signifying “House of Representatives”, followed by a number that it retains throughout all its parliamentary stages. Bills are presented to the President for action when approved in identical form by both the House of Representatives and the Senate.
+Joint Resolutions:  Joint resolutions may originate either in the House of Representatives or in the Senate. There is little practical difference between a bill and a joint resolution. Both are subject to the same procedure, except for a joint resolution proposing an amendment to the Constitution. On approval of such a resolution by two-thirds of both the House and Senate, it is sent directly to the Administrator of General Services for submission to the individual states for ratification. It is not presented to the President for approval. A joint resolution originating in the House of Representatives is designated “H.J.Res.” followed by its individual number. Joint resolutions become law in the same manner as bills.
+Concurrent Resolutions: Matters affecting the operations of both the House of Representatives and Senate are usually initiated by means of concurrent resolutions. A concurrent resolution originating in the House of Representatives is designated “H.Con.Res.” followed by its individual number. On approval by both the House of Representatives and Senate, they are signed by the Clerk of the House and the Secretary of the Senate. They are not presented to the President for action.
+Simple Resolutions: A matter concerning the operation of either the House of Representatives or Senate alone is initiated by a simple resolution. A resolution affecting the House of Representatives is designated “H.Res.” followed by its number. They are not presented to the President for action."""
+
+
+def legislation_preamble(instructions, formatting=None):
+    # Nothing here may depend on the bill or the day, or the prefix stops being shared
+    sections = [f"<Instructions>\n{instructions.strip()}\n</Instructions>"]
+    if formatting:
+        sections.append(f"<Formatting>{formatting.strip()}</Formatting>")
+    sections.append(f"<Additional Details>\n{KEY_ACTION_MEANINGS}\n{BILL_TYPE_DEFINITIONS}\n</Additional Details>")
+    return "\n".join(sections)
+
+def dated_context():
+    # The per-day line that used to sit inside the preamble; it now opens the prompt tail
+    today_date = datetime.date.today().strftime("%B %d, %Y")
+    return f"Today's date is {today_date}. Current sitting President: {CURRENT_PRESIDENT}"
+
+
+def log_ollama_usage(response, label):
+    # Prompt evaluation of a reused prefix is skipped by the server, which shows up here
+    try:
+        prompt_tokens = response['prompt_eval_count'] or 0
+        prompt_seconds = (response['prompt_eval_duration'] or 0) / 1e9
+    except (KeyError, TypeError):
+        return
+    logging.info(f"{label}: {prompt_tokens} prompt tokens evaluated in {prompt_seconds:.2f}s")
+
+def log_gemini_usage(response, label):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    cached = getattr(usage, 'cached_content_token_count', 0) or 0
+    logging.info(f"{label}: {usage.prompt_token_count} input tokens ({cached} cached), "
+                 f"{usage.candidates_token_count} output tokens")
+
+
+def gemini_model(model_name, system_instruction, generation_config, safety_settings, contents=None, cache_tokens=None):
+    # Returns (model, cache). The preamble (and contents, when given) is put in a context cache when
+    # the API accepts it; models without caching support, or caches below the minimum size, fall
+    # back to a model that sends the preamble as its system instruction on every request.
+    # cache_tokens is the caller's estimate of the cache size; below gemini_cache_min_tokens no
+    # cache is attempted.
+    import google.generativeai as genai
+    from google.generativeai import caching
+
+    fallback = genai.GenerativeModel(model_name=model_name,
+                                     generation_config=generation_config,
+                                     safety_settings=safety_settings,
+                                     system_instruction=system_instruction)
+    if cache_tokens is not None and cache_tokens < gemini_cache_min_tokens:
+        return fallback, None
+    try:
+        cache = caching.CachedContent.create(model=model_name,
+                                             system_instruction=system_instruction,
+                                             contents=contents,
+                                             ttl=gemini_cache_ttl)
+        model = genai.GenerativeModel.from_cached_content(cached_content=cache,
+                                                          generation_config=generation_config,
+                                                          safety_settings=safety_settings)
+        logging.info(f"Created Gemini context cache {cache.name} ({cache.usage_metadata.total_token_count} tokens)")
+        return model, cache
+    except Exception as e:
+        logging.info(f"Gemini context cache not available for {model_name} ({str(e)}); sending the preamble as a system instruction")
+        return fallback, None
+
+def bill_generator(model, model_name, preamble, generation_config, safety_settings, bill_context, prompts_needed, count_tokens):
+    # Returns (generator, cache, context to send) for the prompts about one bill. A large bill
+    # prompted more than once is cached once together with the preamble, and its prompts then
+    # leave the context out; otherwise the shared model gets the context in every prompt.
+    if prompts_needed < 2:
+        return model, None, bill_context
+    context_tokens = count_tokens(bill_context)
+    if context_tokens < gemini_cache_min_tokens:
+        return model, None, bill_context
+    generator, cache = gemini_model(model_name, preamble, generation_config, safety_settings,
+                                    contents=[bill_context], cache_tokens=context_tokens)
+    if cache is None:
+        return model, None, bill_context
+    return generator, cache, None
+
+def delete_gemini_cache(cache):
+    if cache is None:
+        return
+    try:
+        cache.delete()
+    except Exception as e:
+        logging.warning(f"Could not delete Gemini context cache {cache.name}: {str(e)}")
@@ -0,0 +1,102 @@
+# Persistent conditional-request cache for congress.gov API responses.
+# Responses that carry an ETag or Last-Modified header are stored in SQLite keyed by URL and
+# params. The next request for the same resource is sent with If-None-Match/If-Modified-Since
+# and a 304 answer is served from disk, so unchanged /text and /actions payloads are not
+# downloaded again on every hourly run.
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from urllib.parse import urlencode
+
+from db_connections import open_connection
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB = os.path.join(script_dir, "sys_db", "api_response_cache.db")
+
+# Params that do not change the response and must never be written to disk
+IGNORED_PARAMS = {"api_key"}
+
+
+def cache_key(url, params):
+    params = sorted((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    return hashlib.sha256(f"{url}?{urlencode(params)}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path=CACHE_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = open_connection(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT,
+                fetched_date DATETIME,
+                validated_date DATETIME
+            )
+        """)
+        self.conn.commit()
+        self.hits = 0  # 304 answers served from disk
+        self.misses = 0  # Full downloads, including changed resources
+        self.stored = 0  # Full downloads that were written to the cache
+
+    def lookup(self, key):
+        # Returns (etag, last_modified, body) or None
+        cursor = self.conn.execute("""
+            SELECT etag, last_modified, body FROM response_cache WHERE cache_key = ?
+        """, (key,))
+        return cursor.fetchone()
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry:
+            etag, last_modified, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def hit(self, key, entry):
+        self.hits += 1
+        self.conn.execute("""
+            UPDATE response_cache SET validated_date = ? WHERE cache_key = ?
+        """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), key))
+        self.conn.commit()
+        return json.loads(entry[2])
+
+    def store(self, key, url, headers, body):
+        self.misses += 1
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            # Nothing to revalidate with, so caching the body would never save a download
+            return
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute("""
+            INSERT OR REPLACE INTO response_cache
+            (cache_key, url, etag, last_modified, body, fetched_date, validated_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (key, url, etag, last_modified, body, current_time, current_time))
+        self.conn.commit()
+        self.stored += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        stats = self.stats()
+        logging.info(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                     f"({stats['hit_rate']:.0%} hit rate), {stats['stored']} responses stored")
+        self.conn.close()
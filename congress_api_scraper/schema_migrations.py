@@ -0,0 +1,156 @@
+# Versioned schema migrations for the pipeline databases.
+# Each database has an ordered list of migrations; applied versions are recorded in its
+# schema_migrations table and every migration runs in its own transaction. A migration only runs
+# once the tables it touches exist, so scripts can call migrate() right after creating their
+# tables and whichever script creates a table first also indexes it.
+#
+# SQLite cannot add a primary key to an existing table, so keys are added as UNIQUE indexes after
+# collapsing duplicate rows to the most recently inserted one.
+# Run this file directly to migrate every database that exists.
+
+import logging
+import os
+from datetime import datetime
+
+from db_connections import (ACTIVE_BILL_DATA_DB, ACTIVE_BILL_TEXT_DB, ACTIVE_BILLS_TWEETS_DB, DID_YOU_KNOW_PARAMETERS_DB,
+                            DID_YOU_KNOW_TWEET_DB, get_connection, transaction)
+
+ACTIVE_BILL_DATA = "active_bill_data"
+ACTIVE_BILL_TEXT = "active_bill_text"
+ACTIVE_BILLS_TWEETS = "active_bills_tweets"
+DID_YOU_KNOW_PARAMETERS = "didyouknow_bill_parameters"
+DID_YOU_KNOW_TWEETS = "didyouknow_tweet"
+
+DATABASE_PATHS = {
+    ACTIVE_BILL_DATA: ACTIVE_BILL_DATA_DB,
+    ACTIVE_BILL_TEXT: ACTIVE_BILL_TEXT_DB,
+    ACTIVE_BILLS_TWEETS: ACTIVE_BILLS_TWEETS_DB,
+    DID_YOU_KNOW_PARAMETERS: DID_YOU_KNOW_PARAMETERS_DB,
+    DID_YOU_KNOW_TWEETS: DID_YOU_KNOW_TWEET_DB,
+}
+
+
+def add_unique_key(conn, table, index, columns):
+    # Skipped when the table already has a primary key or unique index on exactly these columns
+    for row in conn.execute(f"PRAGMA index_list({table})"):
+        if row[2] and [info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")] == columns:
+            return
+    key = ", ".join(columns)
+    conn.execute(f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {key})")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({key})")
+
+def bill_text_part_key(conn):
+    add_unique_key(conn, "bill_text", "idx_bill_text_part", ["congress", "bill_type", "bill_number", "text_part"])
+
+def bill_text_summary_indexes(conn):
+    # The summary scripts look for parts without a summary; importance looks for bills with one
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bill_text_needs_summary ON bill_text (congress, bill_type, bill_number, text_part)
+        WHERE summary IS NULL OR summary = ''
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bill_text_summarized ON bill_text (congress, bill_type, bill_number)
+        WHERE summary IS NOT NULL AND summary != ''
+    ''')
+
+def active_bill_list_key(conn):
+    # Tables created by older versions of get_base_active_bills.py have no primary key
+    add_unique_key(conn, "active_bill_list", "idx_active_bill_list_key", ["congress", "billNumber", "billType"])
+
+def active_bill_list_indexes(conn):
+    # Must Know bills not yet tweeted: equality columns first, then the latestActionDate range
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_active_bill_list_tweet ON active_bill_list (importance, tweet_created, latestActionDate)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_active_bill_list_actions_pending ON active_bill_list (congress)
+        WHERE actions_updated = 0
+    ''')
+
+def bill_actions_key(conn):
+    add_unique_key(conn, "bill_actions", "idx_bill_actions_key", ["congress", "billType", "billNumber", "actionCode", "actionDate"])
+
+def active_bills_tweets_indexes(conn):
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_active_bills_tweets_untweeted ON active_bills_tweets (bill_index)
+        WHERE tweeted = 0
+    ''')
+
+def didyouknow_parameters_indexes(conn):
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_didyouknow_bill_parameters_bill
+        ON didyouknow_bill_parameters (congress, bill_type, bill_number)
+    ''')
+
+def didyouknow_tweet_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_didyouknow_tweet_bill ON didyouknow_tweet (bill_index)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_didyouknow_tweet_untweeted ON didyouknow_tweet (tweet_id)
+        WHERE tweeted = 0
+    ''')
+
+# database: [(version, name, required tables, migration)]
+MIGRATIONS = {
+    ACTIVE_BILL_TEXT: [
+        (1, "bill_text_part_key", ["bill_text"], bill_text_part_key),
+        (2, "bill_text_summary_indexes", ["bill_text"], bill_text_summary_indexes),
+    ],
+    ACTIVE_BILL_DATA: [
+        (1, "active_bill_list_key", ["active_bill_list"], active_bill_list_key),
+        (2, "active_bill_list_indexes", ["active_bill_list"], active_bill_list_indexes),
+        (3, "bill_actions_key", ["bill_actions"], bill_actions_key),
+    ],
+    ACTIVE_BILLS_TWEETS: [
+        (1, "active_bills_tweets_indexes", ["active_bills_tweets"], active_bills_tweets_indexes),
+    ],
+    DID_YOU_KNOW_PARAMETERS: [
+        (1, "didyouknow_parameters_indexes", ["didyouknow_bill_parameters"], didyouknow_parameters_indexes),
+    ],
+    DID_YOU_KNOW_TWEETS: [
+        (1, "didyouknow_tweet_indexes", ["didyouknow_tweet"], didyouknow_tweet_indexes),
+    ],
+}
+
+
+def create_migrations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_date TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+def migrate(conn, database):
+    # Applies the database's pending migrations whose tables exist. Returns the versions applied.
+    create_migrations_table(conn)
+    applied = applied_versions(conn)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    newly_applied = []
+    for version, name, required, migration in MIGRATIONS[database]:
+        if version in applied or not set(required) <= tables:
+            continue
+        with transaction(conn):
+            migration(conn)
+            conn.execute('INSERT INTO schema_migrations (version, name, applied_date) VALUES (?, ?, ?)',
+                         (version, name, datetime.now().isoformat()))
+        conn.execute('ANALYZE')
+        logging.info(f"Applied {database} migration {version}: {name}")
+        newly_applied.append(version)
+    return newly_applied
+
+
+def main():
+    for database, db_path in DATABASE_PATHS.items():
+        if not os.path.exists(db_path):
+            print(f"{database}: {db_path} does not exist, skipped")
+            continue
+        versions = migrate(get_connection(db_path), database)
+        print(f"{database}: applied {len(versions)} migrations {versions if versions else ''}".rstrip())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Streaming mode for the bill/law tokenizers.
+# Very large documents (omnibus bills, appropriations) are not read into memory whole. The file
+# is read in fixed-size blocks and fed to an incremental HTML parser (lxml's parser target when
+# installed, html.parser otherwise); the text it produces is split at section headings and
+# packed into parts exactly as chunk_sections() does, and finished parts are yielded as soon as
+# they fill so the caller can write them to SQLite straight away.
+# memory_limit_mb bounds the text held at once: a section that grows past the limit is split
+# at a line break and continues in the next part.
+
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+from bill_sections import LEVELS, PREAMBLE_LABEL, find_headings, section_label
+from token_chunker import normalize_whitespace
+
+MEMORY_LIMIT_MB = 256
+READ_BLOCK_CHARS = 1024 * 1024
+PENDING_CHARS_PER_MB = 1024 * 1024 // 16  # Headroom for normalisation copies and tokenizer output
+HEADING_GUARD_CHARS = 200  # Kept back on a forced split so a heading cut by the block is not lost
+SKIPPED_TAGS = ("script", "style", "template")
+
+
+class TextTarget:
+    # lxml parser target collecting document text, skipping script/style contents
+    def __init__(self, emit):
+        self.emit = emit
+        self.skip_depth = 0
+
+    def start(self, tag, attrib):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.emit(data)
+
+    def close(self):
+        return None
+
+
+class TextCollector(HTMLParser):
+    # html.parser fallback with the same behaviour as TextTarget
+    def __init__(self, emit):
+        super().__init__(convert_charrefs=True)
+        self.target = TextTarget(emit)
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def iter_html_text(path, block_chars=READ_BLOCK_CHARS):
+    # Yields the document's text in pieces, one per block read
+    pieces = []
+    if etree is not None:
+        parser = etree.HTMLParser(target=TextTarget(pieces.append), huge_tree=True)
+    else:
+        parser = TextCollector(pieces.append)
+    with open(path, 'r', encoding='utf-8') as file:
+        for block in iter(lambda: file.read(block_chars), ''):
+            parser.feed(block)
+            if pieces:
+                yield ''.join(pieces)
+                pieces.clear()
+    parser.close()
+    if pieces:
+        yield ''.join(pieces)
+
+def iter_raw_text(path, block_chars=READ_BLOCK_CHARS):
+    # The XML tokenizer chunks the raw XML, so blocks are passed through unparsed
+    with open(path, 'r', encoding='utf-8') as file:
+        for block in iter(lambda: file.read(block_chars), ''):
+            yield block
+
+
+class StreamingSectionPacker:
+    # Incremental version of bill_sections.chunk_sections(). feed() and close() return finished
+    # parts as (text, token_count, section_start, section_end).
+    def __init__(self, chunker, max_tokens, is_xml=False, memory_limit_mb=MEMORY_LIMIT_MB):
+        self.chunker = chunker
+        self.max_tokens = max_tokens
+        self.is_xml = is_xml
+        self.max_pending_chars = memory_limit_mb * PENDING_CHARS_PER_MB
+        self.pending = ""  # Text of the open section, starting at its heading
+        self.path = {}
+        self.label = PREAMBLE_LABEL
+        self.parts = []
+        self.part_tokens = 0
+        self.part_start = None
+        self.part_end = None
+
+    def feed(self, text):
+        finished = []
+        self.pending += text
+        segment_start = 0
+        for offset, level, value in find_headings(self.pending, self.is_xml):
+            if offset > segment_start:
+                self.add_segment(self.pending[segment_start:offset], finished)
+            segment_start = offset
+            self.path = {l: self.path[l] for l in LEVELS[:LEVELS.index(level)] if l in self.path}
+            self.path[level] = value
+            self.label = section_label(self.path)
+        self.pending = self.pending[segment_start:]
+
+        if len(self.pending) > self.max_pending_chars:
+            cut = self.pending.rfind('\n', 0, len(self.pending) - HEADING_GUARD_CHARS)
+            if cut <= 0:
+                cut = len(self.pending) - HEADING_GUARD_CHARS
+            self.add_segment(self.pending[:cut], finished)
+            self.pending = self.pending[cut:]
+        return finished
+
+    def close(self):
+        finished = []
+        if self.pending:
+            self.add_segment(self.pending, finished)
+            self.pending = ""
+        if self.parts:
+            finished.append(self.flush())
+        return finished
+
+    def add_segment(self, text, finished):
+        text = normalize_whitespace(text)
+        if not text:
+            return
+        label = self.label
+        token_count = self.chunker.count(text)
+        if self.parts and self.part_tokens + token_count + 1 > self.max_tokens:
+            finished.append(self.flush())
+
+        if token_count > self.max_tokens:
+            pieces = self.chunker.chunk(text, self.max_tokens)
+            for start, end, piece_tokens in pieces[:-1]:
+                finished.append((text[start:end], piece_tokens, label, label))
+            start, end, token_count = pieces[-1]
+            text = text[start:end]
+
+        if not self.parts:
+            self.part_start = label
+        else:
+            token_count += 1  # Newline joining the segments
+        self.parts.append(text)
+        self.part_tokens += token_count
+        self.part_end = label
+
+    def flush(self):
+        part = ('\n'.join(self.parts), self.part_tokens, self.part_start, self.part_end)
+        self.parts = []
+        self.part_tokens = 0
+        return part
+
+
+def stream_chunks(path, chunker, max_tokens, is_xml=False, memory_limit_mb=MEMORY_LIMIT_MB):
+    # Yields (text, token_count, section_start, section_end) parts of the document at path
+    packer = StreamingSectionPacker(chunker, max_tokens, is_xml, memory_limit_mb)
+    block_chars = min(READ_BLOCK_CHARS, packer.max_pending_chars // 4)
+    blocks = iter_raw_text(path, block_chars) if is_xml else iter_html_text(path, block_chars)
+    for text in blocks:
+        yield from packer.feed(text)
+    yield from packer.close()
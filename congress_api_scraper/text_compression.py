@@ -0,0 +1,168 @@
+# Transparent compression for the large text columns of active_bill_text.db.
+# bill_text, summary, formal_report, prompt_text and prompt_response hold several copies of every
+# bill as plain TEXT. Values are stored as BLOBs instead: a 6 byte header (magic, codec, dictionary
+# id) followed by zstd data compressed with a dictionary trained on legislative text, or zlib
+# data with a preset dictionary when the zstandard package is not installed.
+# Plain str values written before compression (and values shorter than MIN_COMPRESS_CHARS, so
+# filters like summary != '' keep working) pass through unchanged, so old rows never need a rewrite.
+#
+# register_text_codec(conn) adds two SQL functions to a connection:
+#   compress_text(value)    used in INSERT/UPDATE
+#   decompress_text(value)  used in SELECT, so only the columns a query names are decompressed
+# LazyRow does the same for Python callers that fetch many columns but read few of them.
+
+import logging
+import struct
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_COLUMNS = ["bill_text", "summary", "formal_report", "prompt_text", "prompt_response"]
+
+MAGIC = b"CT"
+HEADER = struct.Struct(">2sBI")  # magic, codec, dictionary id
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+MIN_COMPRESS_CHARS = 64
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 9
+DICTIONARY_SIZE = 112 * 1024
+ZLIB_DICTIONARY_SIZE = 32 * 1024  # zlib only looks back over a 32 KB window
+SAMPLE_CHARS = 16 * 1024
+
+
+def create_dictionary_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dictionary (
+            dict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec INTEGER,
+            trained_date TIMESTAMP,
+            dict_data BLOB
+        )
+    ''')
+    conn.commit()
+
+def train_dictionary(conn, samples):
+    # samples is a list of str. Returns the new dict_id; new values are compressed with it,
+    # values written with older dictionaries stay readable.
+    create_dictionary_table(conn)
+    samples = [sample[:SAMPLE_CHARS].encode('utf-8') for sample in samples if sample]
+    if not samples:
+        raise ValueError("No samples to train a compression dictionary on")
+
+    if zstandard is not None:
+        codec = CODEC_ZSTD
+        dict_data = zstandard.train_dictionary(DICTIONARY_SIZE, samples).as_bytes()
+    else:
+        # zlib has no trainer; the preset dictionary is the most common sample lines, most frequent last
+        codec = CODEC_ZLIB
+        counts = {}
+        for sample in samples:
+            for line in sample.splitlines():
+                if len(line) > 8:
+                    counts[line] = counts.get(line, 0) + 1
+        dict_data = b""
+        for line in sorted(counts, key=counts.get, reverse=True):
+            if len(dict_data) + len(line) + 1 > ZLIB_DICTIONARY_SIZE:
+                break
+            dict_data = line + b"\n" + dict_data
+
+    cursor = conn.execute('''
+        INSERT INTO compression_dictionary (codec, trained_date, dict_data) VALUES (?, ?, ?)
+    ''', (codec, datetime.now().isoformat(), dict_data))
+    conn.commit()
+    return cursor.lastrowid
+
+
+class TextCodec:
+    def __init__(self, conn):
+        create_dictionary_table(conn)
+        self.dictionaries = {}
+        for dict_id, codec, dict_data in conn.execute('SELECT dict_id, codec, dict_data FROM compression_dictionary'):
+            self.dictionaries[dict_id] = (codec, dict_data)
+
+        # New values use the latest dictionary this install can write
+        usable = [dict_id for dict_id, (codec, _) in self.dictionaries.items()
+                  if codec == CODEC_ZLIB or zstandard is not None]
+        self.dict_id = max(usable) if usable else 0
+        self.codec = self.dictionaries[self.dict_id][0] if self.dict_id else (CODEC_ZSTD if zstandard else CODEC_ZLIB)
+        if zstandard is None and any(codec == CODEC_ZSTD for codec, _ in self.dictionaries.values()):
+            logging.warning("zstandard is not installed; zstd-compressed text cannot be read (pip install zstandard)")
+
+        self.compressors = {}
+        self.decompressors = {}
+
+    def zstd_dictionary(self, dict_id):
+        if not dict_id:
+            return None
+        return zstandard.ZstdCompressionDict(self.dictionaries[dict_id][1])
+
+    def compress(self, value):
+        if value is None or isinstance(value, bytes) or len(value) < MIN_COMPRESS_CHARS:
+            return value
+        data = value.encode('utf-8')
+        if self.codec == CODEC_ZSTD:
+            if self.dict_id not in self.compressors:
+                self.compressors[self.dict_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self.zstd_dictionary(self.dict_id))
+            body = self.compressors[self.dict_id].compress(data)
+        else:
+            zdict = self.dictionaries[self.dict_id][1] if self.dict_id else None
+            compressor = zlib.compressobj(ZLIB_LEVEL, zdict=zdict) if zdict else zlib.compressobj(ZLIB_LEVEL)
+            body = compressor.compress(data) + compressor.flush()
+        return HEADER.pack(MAGIC, self.codec, self.dict_id) + body
+
+    def decompress(self, value):
+        if not isinstance(value, bytes) or not value.startswith(MAGIC):
+            return value
+        _, codec, dict_id = HEADER.unpack_from(value)
+        body = value[HEADER.size:]
+        if codec == CODEC_ZSTD:
+            if dict_id not in self.decompressors:
+                self.decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self.zstd_dictionary(dict_id))
+            data = self.decompressors[dict_id].decompress(body)
+        else:
+            decompressor = zlib.decompressobj(zdict=self.dictionaries[dict_id][1]) if dict_id else zlib.decompressobj()
+            data = decompressor.decompress(body) + decompressor.flush()
+        return data.decode('utf-8')
+
+
+class LazyRow:
+    # Wraps a fetched row; columns are decompressed the first time they are read
+    def __init__(self, codec, columns, row):
+        self.codec = codec
+        self.index = {name: i for i, name in enumerate(columns)}
+        self.raw = row
+        self.values = {}
+
+    def __getitem__(self, key):
+        i = key if isinstance(key, int) else self.index[key]
+        if i not in self.values:
+            self.values[i] = self.codec.decompress(self.raw[i])
+        return self.values[i]
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self.raw)))
+
+    def keys(self):
+        return list(self.index)
+
+def lazy_rows(codec, cursor):
+    # Yields LazyRow objects for the rows of an executed cursor
+    columns = [description[0] for description in cursor.description]
+    for row in cursor:
+        yield LazyRow(codec, columns, row)
+
+
+def register_text_codec(conn):
+    codec = TextCodec(conn)
+    conn.create_function("compress_text", 1, codec.compress, deterministic=True)
+    conn.create_function("decompress_text", 1, codec.decompress, deterministic=True)
+    return codec
@@ -0,0 +1,73 @@
+# HTML to plain text extraction for the bill/law tokenizers.
+# govinfo bill .htm files are a single <pre> block, so all the tokenizers need is the document's
+# text nodes concatenated in order, the same result as BeautifulSoup(...).get_text().
+# BeautifulSoup's html.parser backend is pure Python and takes seconds on omnibus bills, so the
+# extractors are pluggable: lxml (libxml2) or selectolax (lexbor) are used when installed and
+# html.parser remains the fallback. Script/style contents and comments are skipped by every
+# backend, as get_text() does.
+
+import logging
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+EXTRACTOR_ORDER = ["lxml", "selectolax", "html.parser"]  # Fastest first
+SKIPPED_TAGS = ["script", "style", "template"]
+
+
+def extract_text_html_parser(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return soup.get_text()
+
+def extract_text_lxml(html_content):
+    if not html_content.strip():
+        return ""
+    # Parse bytes so documents carrying an encoding declaration are accepted
+    # huge_tree lifts libxml2's 10 MB text node limit; omnibus bills are one <pre> block
+    parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, huge_tree=True)
+    root = lxml.html.document_fromstring(html_content.encode('utf-8'), parser=parser)
+    etree.strip_elements(root, *SKIPPED_TAGS, with_tail=False)
+    return etree.tostring(root, method='text', encoding='unicode')
+
+def extract_text_selectolax(html_content):
+    tree = LexborHTMLParser(html_content)
+    tree.strip_tags(SKIPPED_TAGS)
+    if tree.root is None:
+        return ""
+    return tree.root.text(deep=True, separator='')
+
+EXTRACTORS = {
+    "lxml": (extract_text_lxml, lambda: lxml is not None),
+    "selectolax": (extract_text_selectolax, lambda: LexborHTMLParser is not None),
+    "html.parser": (extract_text_html_parser, lambda: BeautifulSoup is not None),
+}
+
+def available_extractors():
+    return [name for name in EXTRACTOR_ORDER if EXTRACTORS[name][1]()]
+
+def get_extractor(name=None):
+    # Returns the named extractor, or the fastest installed one when name is None
+    if name is not None:
+        extract, is_available = EXTRACTORS[name]
+        if not is_available():
+            raise ImportError(f"Text extractor '{name}' is not installed")
+        return extract
+
+    available = available_extractors()
+    if not available:
+        raise ImportError("No HTML text extractor is installed. Install lxml or beautifulsoup4.")
+    logging.info(f"Using the {available[0]} text extractor")
+    return EXTRACTORS[available[0]][0]
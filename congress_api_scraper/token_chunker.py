@@ -0,0 +1,86 @@
+# Model-aware chunking for the bill/law tokenizers.
+# Token budgets are counted with the target model's own tokenizer (a Hugging Face tokenizer.json,
+# e.g. the llama3.1 one served by Ollama) so a 15000 token part really is 15000 tokens of
+# context. Chunks are returned as (start, end, token_count) character offsets into the text,
+# so no per-word strings are built; callers slice text[start:end] once per chunk.
+# Without the tokenizers package or a vocab file, a regex that approximates word_tokenize
+# (words and punctuation) is used and the counts are logged as approximate.
+
+import logging
+import os
+import re
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+TOKENIZER_PATH = os.path.join(script_dir, "tokenizers", "tokenizer.json")
+
+FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+ENCODE_BLOCK_CHARS = 1024 * 1024  # Text is encoded in blocks split on whitespace
+
+
+def normalize_whitespace(text):
+    # govinfo <pre> text is indented with long runs of spaces, which cost tokens and storage
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+class TokenChunker:
+    def __init__(self, tokenizer_path=TOKENIZER_PATH):
+        self.tokenizer = None
+        if Tokenizer is None:
+            logging.warning("tokenizers is not installed; token counts are approximate (pip install tokenizers)")
+        elif not os.path.exists(tokenizer_path):
+            logging.warning(f"Tokenizer vocab not found at {tokenizer_path}; token counts are approximate")
+        else:
+            self.tokenizer = Tokenizer.from_file(tokenizer_path)
+            self.tokenizer.no_truncation()
+            self.tokenizer.no_padding()
+
+    def token_offsets(self, text, start=0, end=None):
+        # Yields (start, end) character offsets of every token in text[start:end]
+        end = len(text) if end is None else end
+        if self.tokenizer is None:
+            for match in FALLBACK_TOKEN_PATTERN.finditer(text, start, end):
+                yield match.span()
+            return
+
+        # Encode in blocks ending on whitespace to bound the tokenizer's working memory
+        block_start = start
+        while block_start < end:
+            block_end = min(block_start + ENCODE_BLOCK_CHARS, end)
+            if block_end < end:
+                split = max(text.rfind(' ', block_start, block_end), text.rfind('\n', block_start, block_end))
+                if split > block_start:
+                    block_end = split
+            encoding = self.tokenizer.encode(text[block_start:block_end], add_special_tokens=False)
+            for token_start, token_end in encoding.offsets:
+                yield block_start + token_start, block_start + token_end
+            block_start = block_end
+
+    def count(self, text):
+        return sum(1 for _ in self.token_offsets(text))
+
+    def count_span(self, text, start, end):
+        return sum(1 for _ in self.token_offsets(text, start, end))
+
+    def chunk(self, text, max_tokens, start=0, end=None):
+        # Returns [(start, end, token_count)] covering text[start:end], each at most max_tokens
+        end = len(text) if end is None else end
+        chunks = []
+        chunk_start = start
+        token_count = 0
+        for token_start, _ in self.token_offsets(text, start, end):
+            if token_count == max_tokens:
+                chunks.append((chunk_start, token_start, token_count))
+                chunk_start = token_start
+                token_count = 0
+            token_count += 1
+        if token_count:
+            chunks.append((chunk_start, end, token_count))
+        return chunks
+
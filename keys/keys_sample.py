@@ -1,5 +1,7 @@
 #API DATA.GOV KEY
 Key_1 = "blah blah blah blah"
+#Optional: additional API DATA.GOV keys to spread long backfills across
+API_KEYS = [Key_1]
 
 #X Keys
 consumer_key = "consumerkeyhere"
@@ -2,8 +2,13 @@ import sqlite3
 import logging
 from pathlib import Path
 import x_bot_post
-from datetime import datetime
 import os
+import sys
+
+# Shared SQLite connections live in congress_api_scraper/db_connections.py
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'congress_api_scraper'))
+from db_connections import get_connection
+from datetime import datetime
 
 # Get the absolute path of the script
 script_path = os.path.abspath(__file__)
@@ -27,7 +32,7 @@ def get_random_tweet():
             logging.error(f"Database file not found at {DB_FILE}")
             return None
 
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
@@ -39,7 +44,6 @@ def get_random_tweet():
             LIMIT 1
         """)
         result = cursor.fetchone()
-        conn.close()
         
         if result:
             logging.info(f"Retrieved tweet with bill_index: {result[0]}")
@@ -57,7 +61,7 @@ def get_random_tweet():
 def update_tweet_status(bill_index):
     logging.info(f"Attempting to update tweet status for bill_index: {bill_index}")
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection(DB_FILE)
         cursor = conn.cursor()
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         cursor.execute("""
@@ -66,7 +70,6 @@ def update_tweet_status(bill_index):
             WHERE bill_index = ?
         """, (current_time, bill_index))
         conn.commit()
-        conn.close()
         logging.info(f"Tweet status updated for bill_index: {bill_index}")
     except sqlite3.Error as e:
         logging.error(f"SQLite error occurred while updating tweet status: {e}")
@@ -29,7 +29,21 @@ logging.basicConfig(filename=log_file, level=logging.INFO,
 # Add the root directory and the keys folder to sys.path
 root_dir = os.path.dirname(current_dir)
 keys_dir = os.path.join(root_dir, 'keys')
-sys.path.extend([root_dir, keys_dir])
+scraper_dir = os.path.join(root_dir, 'congress_api_scraper')
+sys.path.extend([root_dir, keys_dir, scraper_dir])
+
+from document_store import DocumentStore
+from db_connections import get_connection
+from schema_migrations import DID_YOU_KNOW_PARAMETERS, DID_YOU_KNOW_TWEETS, migrate
+from law_text_store import LAW_TEXT_TABLES, connect_law_text_store
+from token_chunker import TokenChunker
+from excerpt_selector import excerpt_window, extract_parts, load_parts, split_units
+
+LAW_TEXT_DIR = os.path.join(scraper_dir, 'law_text_htm')
+
+# Law text tokens sent with each tweet prompt. The extracted text comes from law_text.db (or the
+# .htm, extracted, for laws not tokenized yet); each tweet about a law gets the next window of it
+tweet_prompt_token_budget = 12000
 
 # Try to import the API key
 try:
@@ -61,7 +75,7 @@ except Exception as e:
 def create_connection(db_file):
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
+        conn = get_connection(db_file)
     except sqlite3.Error as e:
         logging.error(f"Error connecting to database: {e}")
     return conn
@@ -80,6 +94,7 @@ def create_bill_parameters_table(conn):
             )
         ''')
         conn.commit()
+        migrate(conn, DID_YOU_KNOW_PARAMETERS)
     except sqlite3.Error as e:
         logging.error(f"Error creating bill parameters table: {e}")
 
@@ -99,6 +114,7 @@ def create_tweet_table(conn):
             )
         ''')
         conn.commit()
+        migrate(conn, DID_YOU_KNOW_TWEETS)
     except sqlite3.Error as e:
         logging.error(f"Error creating tweet table: {e}")
 
@@ -150,18 +166,16 @@ def process_bill_files():
     if conn is not None:
         create_bill_parameters_table(conn)
         
-        bill_dir = os.path.join(root_dir, 'congress_api_scraper', 'law_text_htm')
-        if not os.path.exists(bill_dir):
-            logging.error(f"Bill directory does not exist: {bill_dir}")
-            print(f"Error: Bill directory does not exist: {bill_dir}")
+        if not os.path.exists(LAW_TEXT_DIR):
+            logging.error(f"Bill directory does not exist: {LAW_TEXT_DIR}")
+            print(f"Error: Bill directory does not exist: {LAW_TEXT_DIR}")
             return
 
-        for filename in os.listdir(bill_dir):
-            if filename.endswith('.htm'):
-                parts = filename.split('.')
-                congress = int(parts[0])
-                bill_type = parts[1]
-                bill_number = int(parts[2])
+        store = DocumentStore(LAW_TEXT_DIR)
+        store.sync()
+        for congress, bill_type, bill_number, file_path in store.documents():
+            if file_path.endswith('.htm'):
+                filename = os.path.basename(file_path)
                 
                 # Check if record already exists
                 cursor = conn.cursor()
@@ -171,7 +185,6 @@ def process_bill_files():
                 ''', (congress, bill_type, bill_number))
                 
                 if cursor.fetchone() is None:
-                    file_path = os.path.join(bill_dir, filename)
                     total_token_size = get_token_count(file_path)
                     
                     # Calculation for total_expected_tweets
@@ -185,17 +198,40 @@ def process_bill_files():
                 else:
                     logging.info(f"Skipped existing record: {filename}")
         
+        store.close()
         conn.close()
     else:
         logging.error("Error: Could not create database connection.")
 
+def get_law_text(law_conn, store, chunker, congress, bill_type, bill_number, tweet_number):
+    # Plain text of the law under tweet_prompt_token_budget, or None when there is none
+    try:
+        parts = load_parts(law_conn, LAW_TEXT_TABLES["htm"], congress, bill_type, bill_number)
+    except sqlite3.Error as e:
+        logging.error(f"Error reading law text for {congress}.{bill_type}.{bill_number}: {e}")
+        parts = []
+    if not parts:
+        bill_file = store.latest_path(congress, bill_type, bill_number)
+        if not bill_file:
+            return None
+        try:
+            parts = extract_parts(bill_file, chunker)
+        except (IOError, ImportError) as e:
+            logging.error(f"Error extracting text from {bill_file}: {e}")
+            return None
+    if not parts:
+        return None
+    law_text, tokens = excerpt_window(split_units(parts), tweet_prompt_token_budget, tweet_number, document="law")
+    logging.info(f"Law text for {congress}.{bill_type}.{bill_number}, tweet {tweet_number + 1}: {tokens} tokens")
+    return law_text
+
 def generate_tweet(bill_content, bill_type, bill_number):
     model = genai.GenerativeModel("gemini-1.5-flash")
-    prompt1 = f"""Generate a did you know tweet that pulls out interesting and unbiased fact(s) out of legislation text provided in html markup below.
+    prompt1 = f"""Generate a did you know tweet that pulls out interesting and unbiased fact(s) out of legislation text provided below. Section headings are given in brackets.
     Remember that the tweet must be 280 characters or less. Include reference information so that someone could find the information if they chose to research it themselves.
     The reference information should include bill type, bill number, and section within the bill the fact comes from. The tweet should start with "Did you know".  All hashtags must contain "_" and not "." or "-" for example "#PL118_78 #AntiCorruptionLaw #ForeignExtortionPreventionAct" and not "#PL118.78 #Anti-Corruption-Law".
     Create the tweet from any interesting section of this document: {bill_content}"""
-    prompt2 = f"""Generate a tweet that pulls out interesting and unbiased fact(s) out of legislation text provided in html markup below.
+    prompt2 = f"""Generate a tweet that pulls out interesting and unbiased fact(s) out of legislation text provided below. Section headings are given in brackets.
     Remember that the tweet must be 280 characters or less. Include reference information so that someone could find the information if they chose to research it themselves.
     The reference information should include bill type, bill number, and section within the bill the fact comes from. All hashtags must contain "_" and not "." or "-" for example "#PL118_78 #AntiCorruptionLaw #ForeignExtortionPreventionAct" and not "#PL118.78 #Anti-Corruption-Law".
     Create the tweet from any interesting section of this document: {bill_content}"""
@@ -229,6 +265,9 @@ def process_tweets():
     
     if bill_params_conn is not None and tweet_conn is not None:
         create_tweet_table(tweet_conn)
+        store = DocumentStore(LAW_TEXT_DIR)
+        law_conn = connect_law_text_store()
+        chunker = TokenChunker()
         
         cursor = bill_params_conn.cursor()
         cursor.execute('SELECT * FROM didyouknow_bill_parameters ORDER BY 1 DESC')
@@ -244,15 +283,9 @@ def process_tweets():
             
             if existing_tweets < total_expected_tweets:
                 # Generate and insert new tweets
-                bill_file = f"{congress}.{bill_type}.{bill_number}.*.htm"
-                bill_dir = os.path.join(root_dir, 'congress_api_scraper', 'law_text_htm')
-                matching_files = [f for f in os.listdir(bill_dir) if f.startswith(f"{congress}.{bill_type}.{bill_number}.")]
+                bill_content = get_law_text(law_conn, store, chunker, congress, bill_type, bill_number, existing_tweets)
                 
-                if matching_files:
-                    bill_file = os.path.join(bill_dir, matching_files[0])
-                    with open(bill_file, 'r', encoding='utf-8') as file:
-                        bill_content = file.read()
-                    
+                if bill_content:
                     tweet_text = generate_tweet(bill_content, bill_type, bill_number)
                     if tweet_text:
                         if insert_tweet(tweet_conn, bill_index, tweet_text):
@@ -262,10 +295,12 @@ def process_tweets():
                     
                     time.sleep(120)  # Wait 2 minutes before processing the next tweet
                 else:
-                    logging.error(f"No matching file found for bill {congress}.{bill_type}.{bill_number}")
+                    logging.error(f"No law text found for bill {congress}.{bill_type}.{bill_number}")
             else:
                 logging.info(f"All expected tweets generated for bill index {bill_index}")
         
+        store.close()
+        law_conn.close()
         bill_params_conn.close()
         tweet_conn.close()
     else:
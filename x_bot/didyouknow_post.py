@@ -2,6 +2,12 @@ import sqlite3
 import logging
 from pathlib import Path
 import x_bot_post
+import os
+import sys
+
+# Shared SQLite connections live in congress_api_scraper/db_connections.py
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'congress_api_scraper'))
+from db_connections import get_connection
 from datetime import datetime
 
 # Set up logging
@@ -21,7 +27,7 @@ def get_random_tweet():
             logging.error(f"Database file not found at {DB_FILE}")
             return None
 
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("""
             SELECT tweet_id, tweet_text 
@@ -31,7 +37,6 @@ def get_random_tweet():
             LIMIT 1
         """)
         result = cursor.fetchone()
-        conn.close()
         
         if result:
             logging.info(f"Retrieved tweet with ID: {result[0]}")
@@ -49,7 +54,7 @@ def get_random_tweet():
 def update_tweet_status(tweet_id):
     logging.info(f"Attempting to update tweet status for ID: {tweet_id}")
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection(DB_FILE)
         cursor = conn.cursor()
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         cursor.execute("""
@@ -58,7 +63,6 @@ def update_tweet_status(tweet_id):
             WHERE tweet_id = ?
         """, (current_time, tweet_id))
         conn.commit()
-        conn.close()
         logging.info(f"Tweet status updated for ID: {tweet_id}")
     except sqlite3.Error as e:
         logging.error(f"SQLite error occurred while updating tweet status: {e}")